@@ -1,72 +1,179 @@
-"""The Proteus API integration."""
+"""The Proteus API integration.
+
+Home Assistant is imported only inside the setup functions, so the client,
+parsers and the fleet poller (``python -m custom_components.proteus.fleet``)
+can be imported without it.
+"""
 from __future__ import annotations
 
+import importlib.util
 import logging
-from datetime import timedelta
+from typing import TYPE_CHECKING, Any
+
+from .const import (
+    CONF_BATTERY_CAPACITY,
+    CONF_BATTERY_POWER,
+    CONF_MQTT_MODE,
+    CONF_MQTT_TOPIC,
+    CONF_PARQUET_EXPORT,
+    DATA_OPTIMIZER_POOL,
+    DEFAULT_BATTERY_CAPACITY,
+    DEFAULT_BATTERY_POWER,
+    DEFAULT_MQTT_TOPIC,
+    DOMAIN,
+    MQTT_MODE_OFF,
+    MQTT_MODE_PUBLISH,
+    MQTT_MODE_SUBSCRIBE,
+    PARQUET_DIR,
+)
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+    from homeassistant.helpers.typing import ConfigType
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+_LOGGER = logging.getLogger(__name__)
 
-from .api import ProteusAPI
-from .const import DOMAIN
+PLATFORMS = ["sensor", "binary_sensor", "calendar"]
 
-_LOGGER = logging.getLogger(__name__)
 
-PLATFORMS: list[Platform] = [
-    Platform.SENSOR,
-    Platform.BINARY_SENSOR,
-    Platform.CALENDAR,
-]
+def __getattr__(name: str) -> Any:
+    """Build CONFIG_SCHEMA on first access, it needs Home Assistant."""
+    if name == "CONFIG_SCHEMA":
+        import homeassistant.helpers.config_validation as cv
 
-SCAN_INTERVAL = timedelta(minutes=5)
+        return cv.config_entry_only_config_schema(DOMAIN)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the Proteus component."""
+    from .services import async_setup_services
+    from .views import ProteusMetricsView, ProteusPlanView
+    from .websocket_api import async_register_websocket_commands
+
+    async_setup_services(hass)
+    async_register_websocket_commands(hass)
+    hass.http.register_view(ProteusPlanView())
+    hass.http.register_view(ProteusMetricsView())
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Proteus from a config entry."""
+    from homeassistant.exceptions import ConfigEntryNotReady
+
+    from .api import ProteusAPI, acquire_account
+    from .coordinator import ProteusDataUpdateCoordinator
+    from .flow_cache import async_pop_handoff
+
     hass.data.setdefault(DOMAIN, {})
+    mqtt_mode = entry.options.get(CONF_MQTT_MODE, MQTT_MODE_OFF)
+    mqtt_topic = entry.options.get(CONF_MQTT_TOPIC, DEFAULT_MQTT_TOPIC)
 
-    # Vytvoř API klienta pro autentizaci
-    api = ProteusAPI(
-        email=entry.data["email"],
-        password=entry.data["password"],
-        inverter_id=entry.data.get("inverter_id"),
-        household_id=entry.data.get("household_id"),
+    # Session, invertory a první data z config flow, pokud entry právě vznikla
+    handoff = async_pop_handoff(
+        hass, entry.data["email"], entry.data["password"], entry.data.get("inverter_id")
     )
 
-    # Přihlásit se
-    try:
-        await hass.async_add_executor_job(api.login)
-    except Exception as err:
-        _LOGGER.error("Failed to login to Proteus: %s", err)
-        return False
-
-    # Pokud nejsou zadány IDs, zjisti všechny invertory
-    if not entry.data.get("inverter_id") or not entry.data.get("household_id"):
-        _LOGGER.info("No inverter_id specified, discovering all inverters...")
-        inverters = await hass.async_add_executor_job(api.get_user_inverters)
+    if mqtt_mode == MQTT_MODE_SUBSCRIBE:
+        # Data publikuje jiná instance, tato se k API nepřihlašuje
+        if handoff is not None:
+            await hass.async_add_executor_job(handoff.api.close)
+            handoff = None
+        if not entry.data.get("inverter_id"):
+            _LOGGER.error("MQTT subscribe mode requires a configured inverter_id")
+            return False
+        # Klient jen parsuje data z MQTT, session ani účet nevytváří
+        api = ProteusAPI(
+            email=entry.data["email"],
+            password=entry.data["password"],
+            inverter_id=entry.data["inverter_id"],
+            household_id=entry.data.get("household_id"),
+        )
+    elif handoff is not None:
+        api = handoff.api
+        _LOGGER.debug("Reusing session validated by the config flow")
+    else:
+        # Vytvoř API klienta nad sdíleným účtem (jedna session pro stejný email)
+        account = await hass.async_add_executor_job(
+            acquire_account, entry.data["email"], entry.data["password"]
+        )
+        api = ProteusAPI(
+            email=entry.data["email"],
+            password=entry.data["password"],
+            inverter_id=entry.data.get("inverter_id"),
+            household_id=entry.data.get("household_id"),
+            account=account,
+        )
 
-        if not inverters:
-            _LOGGER.error("No inverters found for this account")
+        # Přihlásit se (sdílený účet se přihlásí jen jednou)
+        try:
+            await hass.async_add_executor_job(api.login)
+        except Exception as err:
+            _LOGGER.error("Failed to login to Proteus: %s", err)
+            await hass.async_add_executor_job(api.close)
             return False
 
-        _LOGGER.info("Found %d inverters, using first one: %s", len(inverters), inverters[0])
+        # Pokud nejsou zadány IDs, zjisti všechny invertory
+        if not entry.data.get("inverter_id") or not entry.data.get("household_id"):
+            _LOGGER.info("No inverter_id specified, discovering all inverters...")
+            inverters = await hass.async_add_executor_job(api.get_user_inverters)
+
+            if not inverters:
+                _LOGGER.error("No inverters found for this account")
+                await hass.async_add_executor_job(api.close)
+                return False
 
-        # Použij první inverter
-        api.inverter_id = inverters[0]["inverter_id"]
-        api.household_id = inverters[0]["household_id"]
+            _LOGGER.info("Found %d inverters, using first one: %s", len(inverters), inverters[0])
 
-        # TODO: V budoucnu můžeme vytvořit config entry pro každý inverter
-        # Pro nyní použijeme jen první
+            # Použij první inverter
+            api.inverter_id = inverters[0]["inverter_id"]
+            api.household_id = inverters[0]["household_id"]
+
+            # TODO: V budoucnu můžeme vytvořit config entry pro každý inverter
+            # Pro nyní použijeme jen první
 
     # Vytvoř coordinator pro automatické updaty
     coordinator = ProteusDataUpdateCoordinator(hass, api)
+    if capacity := entry.options.get(CONF_BATTERY_CAPACITY, DEFAULT_BATTERY_CAPACITY):
+        coordinator.battery_capacity_wh = capacity * 1000
+    coordinator.battery_power_w = (
+        entry.options.get(CONF_BATTERY_POWER, DEFAULT_BATTERY_POWER) * 1000
+    )
+    if entry.options.get(CONF_PARQUET_EXPORT):
+        if importlib.util.find_spec("pyarrow"):
+            from .parquet import ParquetExporter
+
+            coordinator.parquet = ParquetExporter(hass.config.path(PARQUET_DIR))
+        else:
+            _LOGGER.warning("Parquet export disabled, pyarrow is not installed")
+    await coordinator.async_load_forecaster()
+    await coordinator.async_restore()
+
+    if mqtt_mode == MQTT_MODE_PUBLISH:
+        await coordinator.async_start_mqtt_publisher(mqtt_topic)
 
-    # Načti první data
-    await coordinator.async_config_entry_first_refresh()
+    # Načti první data (z MQTT, z config flow, nebo novým dotazem)
+    if mqtt_mode == MQTT_MODE_SUBSCRIBE:
+        try:
+            unsubscribe = await coordinator.async_start_mqtt_subscriber(mqtt_topic)
+        except ConfigEntryNotReady:
+            await hass.async_add_executor_job(api.close)
+            raise
+        entry.async_on_unload(unsubscribe)
+    elif handoff is not None:
+        await coordinator.async_set_initial_data(handoff.data)
+    else:
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            await hass.async_add_executor_job(api.close)
+            raise
 
     hass.data[DOMAIN][entry.entry_id] = coordinator
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    entry.async_on_unload(coordinator.async_shutdown)
 
     # Forward setup na jednotlivé platformy
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
@@ -74,35 +181,21 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return True
 
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the entry after its options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        await hass.async_add_executor_job(coordinator.api.close)
 
-    return unload_ok
-
-
-class ProteusDataUpdateCoordinator(DataUpdateCoordinator):
-    """Class to manage fetching Proteus data."""
-
-    def __init__(self, hass: HomeAssistant, api: ProteusAPI) -> None:
-        """Initialize."""
-        self.api = api
+        # Poslední entry ukončí proces optimalizace
+        if not hass.data[DOMAIN] and (pool := hass.data.pop(DATA_OPTIMIZER_POOL, None)):
+            from .coordinator import shutdown_optimizer_pool
 
-        super().__init__(
-            hass,
-            _LOGGER,
-            name=DOMAIN,
-            update_interval=SCAN_INTERVAL,
-        )
+            shutdown_optimizer_pool(pool)
 
-    async def _async_update_data(self):
-        """Fetch data from API."""
-        try:
-            # Získej všechna data najednou pomocí batch API
-            data = await self.hass.async_add_executor_job(
-                self.api.get_dashboard_data
-            )
-            return data
-        except Exception as err:
-            raise UpdateFailed(f"Error communicating with API: {err}") from err
+    return unload_ok
@@ -0,0 +1,204 @@
+"""Running grid cost and savings totals from the daily energy counters."""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, fields
+from datetime import date, datetime, time
+from typing import Any
+
+from .pricing import PriceTimeline
+
+# Denní čítače energie v inverters.lastState (Wh, nulují se o půlnoci)
+COUNTER_IMPORT = "gridInEnergy"
+COUNTER_EXPORT = "gridOutEnergy"
+COUNTER_CONSUMPTION = "consumptionEnergy"
+COUNTER_PRODUCTION = "photovoltaicEnergy"
+ENERGY_COUNTERS = (COUNTER_IMPORT, COUNTER_EXPORT, COUNTER_CONSUMPTION)
+
+
+class CounterDelta:
+    """Turn a daily energy counter into increments.
+
+    Only a value lower than the previous one is treated as a counter reset:
+    the whole new value is then the increment since the reset. A new day
+    alone is not, the counter may still report yesterday's total.
+    """
+
+    __slots__ = ("last", "reset")
+
+    def __init__(self, last: float | None = None) -> None:
+        """Initialize."""
+        self.last = last
+        self.reset = False
+
+    def update(self, value: float | None) -> float:
+        """Return the increment since the previous value."""
+        self.reset = False
+        if value is None:
+            return 0.0
+        previous, self.last = self.last, value
+        if previous is None:
+            return 0.0
+        if value < previous:
+            self.reset = True
+            return value
+        return value - previous
+
+
+@dataclass(slots=True)
+class CostTotals:
+    """Energy and money totals of one period."""
+
+    import_kwh: float = 0.0
+    export_kwh: float = 0.0
+    consumption_kwh: float = 0.0
+    unpriced_kwh: float = 0.0  # energie mimo kroky plánu
+    import_cost: float = 0.0  # Kč
+    export_revenue: float = 0.0  # Kč
+    baseline_cost: float = 0.0  # Kč, celá spotřeba ze sítě
+
+    @property
+    def net_cost(self) -> float:
+        """Return import cost minus export revenue."""
+        return self.import_cost - self.export_revenue
+
+    @property
+    def savings(self) -> float:
+        """Return the saving against buying all consumption from the grid."""
+        return self.baseline_cost - self.net_cost
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> CostTotals:
+        """Restore totals saved by as_dict."""
+        names = {field.name for field in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+    def as_dict(self) -> dict[str, float]:
+        """Return totals for storage."""
+        return asdict(self)
+
+
+class CostAccountant:
+    """Integrate counter increments against the price of the active step.
+
+    Each increment is spread evenly over the interval since the previous
+    sample and every part is priced by the plan step it falls into. The
+    part of an interval before midnight is booked to the previous day.
+    """
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.last_sample: datetime | None = None
+        self.day: date | None = None
+        self.today = CostTotals()
+        self.this_month = CostTotals()
+        self.counters = {key: CounterDelta() for key in ENERGY_COUNTERS}
+
+    def add_sample(
+        self,
+        now: datetime,
+        values: dict[str, float | None],
+        timeline: PriceTimeline | None,
+    ) -> bool:
+        """Account one sample of the counters, now in local time.
+
+        Returns True when the totals changed.
+        """
+        deltas = {
+            key: counter.update(values.get(key))
+            for key, counter in self.counters.items()
+        }
+        start = self.last_sample
+        self.last_sample = now
+        today = now.date()
+        new_day = self.day is not None and today != self.day
+
+        changed = start is not None and any(deltas.values())
+        if changed and new_day:
+            # Přírůstek přes půlnoc: část do půlnoci patří předchozímu dni,
+            # po vynulování čítače je celý přírůstek energie od půlnoci
+            midnight = datetime.combine(today, time(), tzinfo=now.tzinfo)
+            before = max(0.0, min(1.0, (midnight - start) / (now - start)))
+            self._book(
+                start,
+                midnight,
+                {
+                    key: 0.0 if self.counters[key].reset else delta * before
+                    for key, delta in deltas.items()
+                },
+                timeline,
+            )
+            deltas = {
+                key: delta if self.counters[key].reset else delta * (1 - before)
+                for key, delta in deltas.items()
+            }
+            start = midnight
+
+        if new_day:
+            self.today = CostTotals()
+            if (today.year, today.month) != (self.day.year, self.day.month):
+                self.this_month = CostTotals()
+        self.day = today
+
+        if changed:
+            self._book(start, now, deltas, timeline)
+        return changed or new_day
+
+    def _book(
+        self,
+        start: datetime,
+        end: datetime,
+        deltas: dict[str, float],
+        timeline: PriceTimeline | None,
+    ) -> None:
+        """Add counter increments (Wh) spread over start..end to the totals."""
+        imported = deltas[COUNTER_IMPORT] / 1000
+        exported = deltas[COUNTER_EXPORT] / 1000
+        consumed = deltas[COUNTER_CONSUMPTION] / 1000
+        hours = (end - start).total_seconds() / 3600
+
+        import_cost = export_revenue = baseline_cost = 0.0
+        priced = 0.0
+        if timeline is not None and hours > 0:
+            for index, overlap in timeline.overlaps(start, end):
+                share = overlap / hours
+                priced += share
+                import_cost += imported * share * timeline.total_mwh[index] / 1000
+                export_revenue += exported * share * timeline.export_mwh[index] / 1000
+                baseline_cost += consumed * share * timeline.total_mwh[index] / 1000
+
+        for totals in (self.today, self.this_month):
+            totals.import_kwh += imported
+            totals.export_kwh += exported
+            totals.consumption_kwh += consumed
+            totals.unpriced_kwh += (imported + exported) * max(0.0, 1 - priced)
+            totals.import_cost += import_cost
+            totals.export_revenue += export_revenue
+            totals.baseline_cost += baseline_cost
+
+    def period_start(self, monthly: bool = False) -> date | None:
+        """Return the first day of the tracked day or month."""
+        if self.day is None:
+            return None
+        return self.day.replace(day=1) if monthly else self.day
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for storage."""
+        return {
+            "last_sample": self.last_sample.isoformat() if self.last_sample else None,
+            "day": self.day.isoformat() if self.day else None,
+            "today": self.today.as_dict(),
+            "month": self.this_month.as_dict(),
+            "counters": {key: counter.last for key, counter in self.counters.items()},
+        }
+
+    def restore(self, data: dict[str, Any]) -> None:
+        """Restore the state saved by as_dict."""
+        if data.get("last_sample"):
+            self.last_sample = datetime.fromisoformat(data["last_sample"])
+        if data.get("day"):
+            self.day = date.fromisoformat(data["day"])
+        self.today = CostTotals.from_dict(data.get("today") or {})
+        self.this_month = CostTotals.from_dict(data.get("month") or {})
+        for key, last in (data.get("counters") or {}).items():
+            if key in self.counters:
+                self.counters[key] = CounterDelta(last)
@@ -0,0 +1,168 @@
+"""Online accuracy of the plan's consumption and production predictions."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any
+
+from .accounting import COUNTER_CONSUMPTION, COUNTER_PRODUCTION, CounterDelta
+from .plan import ControlPlan
+
+# Váha nového vzorku v klouzavém průměru (~ posledních 50 kroků)
+ACCURACY_ALPHA = 0.02
+# Krok se vyhodnotí jen když měření pokrylo aspoň tuto část jeho délky
+MIN_COVERAGE = 0.9
+# Delší mezera mezi vzorky (restart, výpadek API) se do kroků nerozděluje
+MAX_SAMPLE_GAP = timedelta(minutes=20)
+
+QUANTITIES = {
+    "consumption": COUNTER_CONSUMPTION,
+    "production": COUNTER_PRODUCTION,
+}
+
+
+class ErrorStat:
+    """Exponentially weighted MAE and bias of prediction errors.
+
+    The first samples are a plain average so the statistic does not start
+    biased towards zero.
+    """
+
+    __slots__ = ("count", "mae", "bias")
+
+    def __init__(self, count: int = 0, mae: float = 0.0, bias: float = 0.0) -> None:
+        """Initialize."""
+        self.count = count
+        self.mae = mae
+        self.bias = bias
+
+    def add(self, error: float) -> None:
+        """Record one error (measured minus predicted)."""
+        self.count += 1
+        weight = max(ACCURACY_ALPHA, 1 / self.count)
+        self.mae += weight * (abs(error) - self.mae)
+        self.bias += weight * (error - self.bias)
+
+    def as_list(self) -> list[float]:
+        """Return the statistic for storage."""
+        return [self.count, self.mae, self.bias]
+
+
+@dataclass(slots=True)
+class QuantityAccuracy:
+    """Overall and per hour of day errors of one predicted quantity (kWh)."""
+
+    overall: ErrorStat = field(default_factory=ErrorStat)
+    hourly: list[ErrorStat] = field(
+        default_factory=lambda: [ErrorStat() for _ in range(24)]
+    )
+
+    def add(self, error: float, hour: int) -> None:
+        """Record the error of a step starting at the given local hour."""
+        self.overall.add(error)
+        self.hourly[hour].add(error)
+
+
+@dataclass(slots=True)
+class _StepMeasurement:
+    """Measured energy of a step that has not finished yet."""
+
+    end: datetime
+    hours: float
+    predicted: dict[str, float]
+    measured: dict[str, float]
+    covered: float = 0.0
+
+
+class AccuracyTracker:
+    """Align finished plan steps with the measured counter increments."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.last_sample: datetime | None = None
+        self.day: date | None = None
+        self.counters = {name: CounterDelta() for name in QUANTITIES}
+        self.stats = {name: QuantityAccuracy() for name in QUANTITIES}
+        self._pending: dict[datetime, _StepMeasurement] = {}
+
+    def add_sample(
+        self, now: datetime, values: dict[str, float | None], plan: ControlPlan | None
+    ) -> bool:
+        """Account one sample of the counters, now in local time.
+
+        Returns True when a finished step was evaluated.
+        """
+        today = now.date()
+        new_day = self.day is not None and today != self.day
+        self.day = today
+        deltas = {
+            name: counter.update(values.get(QUANTITIES[name]))
+            for name, counter in self.counters.items()
+        }
+        start, self.last_sample = self.last_sample, now
+        if start is None or plan is None or new_day or now - start > MAX_SAMPLE_GAP:
+            # Přes půlnoc nebo dlouhý výpadek nelze přírůstek rozdělit do kroků
+            self._pending.clear()
+            return False
+
+        interval = (now - start).total_seconds() / 3600
+        if interval > 0:
+            for index, hours in plan.overlaps(start, now):
+                step = plan.steps[index]
+                pending = self._pending.get(step.start)
+                if pending is None:
+                    pending = self._pending[step.start] = _StepMeasurement(
+                        end=step.end,
+                        hours=(step.end - step.start).total_seconds() / 3600,
+                        predicted={
+                            "consumption": step.predicted_consumption / 1000,
+                            "production": step.predicted_production / 1000,
+                        },
+                        measured=dict.fromkeys(QUANTITIES, 0.0),
+                    )
+                share = hours / interval
+                for name, delta in deltas.items():
+                    pending.measured[name] += delta * share / 1000
+                pending.covered += hours
+
+        evaluated = False
+        for step_start in [key for key, item in self._pending.items() if item.end <= now]:
+            pending = self._pending.pop(step_start)
+            if pending.covered < MIN_COVERAGE * pending.hours:
+                continue
+            hour = step_start.astimezone(now.tzinfo).hour
+            for name, stats in self.stats.items():
+                stats.add(pending.measured[name] - pending.predicted[name], hour)
+            evaluated = True
+        return evaluated
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for storage."""
+        return {
+            "last_sample": self.last_sample.isoformat() if self.last_sample else None,
+            "day": self.day.isoformat() if self.day else None,
+            "counters": {name: counter.last for name, counter in self.counters.items()},
+            "stats": {
+                name: {
+                    "overall": stats.overall.as_list(),
+                    "hourly": [stat.as_list() for stat in stats.hourly],
+                }
+                for name, stats in self.stats.items()
+            },
+        }
+
+    def restore(self, data: dict[str, Any]) -> None:
+        """Restore the state saved by as_dict."""
+        if data.get("last_sample"):
+            self.last_sample = datetime.fromisoformat(data["last_sample"])
+        if data.get("day"):
+            self.day = date.fromisoformat(data["day"])
+        for name, last in (data.get("counters") or {}).items():
+            if name in self.counters:
+                self.counters[name] = CounterDelta(last)
+        for name, stored in (data.get("stats") or {}).items():
+            if name in self.stats and len(stored.get("hourly", ())) == 24:
+                self.stats[name] = QuantityAccuracy(
+                    overall=ErrorStat(*stored["overall"]),
+                    hourly=[ErrorStat(*stat) for stat in stored["hourly"]],
+                )
@@ -1,38 +1,178 @@
 """Proteus API client."""
 import json
 import logging
+from bisect import bisect_left
+import threading
+import time
+from collections.abc import Hashable
 from typing import Any
 from urllib.parse import urlencode
 
-import requests
-
-from .const import API_HOST, API_TENANT_ID
+from .const import (
+    API_CONNECT_TIMEOUT,
+    API_HOST,
+    API_MAX_URL_LENGTH,
+    API_MIN_REQUEST_INTERVAL,
+    API_POOL_MAXSIZE,
+    API_RATE_LIMIT_MAX_BACKOFF,
+    API_RATE_LIMIT_MAX_WAIT,
+    API_READ_CHUNK_SIZE,
+    API_READ_TIMEOUT,
+    API_RESPONSE_DEADLINE,
+    API_RESPONSE_CACHE_TTL,
+    API_RETRY_BACKOFF,
+    API_RETRY_TOTAL,
+    API_TENANT_ID,
+)
+from .decode import DECODE_ERRORS, json_loads
+from .plan import ControlPlan, extract_from_jsonl, parse_control_plan, plan_revision
+from .pricing import parse_distribution_prices
+from .stats import ApiStats
 
 _LOGGER = logging.getLogger(__name__)
 
-
-class ProteusAPI:
-    """Proteus API client."""
+API_TIMEOUT = (API_CONNECT_TIMEOUT, API_READ_TIMEOUT)
+API_BASE_URL = f"https://{API_HOST}"
+RATE_LIMIT_BACKOFF = 60  # s, když server nepošle Retry-After
+
+
+def _retry_after(value: str | None) -> float:
+    """Return back-off seconds from a Retry-After header, capped."""
+    try:
+        seconds = max(float(value), 0.0) if value else RATE_LIMIT_BACKOFF
+    except ValueError:
+        seconds = RATE_LIMIT_BACKOFF
+    return min(seconds, API_RATE_LIMIT_MAX_BACKOFF)
+
+
+class RateLimited(Exception):
+    """The account is backing off after HTTP 429."""
+
+    def __init__(self, retry_in: float) -> None:
+        """Initialize."""
+        super().__init__(f"Rate limited, next request in {retry_in:.0f} s")
+        self.retry_in = retry_in
+
+
+def create_session(pool_maxsize: int = API_POOL_MAXSIZE):
+    """Create a keep-alive HTTP session for one Proteus account.
+
+    The connection pool is bounded and blocking, so all inverters sharing the
+    session reuse the same TLS connections instead of opening new ones.
+    Idempotent GET calls are retried on connection errors and 502/503/504
+    with a short backoff; Retry-After is ignored so a retry never sleeps
+    longer than the backoff.
+    """
+    # pylint: disable=import-outside-toplevel
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.request import ACCEPT_ENCODING
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=API_RETRY_TOTAL,
+        backoff_factor=API_RETRY_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        # urllib3 Retry-After neomezuje, hodina spánku by blokovala executor
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_maxsize,
+        pool_block=True,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    # http jen pro lokální mock server (testy, fleet)
+    session.mount("http://", adapter)
+    # gzip/deflate vždy, br (a zstd) jen pokud je urllib3 umí dekódovat
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+class RateLimiter:
+    """Thread-safe minimum spacing between requests of one account."""
+
+    def __init__(self, min_interval: float) -> None:
+        """Initialize."""
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+        # Konec pauzy vynucené serverem (HTTP 429)
+        self._blocked_until = 0.0
+
+    def pending(self) -> float:
+        """Return seconds until the next slot, without taking it."""
+        with self._lock:
+            return max(self._next_at - time.monotonic(), 0.0)
+
+    def wait(self, max_wait: float | None = None) -> None:
+        """Block until the next request slot.
+
+        With ``max_wait``, raise RateLimited instead of sleeping when a 429
+        back-off lasts longer; the slot is not taken.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if max_wait is not None and self._blocked_until - now > max_wait:
+                raise RateLimited(self._blocked_until - now)
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+    def penalize(self, seconds: float) -> None:
+        """Push the next slot back, e.g. after HTTP 429."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._next_at = max(self._next_at, self._blocked_until)
+
+
+class ProteusAccount:
+    """Authenticated session shared by all clients of one account.
+
+    Holds the HTTP session and cookies, the request rate budget and a short
+    lived response cache, so entries and inverters of the same account do
+    not log in or fetch the same batch twice. ``base_url`` points the account
+    at another server, e.g. a local mock.
+    """
 
     def __init__(
-        self,
-        email: str,
-        password: str,
-        inverter_id: str | None = None,
-        household_id: str | None = None,
+        self, email: str, password: str, base_url: str = API_BASE_URL
     ) -> None:
-        """Initialize API client."""
+        """Initialize."""
         self.email = email
         self.password = password
-        self.inverter_id = inverter_id
-        self.household_id = household_id
+        self.base_url = base_url.rstrip("/")
         self.session_cookie = None
         self.csrf_token = None
-        self.session = requests.Session()
+        self.session = create_session()
+        self.rate_limiter = RateLimiter(API_MIN_REQUEST_INTERVAL)
+        self.refs = 0
+        self._login_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._cache: dict[Hashable, tuple[float, list]] = {}
+
+    @property
+    def logged_in(self) -> bool:
+        """Return True if session cookies are present."""
+        return bool(self.session_cookie and self.csrf_token)
+
+    def login(self, force: bool = False) -> bool:
+        """Login to Proteus unless the shared session is already logged in."""
+        with self._login_lock:
+            if self.logged_in and not force:
+                return True
+            return self._login()
 
-    def login(self) -> bool:
+    def _login(self) -> bool:
         """Login to Proteus."""
-        url = f"https://{API_HOST}/api/trpc/users.loginWithEmailAndPassword"
+        url = f"{self.base_url}/api/trpc/users.loginWithEmailAndPassword"
 
         payload = {
             "json": {
@@ -45,12 +185,18 @@ class ProteusAPI:
         headers = {
             "Content-Type": "application/json",
             "Accept": "*/*",
-            "Origin": f"https://{API_HOST}",
-            "Referer": f"https://{API_HOST}/cs/auth/login/email-and-password",
+            "Origin": self.base_url,
+            "Referer": f"{self.base_url}/cs/auth/login/email-and-password",
         }
 
+        # requests je už načtený přes create_session()
+        import requests  # pylint: disable=import-outside-toplevel
+
         try:
-            response = self.session.post(url, json=payload, headers=headers)
+            self.rate_limiter.wait()
+            response = self.session.post(
+                url, json=payload, headers=headers, timeout=API_TIMEOUT
+            )
             response.raise_for_status()
 
             # Získej cookies
@@ -59,7 +205,7 @@ class ProteusAPI:
             if "proteus_csrf" in self.session.cookies:
                 self.csrf_token = self.session.cookies["proteus_csrf"]
 
-            if self.session_cookie and self.csrf_token:
+            if self.logged_in:
                 _LOGGER.info("Successfully logged in to Proteus")
                 return True
             else:
@@ -70,11 +216,125 @@ class ProteusAPI:
             _LOGGER.error("Login failed: %s", err)
             return False
 
-    def _call_trpc(self, procedures: str | list[str], inputs: list[dict]) -> list:
-        """Call TRPC API."""
-        if not self.session_cookie or not self.csrf_token:
-            raise Exception("Not logged in")
+    def cache_get(self, key: Hashable) -> list | None:
+        """Return a cached batch response if it has not expired."""
+        with self._cache_lock:
+            cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        return None
+
+    def cache_put(self, key: Hashable, results: list) -> None:
+        """Cache a batch response."""
+        now = time.monotonic()
+        with self._cache_lock:
+            # Vyhoď prošlé záznamy, cache zůstává malá
+            for stale in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+                del self._cache[stale]
+            self._cache[key] = (now + API_RESPONSE_CACHE_TTL, results)
+
+    def close(self) -> None:
+        """Close pooled keep-alive connections."""
+        self.session.close()
+
+
+# Sdílené účty v rámci procesu, klíčem je email
+_ACCOUNTS: dict[str, ProteusAccount] = {}
+_ACCOUNTS_LOCK = threading.Lock()
+
+
+def acquire_account(email: str, password: str) -> ProteusAccount:
+    """Return the shared account for the credentials, creating it if needed."""
+    key = email.strip().lower()
+    with _ACCOUNTS_LOCK:
+        account = _ACCOUNTS.get(key)
+        if account is None or account.password != password:
+            account = _ACCOUNTS[key] = ProteusAccount(email, password)
+        account.refs += 1
+        return account
 
+
+def release_account(account: ProteusAccount) -> None:
+    """Release a shared account, closing it when no client uses it."""
+    key = account.email.strip().lower()
+    with _ACCOUNTS_LOCK:
+        account.refs -= 1
+        if account.refs > 0:
+            return
+        if _ACCOUNTS.get(key) is account:
+            del _ACCOUNTS[key]
+    account.close()
+
+
+class ProteusAPI:
+    """Proteus API client for one inverter."""
+
+    def __init__(
+        self,
+        email: str,
+        password: str,
+        inverter_id: str | None = None,
+        household_id: str | None = None,
+        account: ProteusAccount | None = None,
+    ) -> None:
+        """Initialize API client.
+
+        Pass a shared ``account`` from :func:`acquire_account` to reuse its
+        session, rate budget and response cache; otherwise the client creates
+        a private account on first use. A client that only parses data (MQTT
+        subscribe mode) thus never opens a session.
+        """
+        self.email = email
+        self.password = password
+        self.inverter_id = inverter_id
+        self.household_id = household_id
+        self._shared = account is not None
+        self._account = account
+        # Předpřipravené (url, body) pro opakovaně volané batche
+        self._prepared: dict[Hashable, tuple[str, str | None]] = {}
+        self.stats = ApiStats()
+        # Poslední úspěšná data každé procedury dashboardu
+        self._last_good: dict[str, list] = {}
+        self._plan: ControlPlan | None = None
+
+    @property
+    def account(self) -> ProteusAccount:
+        """Return the account, creating a private one on first use.
+
+        Creating the account imports requests and opens the session, so the
+        first call belongs in the executor.
+        """
+        if self._account is None:
+            self._account = ProteusAccount(self.email, self.password)
+        return self._account
+
+    @property
+    def session(self):
+        """Return the HTTP session of the account."""
+        return self.account.session
+
+    def login(self) -> bool:
+        """Login to Proteus (shared accounts log in only once)."""
+        return self.account.login()
+
+    def close(self) -> None:
+        """Release the account, closing its connections if unused."""
+        if self._account is None:
+            return
+        if self._shared:
+            release_account(self._account)
+        else:
+            self._account.close()
+
+    def _prepare_request(
+        self, procedures: str | list[str], inputs: list[dict]
+    ) -> tuple[str, str | None]:
+        """Build URL and optional POST body for a TRPC batch.
+
+        Short batches go out as GET with the input in the query string, long
+        ones use the TRPC POST batch format so the URL stays within proxy and
+        server limits.
+        """
         # Vytvoř procedure string
         if isinstance(procedures, list):
             procedure_str = ",".join(procedures)
@@ -83,44 +343,151 @@ class ProteusAPI:
 
         # Vytvoř batch input
         batch_input = {str(i): inp for i, inp in enumerate(inputs)}
+        body = json.dumps(batch_input, separators=(",", ":"))
+
+        base_url = f"{self.account.base_url}/api/trpc/{procedure_str}"
+        url = f"{base_url}?{urlencode({'batch': '1', 'input': body})}"
+        if len(url) <= API_MAX_URL_LENGTH:
+            return url, None
+        return f"{base_url}?batch=1", body
+
+    def _call_trpc(
+        self,
+        procedures: str | list[str],
+        inputs: list[dict],
+        cache_key: Hashable | None = None,
+    ) -> list:
+        """Call TRPC API.
+
+        When ``cache_key`` is given, the encoded request is built once and
+        reused by later calls with the same key.
+        """
+        account = self.account
+        if not account.logged_in:
+            raise Exception("Not logged in")
+
+        # requests je už načtený přes create_session()
+        import requests  # pylint: disable=import-outside-toplevel
+
+        prepared = self._prepared.get(cache_key) if cache_key is not None else None
+        if prepared is None:
+            prepared = self._prepare_request(procedures, inputs)
+            if cache_key is not None:
+                self._prepared[cache_key] = prepared
+        url, body = prepared
 
-        # URL encode
-        query = urlencode({"batch": "1", "input": json.dumps(batch_input)})
-        url = f"https://{API_HOST}/api/trpc/{procedure_str}?{query}"
+        # Stejný batch jiného klienta účtu v posledních sekundách
+        cached = account.cache_get(prepared)
+        if cached is not None:
+            return cached
 
         headers = {
-            "x-proteus-csrf": self.csrf_token,
+            "x-proteus-csrf": account.csrf_token,
             "trpc-accept": "application/jsonl",
             "Content-Type": "application/json",
             "Accept": "*/*",
-            "Referer": f"https://{API_HOST}/",
+            "Referer": f"{account.base_url}/",
         }
 
-        try:
-            response = self.session.get(url, headers=headers)
-            response.raise_for_status()
-
-            # Parse JSONL response (každý řádek je JSON)
-            lines = response.text.strip().split("\n")
-            results = []
-            for line in lines:
-                try:
-                    results.append(json.loads(line))
-                except json.JSONDecodeError:
-                    results.append(line)
+        if isinstance(procedures, list):
+            procedure_names = procedures
+        else:
+            procedure_names = procedures.split(",")
+        stats = self.stats
+        started = time.perf_counter()
 
-            return results
+        # Dlouhou pauzu po 429 nespát v executoru, update raději selže
+        account.rate_limiter.wait(API_RATE_LIMIT_MAX_WAIT)
+        try:
+            if body is None:
+                response = self.session.get(
+                    url, headers=headers, timeout=API_TIMEOUT, stream=True
+                )
+            else:
+                response = self.session.post(
+                    url, data=body, headers=headers, timeout=API_TIMEOUT, stream=True
+                )
+
+            with response:
+                if response.status_code == 429:
+                    stats.rate_limit_hits += 1
+                    account.rate_limiter.penalize(
+                        _retry_after(response.headers.get("Retry-After"))
+                    )
+                response.raise_for_status()
+
+                # Čti po velkých blocích s limitem na celou odpověď a pamatuj
+                # si, kdy který blok dorazil (konec bloku -> čas)
+                deadline = started + API_RESPONSE_DEADLINE
+                chunks = []
+                chunk_ends: list[int] = []
+                chunk_times: list[float] = []
+                received = 0
+                for chunk in response.iter_content(chunk_size=API_READ_CHUNK_SIZE):
+                    chunks.append(chunk)
+                    received += len(chunk)
+                    chunk_ends.append(received)
+                    chunk_times.append(time.perf_counter())
+                    if chunk_times[-1] > deadline:
+                        raise requests.exceptions.ReadTimeout(
+                            f"Response not complete within {API_RESPONSE_DEADLINE} s"
+                        )
 
         except requests.RequestException as err:
+            stats.errors += 1
             _LOGGER.error("API call failed: %s", err)
             raise
 
+        finished = time.perf_counter()
+
+        # Parse JSONL response (každý řádek je JSON)
+        results = []
+        arrived: dict[int, float] = {}
+        offset = 0
+        parse_started = time.perf_counter()
+        for line in b"".join(chunks).split(b"\n"):
+            offset += len(line) + 1
+            if not line.strip():
+                continue
+            try:
+                result = json_loads(line)
+            except DECODE_ERRORS:
+                result = line.decode("utf-8", "replace")
+            results.append(result)
+
+            # Procedura je hotová s blokem, ve kterém skončil její poslední řádek
+            if isinstance(result, dict):
+                json_data = result.get("json")
+                if isinstance(json_data, list) and json_data:
+                    if isinstance(json_data[0], int):
+                        block = min(bisect_left(chunk_ends, offset - 1), len(chunk_times) - 1)
+                        arrived[json_data[0]] = chunk_times[block]
+        parse_time = time.perf_counter() - parse_started
+
+        stats.record_request((finished - started) * 1000)
+        stats.parse_ms.add(parse_time * 1000)
+        stats.bytes_received.add(received)
+        stats.lines.add(len(results))
+        for index, name in enumerate(procedure_names):
+            stats.record_procedure(
+                name, (arrived.get(index, finished) - started) * 1000
+            )
+
+        # Odpověď se selhanými procedurami se necachuje, opakování by ji vrátilo
+        if not any(map(self._is_error_line, results)):
+            account.cache_put(prepared, results)
+        return results
+
     def get_user_inverters(self) -> list[dict[str, Any]]:
         """Get list of all inverters for the logged-in user."""
         try:
             # Call inverters.list to get all inverters
             # Input format: {"json": null, "meta": {"values": ["undefined"]}}
-            list_results = self._call_trpc("inverters.list", [{"json": None, "meta": {"values": ["undefined"]}}])
+            list_results = self._call_trpc(
+                "inverters.list",
+                [{"json": None, "meta": {"values": ["undefined"]}}],
+                cache_key=("inverters.list",),
+            )
 
             inverters = []
             # Extract inverter data from inverters.list response
@@ -182,33 +549,118 @@ class ProteusAPI:
             {"json": {"inverterId": self.inverter_id}},
         ]
 
-        results = self._call_trpc(procedures, inputs)
-
-        # Parse výsledky do strukturovaného dictionary
-        # Extrahuj data pro každou proceduru podle indexu (0-6)
+        results = self._call_trpc(
+            procedures, inputs, cache_key=("dashboard", self.inverter_id)
+        )
+
+        # Parse výsledky podle indexu (0-6), chyby jednotlivých procedur zvlášť
+        extract_started = time.perf_counter()
+        extracted, failed = self._split_batch(results, len(procedures))
+        self.stats.extract_ms.add((time.perf_counter() - extract_started) * 1000)
+
+        if failed:
+            # Zopakuj jen selhané procedury v menším batchi
+            retry = sorted(failed)
+            _LOGGER.warning(
+                "Procedures failed, retrying: %s",
+                ", ".join(procedures[index] for index in retry),
+            )
+            self.stats.retries += len(retry)
+            try:
+                retry_results = self._call_trpc(
+                    [procedures[index] for index in retry],
+                    [inputs[index] for index in retry],
+                    cache_key=("dashboard", self.inverter_id, tuple(retry)),
+                )
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.warning("Retry of failed procedures failed: %s", err)
+            else:
+                retry_extracted, retry_failed = self._split_batch(
+                    retry_results, len(retry)
+                )
+                for position, index in enumerate(retry):
+                    if position not in retry_failed:
+                        extracted[index] = retry_extracted[position]
+                        failed.discard(index)
+
+        if len(failed) == len(procedures):
+            raise Exception("All dashboard procedures failed")
+
+        keys = [
+            "current_commands",
+            "current_step",
+            "ws_token",
+            "extended_detail",
+            "last_state",
+            "rewards_summary",
+            "control_plans",
+        ]
         data = {
             "linkbox_state": [],  # Not fetched - would need household_id
             "inverter_detail": [],  # Not fetched - causes rate limit
-            "current_commands": self._extract_by_index(results, 0),
-            "current_step": self._extract_by_index(results, 1),
             "distribution_prices": [],  # Not fetched - causes rate limit
-            "ws_token": self._extract_by_index(results, 2),
-            "extended_detail": self._extract_by_index(results, 3),
-            "last_state": self._extract_by_index(results, 4),
-            "rewards_summary": self._extract_by_index(results, 5),
-            "control_plans": self._extract_by_index(results, 6),
         }
+        for index, key in enumerate(keys):
+            if index in failed:
+                # Ponech poslední dobrou hodnotu selhané procedury
+                self.stats.record_procedure_error(procedures[index])
+                data[key] = self._last_good.get(key, [])
+            else:
+                data[key] = self._last_good[key] = extracted[index]
 
         return data
 
-    def _extract_by_index(self, results: list, index: int) -> list:
+    def _split_batch(
+        self, results: list, count: int
+    ) -> tuple[dict[int, list], set[int]]:
+        """Split batch results per procedure and detect failed procedures.
+
+        A procedure failed when one of its lines is a rejected TRPC chunk or
+        an error envelope, or when the response is indexed but contains no line
+        for it at all.
+        """
+        indexed = any(
+            isinstance(result, dict) and isinstance(result.get("json"), list)
+            for result in results
+        )
+        extracted: dict[int, list] = {}
+        failed: set[int] = set()
+
+        for index in range(count):
+            lines = self._extract_by_index(results, index, fallback=not indexed)
+            if (indexed and not lines) or any(map(self._is_error_line, lines)):
+                failed.add(index)
+            else:
+                extracted[index] = lines
+
+        return extracted, failed
+
+    @staticmethod
+    def _is_error_line(result: Any) -> bool:
+        """Return True if a JSONL line carries a TRPC error.
+
+        Only the error envelope (``{"error": ...}`` instead of ``json``) and
+        a rejected chunk count; an ``error`` field inside the data of a
+        successful procedure (e.g. a device error) is payload.
+        """
+        if not isinstance(result, dict):
+            return False
+        if "error" in result:
+            return True
+        json_data = result.get("json")
+        # Chunk format: [index, status, value] - status 1 = rejected
+        return isinstance(json_data, list) and len(json_data) >= 3 and json_data[1] == 1
+
+    def _extract_by_index(
+        self, results: list, index: int, fallback: bool = True
+    ) -> list:
         """Extract all JSONL lines for a specific procedure index.
 
         Returns a filtered list containing only items that belong to the given procedure.
         This follows TRPC reference chains to collect all related data.
 
-        If no items are found for the index, returns the entire results list as fallback
-        for backward compatibility.
+        If no items are found for the index and ``fallback`` is set, returns the
+        entire results list for backward compatibility.
         """
         filtered = []
         indices_to_check = {index}  # Start with the requested index
@@ -243,7 +695,7 @@ class ProteusAPI:
                         filtered.append(result)
 
         # Fallback: if no items found for this index, return all results
-        if not filtered:
+        if not filtered and fallback:
             return results
 
         return filtered
@@ -267,33 +719,58 @@ class ProteusAPI:
                         return json_data[str(index)]
         return None
 
-    def get_control_plan_events(self) -> list[dict]:
-        """Get control plan as calendar events."""
-        data = self.get_dashboard_data()
-        control_plans = data.get("control_plans")
-
-        if not control_plans:
-            return []
+    def get_active_plan(self) -> ControlPlan | None:
+        """Fetch only the active control plan.
 
-        # Najdi activePlan
-        active_plan = None
-        if isinstance(control_plans, dict) and "activePlan" in control_plans:
-            active_plan = control_plans["activePlan"]
+        Sends a single ``controlPlans.active`` procedure instead of the whole
+        dashboard batch. The parsed plan is cached per plan revision.
+        """
+        results = self._call_trpc(
+            "controlPlans.active",
+            [{"json": {"inverterId": self.inverter_id}}],
+            cache_key=("controlPlans.active", self.inverter_id),
+        )
+        active_plan = extract_from_jsonl(results, "activePlan")
+        if not isinstance(active_plan, dict):
+            return None
+        return self.parse_active_plan(active_plan)
+
+    def parse_active_plan(self, active_plan: dict[str, Any]) -> ControlPlan:
+        """Parse activePlan, reusing the cached plan if the revision matches."""
+        if self._plan is None or self._plan.revision != plan_revision(active_plan):
+            self._plan = parse_control_plan(active_plan)
+        return self._plan
+
+    def get_distribution_prices(self) -> dict[str, float]:
+        """Fetch the distribution tariff table (Kč/MWh per tariff type).
+
+        Not part of the dashboard batch because of rate limits; the table
+        changes rarely and callers are expected to cache it.
+        """
+        results = self._call_trpc(
+            "prices.currentDistributionPrices",
+            [{"json": {"inverterId": self.inverter_id}}],
+            cache_key=("prices.currentDistributionPrices", self.inverter_id),
+        )
+        if any(map(self._is_error_line, results)):
+            raise Exception("Distribution prices request failed")
+        return parse_distribution_prices(results)
 
-        if not active_plan or "payload" not in active_plan:
+    def get_control_plan_events(self) -> list[dict]:
+        """Get control plan as calendar events."""
+        plan = self.get_active_plan()
+        if plan is None:
             return []
 
-        steps = active_plan["payload"].get("steps", [])
-
         events = []
-        for step in steps:
+        for step in plan.steps:
             # Vytvoř calendar event ze step
             event = {
-                "summary": self._step_to_summary(step),
-                "start": step["startAt"],
-                "duration": step["durationMinutes"],
-                "description": self._step_to_description(step),
-                "uid": step["id"],
+                "summary": self._step_to_summary(step.raw),
+                "start": step.raw["startAt"],
+                "duration": step.raw.get("durationMinutes", 60),
+                "description": self._step_to_description(step.raw),
+                "uid": step.id,
             }
             events.append(event)
 
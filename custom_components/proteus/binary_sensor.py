@@ -14,8 +14,10 @@ from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.util import dt as dt_util
 
-from . import ProteusDataUpdateCoordinator
-from .const import DOMAIN
+from .coordinator import ProteusDataUpdateCoordinator
+from .const import CONF_PRICE_QUANTILES, DEFAULT_PRICE_QUANTILES, DOMAIN
+from .plan import ControlPlan, PlanStep
+from .pricing import PriceRank, PriceTimeline, parse_quantiles
 
 
 async def async_setup_entry(
@@ -31,6 +33,14 @@ async def async_setup_entry(
         ProteusCheapest4HBlockBinarySensor(coordinator),
     ]
 
+    # Kvantilové senzory podle možností integrace
+    quantiles = parse_quantiles(
+        entry.options.get(CONF_PRICE_QUANTILES, DEFAULT_PRICE_QUANTILES)
+    )
+    entities.extend(
+        ProteusPriceQuantileBinarySensor(coordinator, quantile) for quantile in quantiles
+    )
+
     async_add_entities(entities)
 
 
@@ -55,6 +65,13 @@ class ProteusBaseBinarySensor(CoordinatorEntity, BinarySensorEntity):
         }
 
 
+def _today_steps(plan: ControlPlan | None, now: datetime) -> list[PlanStep]:
+    """Return the plan steps starting today."""
+    if plan is None:
+        return []
+    return [step for step in plan.steps if step.start.date() == now.date()]
+
+
 class ProteusCheapestHourBinarySensor(ProteusBaseBinarySensor):
     """Binary sensor for cheapest hour detection."""
 
@@ -63,119 +80,35 @@ class ProteusCheapestHourBinarySensor(ProteusBaseBinarySensor):
         super().__init__(coordinator, "cheapest_hour", "Cheapest Hour")
         self._attr_device_class = BinarySensorDeviceClass.RUNNING
 
+    def _cheapest_step(self, now: datetime) -> PlanStep | None:
+        """Return the cheapest step of today."""
+        steps = _today_steps(self.coordinator.data.get("plan"), now)
+        if not steps:
+            return None
+        return min(steps, key=lambda step: step.price_mwh_consumption)
+
     @property
     def is_on(self) -> bool:
         """Return True if current hour is the cheapest."""
-        control_plans = self.coordinator.data.get("control_plans")
-        if not control_plans:
-            return False
-
-        # Find active plan
-        active_plan = None
-        for item in control_plans:
-            if isinstance(item, dict) and "json" in item:
-                json_data = item["json"]
-                if isinstance(json_data, list) and len(json_data) >= 3:
-                    data = json_data[2]
-                    if isinstance(data, list) and len(data) > 0:
-                        if isinstance(data[0], list) and len(data[0]) > 0:
-                            plan_obj = data[0][0]
-                            if isinstance(plan_obj, dict) and "activePlan" in plan_obj:
-                                active_plan = plan_obj["activePlan"]
-                                break
-
-        if not active_plan or "payload" not in active_plan:
-            return False
-
-        steps = active_plan["payload"].get("steps", [])
-        if not steps:
-            return False
-
-        # Get current hour
         now = dt_util.now()
-        current_hour = now.replace(minute=0, second=0, microsecond=0)
-
-        # Find cheapest step today
-        cheapest_step = None
-        min_price = float('inf')
-
-        for step in steps:
-            start_at = step.get("startAt", "")
-            if not start_at:
-                continue
-
-            try:
-                step_time = datetime.fromisoformat(start_at.replace("Z", "+00:00"))
-                # Only consider today's steps
-                if step_time.date() == now.date():
-                    metadata = step.get("metadata", {})
-                    price = metadata.get("priceMwhConsumption", float('inf'))
-                    if price < min_price:
-                        min_price = price
-                        cheapest_step = step_time
-            except Exception:
-                continue
-
-        if not cheapest_step:
+        cheapest_step = self._cheapest_step(now)
+        if cheapest_step is None:
             return False
 
         # Check if current hour matches cheapest hour
-        return current_hour == cheapest_step.replace(minute=0, second=0, microsecond=0)
+        current_hour = now.replace(minute=0, second=0, microsecond=0)
+        return current_hour == cheapest_step.start.replace(minute=0, second=0, microsecond=0)
 
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
         """Return additional attributes."""
-        control_plans = self.coordinator.data.get("control_plans")
-        if not control_plans:
-            return {}
-
-        # Find active plan (same as above)
-        active_plan = None
-        for item in control_plans:
-            if isinstance(item, dict) and "json" in item:
-                json_data = item["json"]
-                if isinstance(json_data, list) and len(json_data) >= 3:
-                    data = json_data[2]
-                    if isinstance(data, list) and len(data) > 0:
-                        if isinstance(data[0], list) and len(data[0]) > 0:
-                            plan_obj = data[0][0]
-                            if isinstance(plan_obj, dict) and "activePlan" in plan_obj:
-                                active_plan = plan_obj["activePlan"]
-                                break
-
-        if not active_plan or "payload" not in active_plan:
-            return {}
-
-        steps = active_plan["payload"].get("steps", [])
-        now = dt_util.now()
-
-        # Find cheapest step today
-        cheapest_step = None
-        min_price = float('inf')
-
-        for step in steps:
-            start_at = step.get("startAt", "")
-            if not start_at:
-                continue
-
-            try:
-                step_time = datetime.fromisoformat(start_at.replace("Z", "+00:00"))
-                if step_time.date() == now.date():
-                    metadata = step.get("metadata", {})
-                    price = metadata.get("priceMwhConsumption", float('inf'))
-                    if price < min_price:
-                        min_price = price
-                        cheapest_step = step_time
-                        cheapest_price = price
-            except Exception:
-                continue
-
-        if not cheapest_step:
+        cheapest_step = self._cheapest_step(dt_util.now())
+        if cheapest_step is None:
             return {}
 
         return {
-            "cheapest_hour": cheapest_step.strftime("%H:%M"),
-            "cheapest_price_kwh": round(cheapest_price / 1000, 2) if min_price != float('inf') else None,
+            "cheapest_hour": cheapest_step.start.strftime("%H:%M"),
+            "cheapest_price_kwh": cheapest_step.price_kwh,
         }
 
 
@@ -187,155 +120,71 @@ class ProteusCheapest4HBlockBinarySensor(ProteusBaseBinarySensor):
         super().__init__(coordinator, "cheapest_4h_block", "Cheapest 4H Block")
         self._attr_device_class = BinarySensorDeviceClass.RUNNING
 
+    def _cheapest_block(self, now: datetime) -> tuple[datetime, float] | None:
+        """Return start and average price (Kč/MWh) of today's cheapest 4 steps."""
+        steps = _today_steps(self.coordinator.data.get("plan"), now)
+        if len(steps) < 4:
+            return None
+
+        # Nejlevnější blok 4 kroků (posuvné okno), kroky jsou seřazené
+        prices = [step.price_mwh_consumption for step in steps]
+        index = min(range(len(steps) - 3), key=lambda i: sum(prices[i:i + 4]))
+        return steps[index].start, sum(prices[index:index + 4]) / 4
+
     @property
     def is_on(self) -> bool:
         """Return True if current hour is in the cheapest 4-hour block."""
-        control_plans = self.coordinator.data.get("control_plans")
-        if not control_plans:
-            return False
-
-        # Find active plan
-        active_plan = None
-        for item in control_plans:
-            if isinstance(item, dict) and "json" in item:
-                json_data = item["json"]
-                if isinstance(json_data, list) and len(json_data) >= 3:
-                    data = json_data[2]
-                    if isinstance(data, list) and len(data) > 0:
-                        if isinstance(data[0], list) and len(data[0]) > 0:
-                            plan_obj = data[0][0]
-                            if isinstance(plan_obj, dict) and "activePlan" in plan_obj:
-                                active_plan = plan_obj["activePlan"]
-                                break
-
-        if not active_plan or "payload" not in active_plan:
-            return False
-
-        steps = active_plan["payload"].get("steps", [])
-        if not steps:
-            return False
-
-        # Get current hour
         now = dt_util.now()
-        current_hour = now.replace(minute=0, second=0, microsecond=0)
-
-        # Build list of today's hourly prices
-        hourly_prices = []
-        for step in steps:
-            start_at = step.get("startAt", "")
-            if not start_at:
-                continue
-
-            try:
-                step_time = datetime.fromisoformat(start_at.replace("Z", "+00:00"))
-                if step_time.date() == now.date():
-                    metadata = step.get("metadata", {})
-                    price = metadata.get("priceMwhConsumption", 0)
-                    hourly_prices.append({
-                        "time": step_time,
-                        "price": price,
-                    })
-            except Exception:
-                continue
-
-        if len(hourly_prices) < 4:
-            return False
-
-        # Sort by time
-        hourly_prices.sort(key=lambda x: x["time"])
-
-        # Find cheapest 4-hour block (sliding window)
-        min_avg_price = float('inf')
-        cheapest_block_start = None
-
-        for i in range(len(hourly_prices) - 3):
-            block = hourly_prices[i:i+4]
-            avg_price = sum(h["price"] for h in block) / 4
-
-            if avg_price < min_avg_price:
-                min_avg_price = avg_price
-                cheapest_block_start = block[0]["time"]
-
-        if not cheapest_block_start:
+        block = self._cheapest_block(now)
+        if block is None:
             return False
 
         # Check if current hour is in the cheapest 4-hour block
-        cheapest_block_end = cheapest_block_start.replace(hour=(cheapest_block_start.hour + 3) % 24)
-        current_hour_only = current_hour.replace(minute=0, second=0, microsecond=0)
-
-        return (cheapest_block_start <= current_hour_only <
-                cheapest_block_start.replace(hour=(cheapest_block_start.hour + 4) % 24))
+        block_start = block[0]
+        current_hour = now.replace(minute=0, second=0, microsecond=0)
+        return block_start <= current_hour < block_start.replace(
+            hour=(block_start.hour + 4) % 24
+        )
 
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
         """Return additional attributes."""
-        control_plans = self.coordinator.data.get("control_plans")
-        if not control_plans:
+        block = self._cheapest_block(dt_util.now())
+        if block is None:
             return {}
 
-        # Find active plan (same as above)
-        active_plan = None
-        for item in control_plans:
-            if isinstance(item, dict) and "json" in item:
-                json_data = item["json"]
-                if isinstance(json_data, list) and len(json_data) >= 3:
-                    data = json_data[2]
-                    if isinstance(data, list) and len(data) > 0:
-                        if isinstance(data[0], list) and len(data[0]) > 0:
-                            plan_obj = data[0][0]
-                            if isinstance(plan_obj, dict) and "activePlan" in plan_obj:
-                                active_plan = plan_obj["activePlan"]
-                                break
-
-        if not active_plan or "payload" not in active_plan:
-            return {}
-
-        steps = active_plan["payload"].get("steps", [])
-        now = dt_util.now()
-
-        # Build list of today's hourly prices
-        hourly_prices = []
-        for step in steps:
-            start_at = step.get("startAt", "")
-            if not start_at:
-                continue
-
-            try:
-                step_time = datetime.fromisoformat(start_at.replace("Z", "+00:00"))
-                if step_time.date() == now.date():
-                    metadata = step.get("metadata", {})
-                    price = metadata.get("priceMwhConsumption", 0)
-                    hourly_prices.append({
-                        "time": step_time,
-                        "price": price,
-                    })
-            except Exception:
-                continue
-
-        if len(hourly_prices) < 4:
-            return {}
+        block_start, avg_price = block
+        end_hour = (block_start.hour + 3) % 24
+        return {
+            "block_start": block_start.strftime("%H:%M"),
+            "block_end": f"{end_hour:02d}:00",
+            "avg_price_kwh": round(avg_price / 1000, 2),
+        }
 
-        # Sort by time
-        hourly_prices.sort(key=lambda x: x["time"])
 
-        # Find cheapest 4-hour block
-        min_avg_price = float('inf')
-        cheapest_block_start = None
+class ProteusPriceQuantileBinarySensor(ProteusBaseBinarySensor):
+    """On while the current price is among the cheapest quantile of the next 24 h."""
 
-        for i in range(len(hourly_prices) - 3):
-            block = hourly_prices[i:i+4]
-            avg_price = sum(h["price"] for h in block) / 4
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator, quantile: int) -> None:
+        """Initialize."""
+        super().__init__(
+            coordinator, f"cheapest_{quantile}_percent", f"Cheapest {quantile} %"
+        )
+        self._quantile = quantile
 
-            if avg_price < min_avg_price:
-                min_avg_price = avg_price
-                cheapest_block_start = block[0]["time"]
+    @property
+    def is_on(self) -> bool:
+        """Return True if the running step is within the quantile."""
+        rank: PriceRank | None = self.coordinator.price_rank(dt_util.now())
+        if rank is None:
+            return False
+        timeline: PriceTimeline = self.coordinator.data["price_timeline"]
+        return timeline.total_mwh[rank.key[1]] <= rank.threshold(self._quantile)
 
-        if not cheapest_block_start:
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the price threshold of the quantile."""
+        rank: PriceRank | None = self.coordinator.price_rank(dt_util.now())
+        if rank is None:
             return {}
-
-        end_hour = (cheapest_block_start.hour + 3) % 24
-        return {
-            "block_start": cheapest_block_start.strftime("%H:%M"),
-            "block_end": f"{end_hour:02d}:00",
-            "avg_price_kwh": round(min_avg_price / 1000, 2),
-        }
+        return {"threshold_kwh": round(rank.threshold(self._quantile) / 1000, 2)}
@@ -8,12 +8,30 @@ import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.const import CONF_EMAIL, CONF_PASSWORD
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 import homeassistant.helpers.config_validation as cv
 
-from .api import ProteusAPI
-from .const import CONF_HOUSEHOLD_ID, CONF_INVERTER_ID, DOMAIN
+from .api import ProteusAPI, acquire_account
+from .const import (
+    CONF_BATTERY_CAPACITY,
+    CONF_BATTERY_POWER,
+    CONF_HOUSEHOLD_ID,
+    CONF_INVERTER_ID,
+    CONF_MQTT_MODE,
+    CONF_MQTT_TOPIC,
+    CONF_PARQUET_EXPORT,
+    CONF_PRICE_QUANTILES,
+    DEFAULT_BATTERY_CAPACITY,
+    DEFAULT_BATTERY_POWER,
+    DEFAULT_MQTT_TOPIC,
+    DEFAULT_PRICE_QUANTILES,
+    DOMAIN,
+    MQTT_MODE_OFF,
+    MQTT_MODES,
+)
+from .flow_cache import async_store_handoff
+from .pricing import parse_quantiles
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -28,18 +46,42 @@ STEP_USER_DATA_SCHEMA = vol.Schema(
 
 
 async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
-    """Validate the user input allows us to connect."""
+    """Validate the user input allows us to connect.
+
+    The validated session, discovered inverters and fetched data are handed
+    over to the config entry setup, so it does not repeat these calls.
+    """
+    account = await hass.async_add_executor_job(
+        acquire_account, data[CONF_EMAIL], data[CONF_PASSWORD]
+    )
     api = ProteusAPI(
         email=data[CONF_EMAIL],
         password=data[CONF_PASSWORD],
         inverter_id=data.get(CONF_INVERTER_ID),
         household_id=data.get(CONF_HOUSEHOLD_ID),
+        account=account,
     )
 
+    try:
+        inverters, dashboard = await _async_validate_api(hass, api, data)
+    except BaseException:
+        await hass.async_add_executor_job(api.close)
+        raise
+
+    async_store_handoff(hass, api, inverters, dashboard)
+    return {"title": f"Proteus ({data[CONF_EMAIL]})"}
+
+
+async def _async_validate_api(
+    hass: HomeAssistant, api: ProteusAPI, data: dict[str, Any]
+) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+    """Log in, discover inverters and fetch the first dashboard data."""
     # Test login
     if not await hass.async_add_executor_job(api.login):
         raise InvalidAuth
 
+    inverters: list[dict[str, Any]] = []
+
     # If IDs not provided, try to auto-detect from user profile
     if not data.get(CONF_INVERTER_ID) or not data.get(CONF_HOUSEHOLD_ID):
         try:
@@ -66,12 +108,12 @@ async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str,
 
     # Try to get dashboard data to verify IDs
     try:
-        await hass.async_add_executor_job(api.get_dashboard_data)
+        dashboard = await hass.async_add_executor_job(api.get_dashboard_data)
     except Exception as err:
         _LOGGER.error("Failed to get dashboard data: %s", err)
         raise CannotConnect from err
 
-    return {"title": f"Proteus ({data[CONF_EMAIL]})"}
+    return inverters, dashboard
 
 
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -102,6 +144,78 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
         )
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> OptionsFlowHandler:
+        """Return the options flow."""
+        return OptionsFlowHandler()
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle Proteus options."""
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage quantile sensors, battery fallbacks, Parquet and MQTT."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            try:
+                quantiles = parse_quantiles(user_input[CONF_PRICE_QUANTILES])
+            except ValueError:
+                errors[CONF_PRICE_QUANTILES] = "invalid_quantiles"
+            topic = user_input[CONF_MQTT_TOPIC].strip().strip("/")
+            if not topic or any(char in topic for char in "+#"):
+                errors[CONF_MQTT_TOPIC] = "invalid_topic"
+            if not errors:
+                return self.async_create_entry(
+                    data={
+                        CONF_PRICE_QUANTILES: ", ".join(map(str, quantiles)),
+                        CONF_BATTERY_CAPACITY: user_input[CONF_BATTERY_CAPACITY],
+                        CONF_BATTERY_POWER: user_input[CONF_BATTERY_POWER],
+                        CONF_PARQUET_EXPORT: user_input[CONF_PARQUET_EXPORT],
+                        CONF_MQTT_MODE: user_input[CONF_MQTT_MODE],
+                        CONF_MQTT_TOPIC: topic,
+                    }
+                )
+
+        options = self.config_entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_PRICE_QUANTILES,
+                        default=options.get(CONF_PRICE_QUANTILES, DEFAULT_PRICE_QUANTILES),
+                    ): cv.string,
+                    vol.Required(
+                        CONF_BATTERY_CAPACITY,
+                        default=options.get(CONF_BATTERY_CAPACITY, DEFAULT_BATTERY_CAPACITY),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                    vol.Required(
+                        CONF_BATTERY_POWER,
+                        default=options.get(CONF_BATTERY_POWER, DEFAULT_BATTERY_POWER),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+                    vol.Required(
+                        CONF_PARQUET_EXPORT,
+                        default=options.get(CONF_PARQUET_EXPORT, False),
+                    ): cv.boolean,
+                    vol.Required(
+                        CONF_MQTT_MODE,
+                        default=options.get(CONF_MQTT_MODE, MQTT_MODE_OFF),
+                    ): vol.In(MQTT_MODES),
+                    vol.Required(
+                        CONF_MQTT_TOPIC,
+                        default=options.get(CONF_MQTT_TOPIC, DEFAULT_MQTT_TOPIC),
+                    ): cv.string,
+                }
+            ),
+            errors=errors,
+        )
+
 
 class CannotConnect(Exception):
     """Error to indicate we cannot connect."""
@@ -13,3 +13,75 @@ DEFAULT_SCAN_INTERVAL = 300  # 5 minut
 # API
 API_HOST = "proteus.deltagreen.cz"
 API_TENANT_ID = "TID_DELTA_GREEN"
+
+# HTTP transport
+API_CONNECT_TIMEOUT = 10  # s
+API_READ_TIMEOUT = 30  # s na jedno čtení ze socketu
+API_RESPONSE_DEADLINE = 60  # s na celou odpověď (read timeout platí jen na čtení)
+API_READ_CHUNK_SIZE = 256 * 1024  # B, odpověď se čte po velkých blocích
+API_POOL_MAXSIZE = 4  # max. souběžných spojení na jeden účet
+API_RETRY_TOTAL = 2
+API_RETRY_BACKOFF = 0.5  # s
+API_MAX_URL_LENGTH = 2000  # delší batch se posílá jako POST
+API_MIN_REQUEST_INTERVAL = 1.0  # s mezi požadavky jednoho účtu
+API_RATE_LIMIT_MAX_BACKOFF = 300  # s, strop pro Retry-After po HTTP 429
+API_RATE_LIMIT_MAX_WAIT = 5  # s, delší pauzu po 429 nečekat ve vlákně a selhat
+API_RESPONSE_CACHE_TTL = 60  # s, sdílená cache odpovědí účtu
+
+# Distribuční tarif se stahuje zhruba jednou denně
+TARIFF_CACHE_TTL = 86400  # s
+TARIFF_RETRY_INTERVAL = 3600  # s po neúspěšném stažení
+
+# Účetnictví nákladů a přesnost predikcí se ukládají nejvýše jednou za minutu
+ACCOUNTING_SAVE_DELAY = 60  # s
+
+# Pořadí ceny v okně následujících hodin (percentil, kvantilové binární senzory)
+PRICE_RANK_WINDOW = 24  # h
+CONF_PRICE_QUANTILES = "price_quantiles"
+DEFAULT_PRICE_QUANTILES = "25"
+
+# Lokální optimalizace plánu (dynamické programování nad SoC)
+OPTIMIZER_MAX_STATES = 101  # úrovně SoC (krok 1 %)
+OPTIMIZER_MAX_CELLS = 20_000_000  # kroky × stavy², strop výpočetní náročnosti
+OPTIMIZER_TIMEOUT = 120  # s
+DATA_OPTIMIZER_POOL = f"{DOMAIN}_optimizer_pool"
+
+# Parametry baterie, pokud je inverters.extendedDetail neobsahuje
+CONF_BATTERY_CAPACITY = "battery_capacity"  # kWh, 0 = jen z API
+CONF_BATTERY_POWER = "battery_power"  # kW, nabíjení i vybíjení
+DEFAULT_BATTERY_CAPACITY = 0.0
+DEFAULT_BATTERY_POWER = 5.0
+
+# Číselné hodnoty lastState ukládané do historie: sloupec -> klíč v lastState
+LAST_STATE_FIELDS = {
+    "soc": "batteryStateOfCharge",
+    "battery_power": "batteryPower",
+    "photovoltaic_power": "photovoltaicPower",
+    "consumption_power": "consumptionPower",
+    "grid_power": "gridPower",
+    "photovoltaic_energy": "photovoltaicEnergy",
+    "consumption_energy": "consumptionEnergy",
+    "grid_in_energy": "gridInEnergy",
+    "grid_out_energy": "gridOutEnergy",
+}
+
+# Export do Parquet (pyarrow je volitelný)
+CONF_PARQUET_EXPORT = "parquet_export"
+PARQUET_DIR = "proteus_parquet"
+PARQUET_FLUSH_SAMPLES = 288  # vzorků lastState v bufferu, den po 5 minutách
+
+# Sdílení dat mezi více instancemi Home Assistant přes MQTT
+CONF_MQTT_MODE = "mqtt_mode"
+CONF_MQTT_TOPIC = "mqtt_topic"
+MQTT_MODE_OFF = "off"
+MQTT_MODE_PUBLISH = "publish"  # tato instance polluje API a publikuje
+MQTT_MODE_SUBSCRIBE = "subscribe"  # tato instance jen odebírá, bez pollingu
+MQTT_MODES = [MQTT_MODE_OFF, MQTT_MODE_PUBLISH, MQTT_MODE_SUBSCRIBE]
+DEFAULT_MQTT_TOPIC = DOMAIN
+MQTT_FIRST_DATA_TIMEOUT = 30  # s na první snapshot v režimu subscribe
+
+# Services
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+SERVICE_PROFILE = "profile"
+SERVICE_PLAN_LOAD = "plan_load"
+SERVICE_EXPORT_PARQUET = "export_parquet"
@@ -0,0 +1,625 @@
+"""Data update coordinator of the Proteus integration."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+import importlib
+import logging
+import math
+import multiprocessing
+import time
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+
+from .accounting import CostAccountant
+from .accuracy import AccuracyTracker
+from .api import ProteusAPI
+from .const import (
+    ACCOUNTING_SAVE_DELAY,
+    DATA_OPTIMIZER_POOL,
+    DEFAULT_BATTERY_POWER,
+    DOMAIN,
+    MQTT_FIRST_DATA_TIMEOUT,
+    OPTIMIZER_TIMEOUT,
+    PRICE_RANK_WINDOW,
+    TARIFF_CACHE_TTL,
+    TARIFF_RETRY_INTERVAL,
+)
+from .decode import CurrentStep, LastState
+from .events import TransitionTracker, command_payload, next_boundary
+from .loadplan import SlotPrices, build_slot_prices
+from .metrics import MetricsBuffer, build_metrics
+from .plan import ControlPlan, extract_from_jsonl
+from .pricing import (
+    PriceRank,
+    PriceTimeline,
+    build_price_rank,
+    build_price_timeline,
+    timeline_revision,
+)
+from .profiler import CycleProfiler
+
+if TYPE_CHECKING:
+    from homeassistant.components.calendar import CalendarEvent
+
+    from .forecast import SocForecast, SocForecaster
+    from .mqtt_bridge import MqttPublisher
+    from .optimizer import OptimizationResult
+    from .parquet import ParquetExporter
+
+_LOGGER = logging.getLogger(__name__)
+
+SCAN_INTERVAL = timedelta(minutes=5)
+
+STORAGE_VERSION = 1
+
+
+def shutdown_optimizer_pool(pool: ProcessPoolExecutor) -> None:
+    """Cancel queued jobs and kill the worker, even in the middle of a job."""
+    # Seznam procesů je potřeba vzít před shutdown()
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.kill()
+
+
+class ProteusDataUpdateCoordinator(DataUpdateCoordinator):
+    """Class to manage fetching Proteus data."""
+
+    def __init__(self, hass: HomeAssistant, api: ProteusAPI) -> None:
+        """Initialize."""
+        self.api = api
+        self._profiler: CycleProfiler | None = None
+        self.plan: ControlPlan | None = None
+        self.price_timeline: PriceTimeline | None = None
+        self._slot_prices: SlotPrices | None = None
+        self._price_rank: PriceRank | None = None
+        # Předpověď SoC (numpy se načítá až při setupu entry, ne při importu)
+        self._forecaster: SocForecaster | None = None
+        self.forecast: SocForecast | None = None
+        # Kapacita (Wh) a výkon (W) baterie z options, když je API nevrací
+        self.battery_capacity_wh: float | None = None
+        self.battery_power_w: float = DEFAULT_BATTERY_POWER * 1000
+        # Události kalendáře (revize plánu, události), staví se v executoru
+        self._calendar_events: tuple[str, tuple[CalendarEvent, ...]] | None = None
+        # Snapshoty se staví v executoru jeden po druhém (cache plánu a předpovědi)
+        self._snapshot_lock = asyncio.Lock()
+        # Lokální optimum pro srovnání s plánem, počítá se v procesu na pozadí
+        self.optimum: OptimizationResult | None = None
+        self._optimizing = False
+        # Distribuční tarif (Kč/MWh podle typu) s diskovou cache
+        self.tariff: dict[str, float] | None = None
+        self._tariff_fetched_at: datetime | None = None
+        self._tariff_due: datetime | None = None
+        self._tariff_store: Store = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.tariff_{api.inverter_id}"
+        )
+
+        # Průběžné náklady a úspory za den a měsíc
+        self.accounting = CostAccountant()
+        self._accounting_store: Store = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.accounting_{api.inverter_id}"
+        )
+
+        # Přesnost predikcí spotřeby a výroby v plánu
+        self.accuracy = AccuracyTracker()
+        self._accuracy_store: Store = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.accuracy_{api.inverter_id}"
+        )
+
+        # Předpřipravené vzorky pro /api/proteus/metrics
+        self.metrics: MetricsBuffer | None = None
+        # Průběžný export vzorků a plánů do Parquet (volba integrace)
+        self.parquet: ParquetExporter | None = None
+        # Sdílení snapshotů přes MQTT; subscriber nepolluje API
+        self._mqtt_publisher: MqttPublisher | None = None
+        self._mqtt_subscribed = False
+        # Události při změně plánu, kroku a příkazů
+        self._transitions = TransitionTracker()
+        self._cancel_step_timer: CALLBACK_TYPE | None = None
+
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=DOMAIN,
+            update_interval=SCAN_INTERVAL,
+        )
+
+    async def _async_update_data(self):
+        """Fetch data from API."""
+        if self._mqtt_subscribed:
+            # Data přicházejí z MQTT, ruční refresh je jen vrátí znovu
+            if self.data is None:
+                raise UpdateFailed("Waiting for data from MQTT")
+            return self.data
+        try:
+            return await self._async_fetch_snapshot()
+        finally:
+            # Cyklus je jeden dotaz na API; listenery jej vykreslí až potom
+            self._async_cycle_done()
+
+    async def _async_fetch_snapshot(self) -> Mapping[str, Any]:
+        """Fetch the dashboard data and build the next snapshot."""
+        try:
+            # Získej všechna data najednou pomocí batch API
+            if self._profiler is not None:
+                data = await self.hass.async_add_executor_job(
+                    self._profiler.run, self.api.get_dashboard_data
+                )
+            else:
+                data = await self.hass.async_add_executor_job(
+                    self.api.get_dashboard_data
+                )
+        except Exception as err:
+            raise UpdateFailed(f"Error communicating with API: {err}") from err
+
+        await self._async_refresh_tariff()
+
+        snapshot = await self._async_build_snapshot(data)
+        self._async_schedule_optimization()
+        self._async_fire_transitions(snapshot)
+        self._async_publish_mqtt(snapshot)
+        return snapshot
+
+    async def _async_build_snapshot(self, data: dict[str, Any]) -> Mapping[str, Any]:
+        """Build the snapshot in the executor and apply it on the event loop.
+
+        Parsing the plan, the price timeline, the forecast and the calendar
+        events of a multi-day plan is too slow for the event loop on small
+        hosts. The loop only applies the finished snapshot.
+        """
+        async with self._snapshot_lock:
+            if self._profiler is not None:
+                snapshot = await self.hass.async_add_executor_job(
+                    self._profiler.run, self._build_snapshot, data
+                )
+            else:
+                snapshot = await self.hass.async_add_executor_job(
+                    self._build_snapshot, data
+                )
+            self._async_apply_snapshot(snapshot)
+        return snapshot
+
+    def _build_snapshot(self, data: dict[str, Any]) -> Mapping[str, Any]:
+        """Return the raw API data with parsed structures.
+
+        Runs in the executor, so it must not touch the event loop. The mapping
+        itself is read-only, but it is shallow: the raw JSONL lists are shared
+        with the API response and must not be mutated by consumers. The parsed
+        structures are frozen dataclasses. The cost and accuracy counters stay
+        out of the snapshot, they change on the loop after it is built.
+        """
+        active_plan = extract_from_jsonl(data.get("control_plans") or [], "activePlan")
+        # Plán se parsuje jen když se změní jeho revize
+        plan = (
+            self.api.parse_active_plan(active_plan)
+            if isinstance(active_plan, dict)
+            else None
+        )
+
+        # Časová řada celkových cen (trh + distribuce) pro aktuální plán
+        timeline = self.price_timeline
+        if plan is None:
+            timeline = None
+        else:
+            tariff_revision = (
+                self._tariff_fetched_at.isoformat() if self._tariff_fetched_at else None
+            )
+            revision = timeline_revision(plan, tariff_revision)
+            if timeline is None or timeline.revision != revision:
+                timeline = build_price_timeline(plan, self.tariff, tariff_revision)
+
+        # lastState a currentStep se čtou jednou za snapshot
+        state = LastState.from_lines(data.get("last_state") or [])
+
+        return MappingProxyType(
+            {
+                **data,
+                "state": state,
+                "step": CurrentStep.from_lines(data.get("current_step") or []),
+                "plan": plan,
+                "tariff": self.tariff,
+                "price_timeline": timeline,
+                "forecast": self._update_forecast(data, plan, timeline, state),
+                "events": self._build_events(plan),
+            }
+        )
+
+    def _build_events(self, plan: ControlPlan | None) -> tuple[CalendarEvent, ...]:
+        """Return the calendar events of the plan, built once per revision."""
+        if plan is None:
+            return ()
+        if self._calendar_events is None or self._calendar_events[0] != plan.revision:
+            from .calendar import build_events
+
+            self._calendar_events = (plan.revision, build_events(plan))
+        return self._calendar_events[1]
+
+    @callback
+    def _async_apply_snapshot(self, snapshot: Mapping[str, Any]) -> None:
+        """Take over a built snapshot and feed the loop-side consumers."""
+        self.plan = snapshot["plan"]
+        self.price_timeline = snapshot["price_timeline"]
+        self.forecast = snapshot["forecast"]
+        self._update_counters(snapshot["state"])
+
+        now = dt_util.utcnow()
+        self.metrics = build_metrics(
+            self.api.inverter_id, snapshot, self.api.stats, now, self.accounting
+        )
+        if self.parquet is not None:
+            self._export_parquet(snapshot, now)
+
+    def _export_parquet(self, data: Mapping[str, Any], now: datetime) -> None:
+        """Buffer the snapshot for Parquet, write it once the buffer is full."""
+        exporter = self.parquet
+        exporter.add_sample(self.api.inverter_id, now, data["state"], self.plan)
+        if self.plan is not None:
+            exporter.add_plan(self.api.inverter_id, now, self.plan)
+        if exporter.due:
+            self.hass.async_create_background_task(
+                self.async_write_parquet(), f"{DOMAIN} parquet export"
+            )
+
+    async def async_write_parquet(self, root: str | None = None) -> list[str]:
+        """Write the buffered Parquet rows in the executor."""
+        if self.parquet is None or not self.parquet.pending:
+            return []
+        from .parquet import write_batches
+
+        batches = self.parquet.take()
+        try:
+            return await self.hass.async_add_executor_job(
+                write_batches, root or self.parquet.root, batches
+            )
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.error("Parquet export failed: %s", err)
+            return []
+
+    def _update_counters(self, state: LastState) -> None:
+        """Feed the energy counters to the cost and accuracy trackers."""
+        values = state.counters()
+        now = dt_util.now()
+        if self.accounting.add_sample(now, values, self.price_timeline):
+            self._accounting_store.async_delay_save(
+                self.accounting.as_dict, ACCOUNTING_SAVE_DELAY
+            )
+        if self.accuracy.add_sample(now, values, self.plan):
+            self._accuracy_store.async_delay_save(
+                self.accuracy.as_dict, ACCOUNTING_SAVE_DELAY
+            )
+
+    def _update_forecast(
+        self,
+        data: dict[str, Any],
+        plan: ControlPlan | None,
+        timeline: PriceTimeline | None,
+        state: LastState,
+    ) -> SocForecast | None:
+        """Project the battery trajectory, recomputed only when inputs change."""
+        if self._forecaster is None or plan is None:
+            return None
+        from .forecast import battery_parameters
+
+        battery = battery_parameters(
+            data.get("extended_detail") or [],
+            self.battery_capacity_wh,
+            self.battery_power_w,
+        )
+        if battery is None or state.soc is None:
+            return None
+        return self._forecaster.update(
+            plan, timeline, battery, state.soc, dt_util.utcnow()
+        )
+
+    @callback
+    def _async_schedule_optimization(self) -> None:
+        """Start the optimizer when the forecast changed and none is running."""
+        forecast = self.forecast
+        if forecast is None or not len(forecast.soc) or self._optimizing:
+            return
+        if self.optimum is not None and self.optimum.key == forecast.key:
+            return
+        self._optimizing = True
+        self.hass.async_create_background_task(
+            self._async_optimize(forecast), f"{DOMAIN} optimizer"
+        )
+
+    @callback
+    def _async_fire_transitions(self, data: Mapping[str, Any]) -> None:
+        """Fire events for what changed since the previous snapshot."""
+        command = command_payload(data.get("current_commands") or [])
+        self._async_fire(
+            self._transitions.snapshot_events(self.plan, command, dt_util.utcnow())
+        )
+        self._async_schedule_step_timer()
+
+    @callback
+    def _async_fire(self, events: list[tuple[str, dict[str, Any]]]) -> None:
+        """Fire events tagged with the inverter they belong to."""
+        for event_type, payload in events:
+            self.hass.bus.async_fire(
+                event_type, {"inverter_id": self.api.inverter_id, **payload}
+            )
+
+    @callback
+    def _async_schedule_step_timer(self) -> None:
+        """Wake up exactly at the next step boundary of the plan."""
+        if self._cancel_step_timer is not None:
+            self._cancel_step_timer()
+            self._cancel_step_timer = None
+        if self.plan is None:
+            return
+        if (boundary := next_boundary(self.plan, dt_util.utcnow())) is not None:
+            self._cancel_step_timer = async_track_point_in_utc_time(
+                self.hass, self._async_step_boundary, boundary
+            )
+
+    @callback
+    def _async_step_boundary(self, now: datetime) -> None:
+        """Fire step_started when a step begins between two updates."""
+        self._cancel_step_timer = None
+        self._async_fire(self._transitions.step_events(now))
+        self._async_schedule_step_timer()
+
+    async def async_shutdown(self) -> None:
+        """Cancel the step timer and write pending exports on unload."""
+        if self._cancel_step_timer is not None:
+            self._cancel_step_timer()
+            self._cancel_step_timer = None
+        await self.async_write_parquet()
+        await super().async_shutdown()
+
+    async def _async_optimize(self, forecast: SocForecast) -> None:
+        """Run the DP optimizer in the shared process pool."""
+        from .optimizer import optimize
+
+        pool = self.hass.data.get(DATA_OPTIMIZER_POOL)
+        if pool is None:
+            # fork vícevláknového procesu může zdědit zamčené zámky, proto spawn
+            pool = self.hass.data[DATA_OPTIMIZER_POOL] = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            )
+        try:
+            result = await asyncio.wait_for(
+                self.hass.loop.run_in_executor(pool, optimize, forecast),
+                OPTIMIZER_TIMEOUT,
+            )
+        except (BrokenProcessPool, TimeoutError) as err:
+            # Úloha po timeoutu dál běží v jediném workeru, pool se zahodí
+            _LOGGER.warning("Optimizer process failed: %s", err or "timeout")
+            if self.hass.data.get(DATA_OPTIMIZER_POOL) is pool:
+                del self.hass.data[DATA_OPTIMIZER_POOL]
+            shutdown_optimizer_pool(pool)
+            return
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.warning("Plan optimization failed: %s", err)
+            return
+        finally:
+            self._optimizing = False
+
+        if not math.isfinite(result.cost):
+            _LOGGER.debug("No feasible schedule reaches the forecast end SoC")
+            return
+        _LOGGER.debug(
+            "Optimized %d steps with %d SoC states in %.0f ms, gap %.2f Kč",
+            len(result.soc),
+            result.states,
+            result.elapsed_ms,
+            result.gap,
+        )
+        self.optimum = result
+        self.async_update_listeners()
+
+    async def async_restore(self) -> None:
+        """Restore persisted totals before the first snapshot is built."""
+        if stored := await self._accounting_store.async_load():
+            self.accounting.restore(stored)
+        if stored := await self._accuracy_store.async_load():
+            self.accuracy.restore(stored)
+
+    async def async_load_forecaster(self) -> None:
+        """Import the NumPy based forecaster outside the event loop."""
+        try:
+            module = await self.hass.async_add_import_executor_job(
+                importlib.import_module, f"{__package__}.forecast"
+            )
+        except ImportError as err:
+            _LOGGER.warning("SoC forecast disabled, NumPy is not available: %s", err)
+            return
+        self._forecaster = module.SocForecaster()
+
+    def slot_prices(self) -> SlotPrices | None:
+        """Return uniform slot prices of the timeline, built once per revision."""
+        timeline = self.price_timeline
+        if timeline is None:
+            return None
+        if self._slot_prices is None or self._slot_prices.revision != timeline.revision:
+            self._slot_prices = build_slot_prices(timeline)
+        return self._slot_prices
+
+    def price_rank(self, now: datetime) -> PriceRank | None:
+        """Return the sorted price window from the running step.
+
+        The window is sorted once per timeline revision and running step;
+        entities then query it with a binary search.
+        """
+        timeline = self.price_timeline
+        if timeline is None or (index := timeline.index_at(now)) is None:
+            return None
+        if self._price_rank is None or self._price_rank.key != (timeline.revision, index):
+            self._price_rank = build_price_rank(
+                timeline, index, timedelta(hours=PRICE_RANK_WINDOW)
+            )
+        return self._price_rank
+
+    async def _async_refresh_tariff(self) -> None:
+        """Load the tariff from disk, refetch it once its TTL has expired."""
+        now = dt_util.utcnow()
+        if self._tariff_due is None:
+            stored = await self._tariff_store.async_load()
+            if stored and (fetched_at := dt_util.parse_datetime(stored["fetched_at"])):
+                self.tariff = stored["prices"]
+                self._tariff_fetched_at = fetched_at
+                self._tariff_due = fetched_at + timedelta(seconds=TARIFF_CACHE_TTL)
+            else:
+                self._tariff_due = now
+
+        if now < self._tariff_due:
+            return
+
+        try:
+            prices = await self.hass.async_add_executor_job(
+                self.api.get_distribution_prices
+            )
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.warning("Failed to fetch distribution prices: %s", err)
+            self._tariff_due = now + timedelta(seconds=TARIFF_RETRY_INTERVAL)
+            return
+
+        if not prices:
+            # Parser už zalogoval, co v odpovědi chybí
+            self._tariff_due = now + timedelta(seconds=TARIFF_RETRY_INTERVAL)
+            return
+
+        self.tariff = prices
+        self._tariff_fetched_at = now
+        self._tariff_due = now + timedelta(seconds=TARIFF_CACHE_TTL)
+        await self._tariff_store.async_save(
+            {"fetched_at": now.isoformat(), "prices": prices}
+        )
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update all listeners and record how long the state writes took."""
+        profiler = self._profiler
+        started = time.perf_counter()
+        if profiler is not None:
+            profiler.run(super().async_update_listeners)
+        else:
+            super().async_update_listeners()
+        self.api.stats.render_ms.add((time.perf_counter() - started) * 1000)
+
+    async def async_set_initial_data(self, data: dict[str, Any]) -> None:
+        """Use data fetched elsewhere (config flow, MQTT) instead of polling."""
+        snapshot = await self._async_build_snapshot(data)
+        self.async_set_updated_data(snapshot)
+        self._async_schedule_optimization()
+        self._async_fire_transitions(snapshot)
+        self._async_publish_mqtt(snapshot)
+        self._async_cycle_done()
+
+    async def async_start_mqtt_publisher(self, prefix: str) -> None:
+        """Publish every snapshot to MQTT for other nodes."""
+        from homeassistant.components import mqtt
+
+        from .mqtt_bridge import MqttPublisher
+
+        if not await mqtt.async_wait_for_mqtt_client(self.hass):
+            _LOGGER.warning("MQTT is not available, snapshots will not be published")
+            return
+        self._mqtt_publisher = MqttPublisher(self.hass, prefix, self.api.inverter_id)
+
+    async def async_start_mqtt_subscriber(self, prefix: str) -> CALLBACK_TYPE:
+        """Take snapshots from MQTT instead of polling the API.
+
+        Waits for the first complete snapshot (normally the retained
+        messages), so entities are created with data.
+        """
+        from homeassistant.components import mqtt
+
+        from .mqtt_bridge import MqttSubscriber
+
+        if not await mqtt.async_wait_for_mqtt_client(self.hass):
+            raise ConfigEntryNotReady("MQTT is not available")
+
+        first = asyncio.Event()
+
+        async def _async_apply(
+            data: dict[str, Any], tariff: dict[str, Any] | None
+        ) -> None:
+            if tariff is not None:
+                self.tariff = tariff["prices"]
+                self._tariff_fetched_at = dt_util.parse_datetime(tariff["fetched_at"])
+            await self.async_set_initial_data(data)
+            first.set()
+
+        @callback
+        def _async_snapshot(
+            data: dict[str, Any], tariff: dict[str, Any] | None
+        ) -> None:
+            self.hass.async_create_task(_async_apply(data, tariff))
+
+        self._mqtt_subscribed = True
+        self.update_interval = None
+        unsubscribe = await MqttSubscriber(
+            self.hass, prefix, self.api.inverter_id, _async_snapshot
+        ).async_subscribe()
+        try:
+            await asyncio.wait_for(first.wait(), MQTT_FIRST_DATA_TIMEOUT)
+        except TimeoutError as err:
+            unsubscribe()
+            raise ConfigEntryNotReady(
+                f"No Proteus data on MQTT topic {prefix}/{self.api.inverter_id}"
+            ) from err
+        return unsubscribe
+
+    @callback
+    def _async_publish_mqtt(self, data: Mapping[str, Any]) -> None:
+        """Publish the changed parts of a snapshot in the background."""
+        if self._mqtt_publisher is None:
+            return
+        tariff = None
+        if self.tariff is not None and self._tariff_fetched_at is not None:
+            tariff = {
+                "fetched_at": self._tariff_fetched_at.isoformat(),
+                "prices": self.tariff,
+            }
+        self.hass.async_create_background_task(
+            self._mqtt_publisher.async_publish(data, tariff), f"{DOMAIN} mqtt publish"
+        )
+
+    @callback
+    def async_start_profiling(self, profiler: CycleProfiler) -> None:
+        """Profile the next update cycles with the given profiler."""
+        self._profiler = profiler
+
+    @property
+    def profiling(self) -> bool:
+        """Return True while update cycles are being profiled."""
+        return self._profiler is not None
+
+    @callback
+    def _async_cycle_done(self) -> None:
+        """Count a finished update cycle and write a complete profile.
+
+        The profiler stays active until the write task starts, so the
+        listener updates of the last cycle are still captured.
+        """
+        profiler = self._profiler
+        if profiler is not None and profiler.cycle_done():
+            self.hass.async_create_task(self._async_write_profile(profiler))
+
+    async def _async_write_profile(self, profiler: CycleProfiler) -> None:
+        """Write a finished profile to disk."""
+        if self._profiler is profiler:
+            self._profiler = None
+        if profiler.skipped:
+            _LOGGER.debug("%d overlapping calls were not profiled", profiler.skipped)
+        try:
+            path = await self.hass.async_add_executor_job(profiler.write)
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.error("Failed to write Proteus profile: %s", err)
+            return
+        _LOGGER.warning("Proteus profile written to %s", path)
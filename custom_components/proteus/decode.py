@@ -0,0 +1,112 @@
+"""JSON decoding and typed views of the dashboard payloads.
+
+Lines are decoded with orjson or msgspec when installed (Home Assistant
+ships orjson), the standard library otherwise. lastState and currentStep
+are then read once per snapshot into typed structures, so entities use
+attributes instead of walking the nested JSONL lines.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass, fields
+import json
+from typing import Any
+
+from .const import LAST_STATE_FIELDS
+from .plan import MODE_LABELS, jsonl_objects
+
+json_loads: Callable[[bytes | str], Any]
+try:
+    import orjson
+except ImportError:
+    try:
+        import msgspec
+    except ImportError:
+        JSON_DECODER = "json"
+        json_loads = json.loads
+        DECODE_ERRORS: tuple[type[Exception], ...] = (ValueError,)
+    else:
+        JSON_DECODER = "msgspec"
+        json_loads = msgspec.json.Decoder().decode
+        DECODE_ERRORS = (ValueError, msgspec.DecodeError)
+else:
+    JSON_DECODER = "orjson"
+    json_loads = orjson.loads
+    DECODE_ERRORS = (ValueError,)
+
+
+def _number(value: Any) -> float | None:
+    """Return the value if it is a number (bool excluded)."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+@dataclass(frozen=True, slots=True)
+class LastState:
+    """Numeric telemetry of inverters.lastState (W, Wh since midnight, %)."""
+
+    soc: float | None = None
+    battery_power: float | None = None
+    photovoltaic_power: float | None = None
+    consumption_power: float | None = None
+    grid_power: float | None = None
+    photovoltaic_energy: float | None = None
+    consumption_energy: float | None = None
+    grid_in_energy: float | None = None
+    grid_out_energy: float | None = None
+
+    @classmethod
+    def from_lines(cls, lines: list) -> LastState:
+        """Read the first value of every field from the JSONL lines."""
+        values: dict[str, float | None] = {}
+        for data in jsonl_objects(lines):
+            for column, key in LAST_STATE_FIELDS.items():
+                if column not in values and key in data:
+                    values[column] = _number(data[key])
+            if len(values) == len(LAST_STATE_FIELDS):
+                break
+        return cls(**values)
+
+    def counters(self) -> dict[str, float]:
+        """Return the present values keyed by their lastState key."""
+        return {
+            LAST_STATE_FIELDS[field.name]: value
+            for field in fields(self)
+            if (value := getattr(self, field.name)) is not None
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class CurrentStep:
+    """Running step as reported by inverters.currentStep."""
+
+    mode: str
+    target_soc: float | None
+    price_mwh_consumption: float | None
+
+    @classmethod
+    def from_lines(cls, lines: list) -> CurrentStep | None:
+        """Return the step whose metadata carries the battery mode."""
+        # TRPC posílá i řádky s odkazy, krok je ten s flexalgoBattery
+        for data in jsonl_objects(lines):
+            metadata = data.get("metadata")
+            if isinstance(metadata, dict) and "flexalgoBattery" in metadata:
+                return cls(
+                    mode=metadata["flexalgoBattery"],
+                    target_soc=_number(metadata.get("targetSoC")),
+                    price_mwh_consumption=_number(metadata.get("priceMwhConsumption")),
+                )
+        return None
+
+    @property
+    def mode_label(self) -> str:
+        """Return human readable battery mode."""
+        return MODE_LABELS.get(self.mode, self.mode)
+
+    @property
+    def price_kwh(self) -> float | None:
+        """Return consumption price in Kč/kWh."""
+        if self.price_mwh_consumption is None:
+            return None
+        return round(self.price_mwh_consumption / 1000, 2)
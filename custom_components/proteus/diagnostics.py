@@ -0,0 +1,35 @@
+"""Diagnostics support for Proteus."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_EMAIL, CONF_PASSWORD
+from homeassistant.core import HomeAssistant
+
+from .coordinator import ProteusDataUpdateCoordinator
+from .const import DOMAIN
+from .decode import JSON_DECODER
+
+TO_REDACT = {CONF_EMAIL, CONF_PASSWORD}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: ProteusDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+    data = coordinator.data or {}
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "last_update_success": coordinator.last_update_success,
+        # Jen počty JSONL řádků - data obsahují i ws token
+        "data_lines": {
+            key: len(value) if isinstance(value, list) else None
+            for key, value in data.items()
+        },
+        "api_stats": coordinator.api.stats.as_dict(),
+        "json_decoder": JSON_DECODER,
+    }
@@ -0,0 +1,132 @@
+"""Events fired on plan, step and command transitions."""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from .const import DOMAIN
+from .plan import ControlPlan, PlanStep, jsonl_objects
+
+EVENT_STEP_STARTED = f"{DOMAIN}_step_started"
+EVENT_PLAN_CHANGED = f"{DOMAIN}_plan_changed"
+EVENT_COMMAND_CHANGED = f"{DOMAIN}_command_changed"
+
+# Nejvýše tolik změněných kroků se pošle v události plan_changed
+MAX_CHANGED_STEPS = 48
+
+
+def step_fields(step: PlanStep) -> dict[str, Any]:
+    """Return the fields of a step that automations react to."""
+    return {
+        "mode": step.mode,
+        "target_soc": step.target_soc,
+        "price_kwh": step.price_kwh,
+    }
+
+
+def _diff(old: dict[str, Any] | None, new: dict[str, Any]) -> dict[str, Any]:
+    """Return the items of new that differ from old."""
+    if old is None:
+        return dict(new)
+    return {key: value for key, value in new.items() if old.get(key) != value}
+
+
+def command_payload(lines: list) -> dict[str, Any] | None:
+    """Return the commands.current object from its JSONL lines."""
+    return next(jsonl_objects(lines), None)
+
+
+def next_boundary(plan: ControlPlan, now: datetime) -> datetime | None:
+    """Return when the running step ends or the next step starts."""
+    if (step := plan.step_at(now)) is not None:
+        return step.end
+    index, _ = plan.bounds(now)
+    return plan.starts[index] if index < len(plan.starts) else None
+
+
+class TransitionTracker:
+    """Remember the last seen plan, step and command and diff new ones.
+
+    The first observation only primes the tracker so that a restart does
+    not fire events for state that did not actually change.
+    """
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self._primed = False
+        self._plan: ControlPlan | None = None
+        self._step: PlanStep | None = None
+        self._command: dict[str, Any] | None = None
+
+    def snapshot_events(
+        self, plan: ControlPlan | None, command: dict[str, Any] | None, now: datetime
+    ) -> list[tuple[str, dict[str, Any]]]:
+        """Return events for a new snapshot."""
+        events: list[tuple[str, dict[str, Any]]] = []
+        if not self._primed:
+            self._primed = True
+            self._plan, self._command = plan, command
+            self._step = plan.step_at(now) if plan is not None else None
+            return events
+
+        if plan is not None and (
+            self._plan is None or plan.revision != self._plan.revision
+        ):
+            events.append((EVENT_PLAN_CHANGED, self._plan_diff(self._plan, plan)))
+        self._plan = plan
+
+        if command is not None and command != self._command:
+            previous = self._command or {}
+            payload: dict[str, Any] = {"changed": _diff(previous, command)}
+            if removed := [key for key in previous if key not in command]:
+                payload["removed"] = removed
+            events.append((EVENT_COMMAND_CHANGED, payload))
+            self._command = command
+
+        events.extend(self.step_events(now))
+        return events
+
+    def step_events(self, now: datetime) -> list[tuple[str, dict[str, Any]]]:
+        """Return a step_started event if another step is running now."""
+        step = self._plan.step_at(now) if self._plan is not None else None
+        previous, self._step = self._step, step
+        if step is None or (previous is not None and previous.start == step.start):
+            return []
+        old = step_fields(previous) if previous is not None else None
+        payload = {
+            "start": step.start.isoformat(),
+            "end": step.end.isoformat(),
+            **_diff(old, step_fields(step)),
+        }
+        return [(EVENT_STEP_STARTED, payload)]
+
+    @staticmethod
+    def _plan_diff(old: ControlPlan | None, new: ControlPlan) -> dict[str, Any]:
+        """Describe how the new plan differs from the old one, step by step."""
+        payload: dict[str, Any] = {
+            "plan_id": new.id,
+            "revision": new.revision,
+            "steps": len(new.steps),
+        }
+        if old is None:
+            return payload
+
+        old_steps = {step.start: step_fields(step) for step in old.steps}
+        changed = []
+        added = 0
+        for step in new.steps:
+            previous = old_steps.pop(step.start, None)
+            if previous is None:
+                added += 1
+                continue
+            if diff := _diff(previous, step_fields(step)):
+                changed.append({"start": step.start.isoformat(), **diff})
+
+        payload.update(
+            previous_revision=old.revision,
+            added=added,
+            removed=len(old_steps),
+            changed_count=len(changed),
+            changed=changed[:MAX_CHANGED_STEPS],
+        )
+        return payload
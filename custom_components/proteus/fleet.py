@@ -0,0 +1,357 @@
+"""Headless fleet poller: many accounts and inverters in one process.
+
+Run with ``python -m custom_components.proteus.fleet accounts.json``. The
+accounts file is a JSON list of ``{"email", "password", "inverters"}``
+objects; without ``inverters`` all inverters of the account are polled.
+
+All polling runs on a single event loop. The blocking client calls go to
+worker threads, a semaphore bounds how many run at once and every account
+keeps its own rate limiter, so thousands of inverters share one process
+without exceeding the per-account request budget. Snapshots are buffered
+and written to SQLite (WAL) in one bulk insert per cycle; with
+``--parquet`` they are also exported to partitioned Parquet files.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import json
+import logging
+import sqlite3
+import time
+from typing import TYPE_CHECKING, Any
+
+from .api import API_BASE_URL, ProteusAccount, ProteusAPI
+from .const import LAST_STATE_FIELDS
+from .decode import LastState
+from .plan import ControlPlan, extract_from_jsonl
+
+if TYPE_CHECKING:
+    from .parquet import ParquetExporter
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 32
+DEFAULT_INTERVAL = 300  # s
+DEFAULT_DATABASE = "proteus_fleet.db"
+DEFAULT_PARQUET_FLUSH_SAMPLES = 100_000
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS snapshots (
+    inverter_id TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    {", ".join(f"{column} REAL" for column in LAST_STATE_FIELDS)},
+    plan_revision TEXT,
+    step_mode TEXT,
+    step_target_soc REAL,
+    duration_ms REAL,
+    last_state TEXT
+);
+CREATE INDEX IF NOT EXISTS snapshots_inverter_time
+    ON snapshots (inverter_id, fetched_at);
+CREATE TABLE IF NOT EXISTS plans (
+    inverter_id TEXT NOT NULL,
+    revision TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    plan_id TEXT,
+    steps TEXT NOT NULL,
+    PRIMARY KEY (inverter_id, revision)
+);
+"""
+
+_SNAPSHOT_COLUMNS = (
+    "inverter_id",
+    "fetched_at",
+    *LAST_STATE_FIELDS,
+    "plan_revision",
+    "step_mode",
+    "step_target_soc",
+    "duration_ms",
+    "last_state",
+)
+_INSERT_SNAPSHOT = (
+    f"INSERT INTO snapshots ({', '.join(_SNAPSHOT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(_SNAPSHOT_COLUMNS))})"
+)
+_INSERT_PLAN = (
+    "INSERT OR IGNORE INTO plans (inverter_id, revision, fetched_at, plan_id, steps) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+
+@dataclass(slots=True)
+class FleetAccount:
+    """One account of the fleet and the clients of its inverters."""
+
+    account: ProteusAccount
+    inverter_ids: list[str] | None
+    clients: dict[str, ProteusAPI] = field(default_factory=dict)
+    # Požadavky jednoho účtu jdou po sobě, mezery hlídá rate limiter účtu
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+def load_accounts(path: str, base_url: str = API_BASE_URL) -> list[FleetAccount]:
+    """Read the accounts file."""
+    with open(path, encoding="utf-8") as file:
+        entries = json.load(file)
+    return [
+        FleetAccount(
+            account=ProteusAccount(entry["email"], entry["password"], base_url),
+            inverter_ids=entry.get("inverters"),
+        )
+        for entry in entries
+    ]
+
+
+def snapshot_row(
+    inverter_id: str,
+    fetched_at: datetime,
+    data: dict[str, Any],
+    state: LastState,
+    plan: ControlPlan | None,
+    duration_ms: float,
+) -> tuple:
+    """Return the snapshots row of one dashboard fetch."""
+    last_state = data.get("last_state") or []
+    step = plan.step_at(fetched_at) if plan is not None else None
+    return (
+        inverter_id,
+        fetched_at.isoformat(),
+        *(getattr(state, column) for column in LAST_STATE_FIELDS),
+        plan.revision if plan is not None else None,
+        step.mode if step is not None else None,
+        step.target_soc if step is not None else None,
+        round(duration_ms, 1),
+        json.dumps(last_state, separators=(",", ":")) if last_state else None,
+    )
+
+
+def plan_row(inverter_id: str, fetched_at: datetime, plan: ControlPlan) -> tuple:
+    """Return the plans row of a plan revision."""
+    steps = [step.raw for step in plan.steps]
+    return (
+        inverter_id,
+        plan.revision,
+        fetched_at.isoformat(),
+        plan.id,
+        json.dumps(steps, separators=(",", ":")),
+    )
+
+
+class SnapshotStore:
+    """SQLite sink with WAL journaling and bulk inserts."""
+
+    def __init__(self, path: str) -> None:
+        """Open the database and create the schema."""
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def write(self, snapshots: list[tuple], plans: list[tuple]) -> None:
+        """Insert one cycle of rows in a single transaction."""
+        with self._conn:
+            self._conn.executemany(_INSERT_SNAPSHOT, snapshots)
+            self._conn.executemany(_INSERT_PLAN, plans)
+
+    def close(self) -> None:
+        """Close the database."""
+        self._conn.close()
+
+
+class FleetPoller:
+    """Poll all inverters of all accounts on one event loop."""
+
+    def __init__(
+        self,
+        accounts: list[FleetAccount],
+        store: SnapshotStore,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        exporter: ParquetExporter | None = None,
+    ) -> None:
+        """Initialize."""
+        self.accounts = accounts
+        self.store = store
+        self.exporter = exporter
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._snapshots: list[tuple] = []
+        self._plans: list[tuple] = []
+        # Poslední uložená revize plánu každého měniče
+        self._revisions: dict[str, str] = {}
+
+    async def _call(self, fleet_account: FleetAccount, func, *args):
+        """Run a blocking client call within the account and global limits."""
+        # Na volný slot účtu se čeká na smyčce, ne v pracovním vlákně
+        if delay := fleet_account.account.rate_limiter.pending():
+            await asyncio.sleep(delay)
+        async with self._semaphore:
+            return await asyncio.to_thread(func, *args)
+
+    async def _prepare(self, fleet_account: FleetAccount) -> bool:
+        """Log in and create the inverter clients of an account."""
+        account = fleet_account.account
+        if not await self._call(fleet_account, account.login):
+            _LOGGER.warning("Login failed for %s", account.email)
+            return False
+        if fleet_account.clients:
+            return True
+
+        inverter_ids = fleet_account.inverter_ids
+        if inverter_ids is None:
+            probe = ProteusAPI(account.email, account.password, account=account)
+            inverters = await self._call(fleet_account, probe.get_user_inverters)
+            inverter_ids = [inverter["inverter_id"] for inverter in inverters]
+        fleet_account.clients = {
+            inverter_id: ProteusAPI(
+                account.email, account.password, inverter_id, account=account
+            )
+            for inverter_id in inverter_ids
+        }
+        return True
+
+    async def _poll_account(self, fleet_account: FleetAccount) -> None:
+        """Fetch the dashboard of every inverter of one account."""
+        async with fleet_account.lock:
+            if not await self._prepare(fleet_account):
+                return
+            for inverter_id, api in fleet_account.clients.items():
+                started = time.perf_counter()
+                try:
+                    data = await self._call(fleet_account, api.get_dashboard_data)
+                except Exception as err:  # pylint: disable=broad-except
+                    _LOGGER.warning("Polling %s failed: %s", inverter_id, err)
+                    response = getattr(err, "response", None)
+                    if getattr(response, "status_code", None) in (401, 403):
+                        # Prošlá session, v dalším cyklu se účet přihlásí znovu
+                        fleet_account.account.session_cookie = None
+                    continue
+                self._store(inverter_id, api, data, started)
+
+    def _store(
+        self, inverter_id: str, api: ProteusAPI, data: dict[str, Any], started: float
+    ) -> None:
+        """Buffer the rows of one fetched dashboard."""
+        fetched_at = datetime.now(timezone.utc)
+        duration_ms = (time.perf_counter() - started) * 1000
+        active_plan = extract_from_jsonl(data.get("control_plans") or [], "activePlan")
+        plan = api.parse_active_plan(active_plan) if isinstance(active_plan, dict) else None
+        state = LastState.from_lines(data.get("last_state") or [])
+        self._snapshots.append(
+            snapshot_row(inverter_id, fetched_at, data, state, plan, duration_ms)
+        )
+        if plan is not None and self._revisions.get(inverter_id) != plan.revision:
+            self._revisions[inverter_id] = plan.revision
+            self._plans.append(plan_row(inverter_id, fetched_at, plan))
+        if self.exporter is not None:
+            self.exporter.add_sample(inverter_id, fetched_at, state, plan)
+            if plan is not None:
+                self.exporter.add_plan(inverter_id, fetched_at, plan)
+
+    async def poll_once(self) -> int:
+        """Poll every inverter once and write the cycle; return rows written."""
+        await asyncio.gather(*map(self._poll_account, self.accounts))
+        snapshots, self._snapshots = self._snapshots, []
+        plans, self._plans = self._plans, []
+        if snapshots or plans:
+            await asyncio.to_thread(self.store.write, snapshots, plans)
+        if self.exporter is not None and self.exporter.due:
+            await self.write_parquet()
+        return len(snapshots)
+
+    async def write_parquet(self) -> None:
+        """Write the buffered Parquet rows."""
+        if self.exporter is None or not self.exporter.pending:
+            return
+        from .parquet import write_batches
+
+        paths = await asyncio.to_thread(
+            write_batches, self.exporter.root, self.exporter.take()
+        )
+        _LOGGER.info("Wrote %d Parquet files", len(paths))
+
+    async def run(self, interval: float, cycles: int | None = None) -> None:
+        """Poll in fixed intervals until cancelled or cycles are done."""
+        loop = asyncio.get_running_loop()
+        # Vlákna navíc pro login a zápis do databáze mimo semafor
+        loop.set_default_executor(ThreadPoolExecutor(self.concurrency + 2))
+        cycle = 0
+        while cycles is None or cycle < cycles:
+            started = loop.time()
+            written = await self.poll_once()
+            cycle += 1
+            _LOGGER.info(
+                "Cycle %d: %d snapshots in %.1f s",
+                cycle,
+                written,
+                loop.time() - started,
+            )
+            if cycles is not None and cycle >= cycles:
+                break
+            await asyncio.sleep(max(interval - (loop.time() - started), 0))
+
+    def close(self) -> None:
+        """Close all clients and the store."""
+        for fleet_account in self.accounts:
+            fleet_account.account.close()
+        self.store.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        prog="python -m custom_components.proteus.fleet",
+        description="Poll many Proteus accounts and store snapshots in SQLite.",
+    )
+    parser.add_argument("accounts", help="JSON file with the accounts")
+    parser.add_argument("--db", default=DEFAULT_DATABASE, help="SQLite database")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL)
+    parser.add_argument("--cycles", type=int, help="stop after N cycles")
+    parser.add_argument("--base-url", default=API_BASE_URL, help="e.g. a mock server")
+    parser.add_argument("--parquet", metavar="DIR", help="also export to Parquet")
+    parser.add_argument(
+        "--parquet-flush-samples",
+        type=int,
+        default=DEFAULT_PARQUET_FLUSH_SAMPLES,
+        help="write after N samples (and at every UTC midnight)",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    if args.parquet and not importlib.util.find_spec("pyarrow"):
+        parser.error("--parquet requires pyarrow")
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+    async def _run() -> None:
+        from .parquet import ParquetExporter
+
+        poller = FleetPoller(
+            load_accounts(args.accounts, args.base_url),
+            SnapshotStore(args.db),
+            args.concurrency,
+            ParquetExporter(args.parquet, args.parquet_flush_samples)
+            if args.parquet
+            else None,
+        )
+        try:
+            await poller.run(args.interval, args.cycles)
+        finally:
+            await poller.write_parquet()
+            poller.close()
+
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Hand-off of the config flow session to config entry setup."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .api import ProteusAPI
+
+DATA_FLOW_CACHE = "proteus_flow_cache"
+
+# Jak dlouho čeká ověřená session na vytvoření config entry
+FLOW_CACHE_TTL = 300  # s
+
+
+@dataclass
+class FlowHandoff:
+    """Session, inverters and first data validated by the config flow."""
+
+    api: ProteusAPI
+    inverters: list[dict[str, Any]]
+    data: dict[str, Any]
+    cancel_expiry: CALLBACK_TYPE | None = None
+
+
+def _key(email: str, inverter_id: str | None) -> tuple[str, str | None]:
+    """Return the cache key for an account and inverter."""
+    return (email.strip().lower(), inverter_id)
+
+
+@callback
+def async_store_handoff(
+    hass: HomeAssistant,
+    api: ProteusAPI,
+    inverters: list[dict[str, Any]],
+    data: dict[str, Any],
+) -> None:
+    """Keep a validated session for the entry that is about to be created."""
+    cache: dict[tuple, FlowHandoff] = hass.data.setdefault(DATA_FLOW_CACHE, {})
+    key = _key(api.email, api.inverter_id)
+
+    if (previous := cache.pop(key, None)) is not None:
+        _async_discard(hass, previous)
+
+    handoff = FlowHandoff(api, inverters, data)
+
+    @callback
+    def _expire(_now: Any) -> None:
+        """Release the session if no entry picked it up."""
+        if cache.get(key) is handoff:
+            del cache[key]
+            handoff.cancel_expiry = None
+            _async_discard(hass, handoff)
+
+    handoff.cancel_expiry = async_call_later(hass, FLOW_CACHE_TTL, _expire)
+    cache[key] = handoff
+
+
+@callback
+def async_pop_handoff(
+    hass: HomeAssistant, email: str, password: str, inverter_id: str | None
+) -> FlowHandoff | None:
+    """Take the validated session for an entry, if there is one."""
+    cache: dict[tuple, FlowHandoff] = hass.data.get(DATA_FLOW_CACHE, {})
+    handoff = cache.pop(_key(email, inverter_id), None)
+    if handoff is None:
+        return None
+    if handoff.cancel_expiry is not None:
+        handoff.cancel_expiry()
+        handoff.cancel_expiry = None
+    if handoff.api.password != password:
+        _async_discard(hass, handoff)
+        return None
+    return handoff
+
+
+@callback
+def _async_discard(hass: HomeAssistant, handoff: FlowHandoff) -> None:
+    """Release the account reference held by a hand-off."""
+    if handoff.cancel_expiry is not None:
+        handoff.cancel_expiry()
+    hass.async_add_executor_job(handoff.api.close)
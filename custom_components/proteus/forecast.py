@@ -0,0 +1,225 @@
+"""Battery SoC trajectory forecast over the control plan horizon."""
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+import numpy as np
+
+from .plan import ControlPlan, jsonl_objects
+from .pricing import PriceTimeline
+
+# Pole datového objektu inverters.extendedDetail, každé v uvedené jednotce
+_CAPACITY_WH = "batteryCapacityWh"
+_CAPACITY_KWH = "batteryCapacityKwh"
+_MAX_CHARGE_W = "batteryMaxChargePower"
+_MAX_DISCHARGE_W = "batteryMaxDischargePower"
+_MIN_SOC = "batteryMinSoC"  # %
+
+
+@dataclass(frozen=True, slots=True)
+class BatteryParameters:
+    """Battery capacity and power limits."""
+
+    capacity_wh: float
+    max_charge_w: float
+    max_discharge_w: float
+    min_soc: float = 0.0
+
+
+def _detail_number(extended_detail: list, key: str) -> float | None:
+    """Return the first positive number stored under key in a data object."""
+    for data in jsonl_objects(extended_detail):
+        value = data.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+            return float(value)
+    return None
+
+
+def battery_parameters(
+    extended_detail: list, capacity_wh: float | None, power_w: float
+) -> BatteryParameters | None:
+    """Read battery parameters from the extendedDetail JSONL lines.
+
+    Only the known fields of the data object are read, each in its own unit.
+    Missing values fall back to the configured capacity and power (the
+    battery options); without any capacity there is no forecast.
+    """
+    capacity = _detail_number(extended_detail, _CAPACITY_WH)
+    if capacity is None and (kwh := _detail_number(extended_detail, _CAPACITY_KWH)):
+        capacity = kwh * 1000
+    capacity = capacity or capacity_wh
+    if not capacity:
+        return None
+
+    return BatteryParameters(
+        capacity_wh=capacity,
+        max_charge_w=_detail_number(extended_detail, _MAX_CHARGE_W) or power_w,
+        max_discharge_w=_detail_number(extended_detail, _MAX_DISCHARGE_W) or power_w,
+        min_soc=_detail_number(extended_detail, _MIN_SOC) or 0.0,
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class SocForecast:
+    """Projected battery and grid trajectory, one value per plan step."""
+
+    key: tuple
+    starts: tuple[datetime, ...]
+    step_hours: np.ndarray
+    battery: BatteryParameters
+    start_soc: float
+    # Vstupy simulace, ze kterých vychází i optimalizace (optimizer.py)
+    consumption_wh: np.ndarray
+    production_wh: np.ndarray
+    import_price: np.ndarray  # Kč/MWh
+    export_price: np.ndarray  # Kč/MWh
+    soc: np.ndarray  # % na konci kroku
+    grid_import_wh: np.ndarray
+    grid_export_wh: np.ndarray
+    cost: np.ndarray  # Kč za krok
+
+    @property
+    def total_import_kwh(self) -> float:
+        """Return grid import over the horizon in kWh."""
+        return float(self.grid_import_wh.sum()) / 1000
+
+    @property
+    def total_export_kwh(self) -> float:
+        """Return grid export over the horizon in kWh."""
+        return float(self.grid_export_wh.sum()) / 1000
+
+    @property
+    def total_cost(self) -> float:
+        """Return net grid cost over the horizon in Kč."""
+        return float(self.cost.sum())
+
+    def hourly_soc(self) -> list[int]:
+        """Return SoC sampled once per hour as a compact integer list."""
+        if not len(self.soc):
+            return []
+        elapsed = np.cumsum(self.step_hours)
+        hours = np.arange(1, int(elapsed[-1]) + 1)
+        index = np.minimum(np.searchsorted(elapsed, hours, side="left"), len(self.soc) - 1)
+        return np.rint(self.soc[index]).astype(int).tolist()
+
+
+class SocForecaster:
+    """Keeps the last forecast and recomputes it only when inputs change."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.forecast: SocForecast | None = None
+
+    def update(
+        self,
+        plan: ControlPlan,
+        timeline: PriceTimeline | None,
+        battery: BatteryParameters,
+        soc_now: float,
+        now: datetime,
+    ) -> SocForecast:
+        """Return the forecast for the current plan, step and SoC."""
+        # Začni krokem, který právě běží (nebo prvním budoucím)
+        first = bisect_right(plan.starts, now) - 1
+        if plan.step_at(now) is None:
+            first += 1
+        key = (
+            plan.revision,
+            timeline.revision if timeline is not None else None,
+            first,
+            round(soc_now),
+            battery,
+        )
+        if self.forecast is None or self.forecast.key != key:
+            self.forecast = forecast_soc(plan, timeline, battery, soc_now, first, key)
+        return self.forecast
+
+
+def forecast_soc(
+    plan: ControlPlan,
+    timeline: PriceTimeline | None,
+    battery: BatteryParameters,
+    soc_now: float,
+    first: int,
+    key: tuple,
+) -> SocForecast:
+    """Project SoC, grid flows and cost from step ``first`` to plan end.
+
+    Per-step demands and limits are computed as arrays; only the SoC
+    recursion (each step depends on the previous SoC through clipping) runs
+    as a scalar loop over the prepared arrays.
+    """
+    steps = plan.steps[first:]
+    count = len(steps)
+
+    hours = np.fromiter(
+        ((step.end - step.start).total_seconds() / 3600 for step in steps), float, count
+    )
+    consumption = np.fromiter((step.predicted_consumption for step in steps), float, count)
+    production = np.fromiter((step.predicted_production for step in steps), float, count)
+    target = np.fromiter((step.target_soc for step in steps), float, count)
+    modes = np.array([step.mode for step in steps], dtype=object)
+    export_price = np.fromiter(
+        (step.metadata.get("priceMwhProduction", 0) or 0 for step in steps), float, count
+    )
+    if timeline is not None and len(timeline.total_mwh) == len(plan.steps):
+        import_price = np.asarray(timeline.total_mwh[first:], dtype=float)
+    else:
+        import_price = np.fromiter((step.price_mwh_consumption for step in steps), float, count)
+
+    capacity = battery.capacity_wh
+    surplus = production - consumption
+    charge_limit = battery.max_charge_w * hours
+    discharge_limit = battery.max_discharge_w * hours
+
+    # Požadovaná změna energie baterie podle režimu kroku
+    grid_charge = modes == "charge_from_grid"
+    no_discharge = (modes == "do_not_discharge") | (modes == "charge_from_pv")
+    desired = np.where(no_discharge, np.maximum(surplus, 0), surplus)
+    floor = np.where(
+        modes == "discharge_to_household",
+        np.maximum(target, battery.min_soc),
+        battery.min_soc,
+    ) / 100 * capacity
+    target_wh = target / 100 * capacity
+
+    soc = np.empty(count)
+    level = soc_now / 100 * capacity
+    for i, (charge, want, up, down, low, goal) in enumerate(
+        zip(
+            grid_charge.tolist(),
+            desired.tolist(),
+            charge_limit.tolist(),
+            discharge_limit.tolist(),
+            floor.tolist(),
+            target_wh.tolist(),
+        )
+    ):
+        if charge:
+            want = max(goal - level, want)
+        delta = min(max(want, -down), up)
+        level = min(max(level + delta, min(low, level)), capacity)
+        soc[i] = level
+
+    battery_delta = np.diff(soc, prepend=soc_now / 100 * capacity)
+    grid = consumption - production + battery_delta
+    grid_import = np.maximum(grid, 0)
+    grid_export = np.maximum(-grid, 0)
+    cost = (grid_import * import_price - grid_export * export_price) / 1e6
+
+    return SocForecast(
+        key=key,
+        starts=tuple(step.start for step in steps),
+        step_hours=hours,
+        battery=battery,
+        start_soc=soc_now,
+        consumption_wh=consumption,
+        production_wh=production,
+        import_price=import_price,
+        export_price=export_price,
+        soc=soc / capacity * 100,
+        grid_import_wh=grid_import,
+        grid_export_wh=grid_export,
+        cost=cost,
+    )
@@ -0,0 +1,174 @@
+"""Cheapest run windows for flexible loads over the plan price timeline."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+import math
+
+from .pricing import PriceTimeline
+
+
+@dataclass(frozen=True, slots=True)
+class SlotPrices:
+    """Total price resampled to uniform slots, with prefix sums.
+
+    Slots not covered by any plan step count as gaps; a run window may not
+    overlap a gap.
+    """
+
+    revision: str
+    start: datetime
+    slot: timedelta
+    prices: tuple[float, ...]  # Kč/kWh
+    prefix: tuple[float, ...]  # len(prices) + 1
+    gaps: tuple[int, ...]  # prefix count of gap slots
+
+    @property
+    def end(self) -> datetime:
+        """Return the end of the last slot."""
+        return self.start + self.slot * len(self.prices)
+
+    def index_from(self, when: datetime) -> int:
+        """Return the first slot starting at or after when."""
+        if when <= self.start:
+            return 0
+        return math.ceil((when - self.start) / self.slot)
+
+    def index_until(self, when: datetime) -> int:
+        """Return the number of slots ending at or before when."""
+        if when >= self.end:
+            return len(self.prices)
+        return max(0, math.floor((when - self.start) / self.slot))
+
+    def window_sum(self, first: int, count: int) -> float | None:
+        """Return the price sum of count slots from first, None over a gap."""
+        last = first + count
+        if self.gaps[last] != self.gaps[first]:
+            return None
+        return self.prefix[last] - self.prefix[first]
+
+
+def build_slot_prices(timeline: PriceTimeline) -> SlotPrices | None:
+    """Resample the price timeline to its shortest step length."""
+    if not timeline.starts:
+        return None
+    slot = min(end - start for start, end in zip(timeline.starts, timeline.ends))
+    if slot <= timedelta(0):
+        return None
+
+    start = timeline.starts[0]
+    count = math.ceil((max(timeline.ends) - start) / slot)
+    prices = [0.0] * count
+    covered = [False] * count
+    for step_start, step_end, total in zip(
+        timeline.starts, timeline.ends, timeline.total_mwh
+    ):
+        first = math.floor((step_start - start) / slot)
+        last = math.ceil((step_end - start) / slot)
+        for index in range(first, last):
+            prices[index] = total / 1000
+            covered[index] = True
+
+    return SlotPrices(
+        revision=timeline.revision,
+        start=start,
+        slot=slot,
+        prices=tuple(prices),
+        prefix=tuple(accumulate(prices, initial=0.0)),
+        gaps=tuple(accumulate((not flag for flag in covered), initial=0)),
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class LoadWindow:
+    """Cheapest window found for one load."""
+
+    start: datetime
+    end: datetime
+    cost: float  # Kč
+    cost_earliest: float | None  # Kč, při spuštění v prvním celém slotu od earliest
+
+    @property
+    def savings_vs_earliest(self) -> float | None:
+        """Return how much waiting saves compared to starting at earliest."""
+        if self.cost_earliest is None:
+            return None
+        return self.cost_earliest - self.cost
+
+
+def _slot_energy(
+    energy_kwh: float | None, profile: list[float], slots: int, duration: timedelta
+) -> list[float]:
+    """Spread a shaped load over slots.
+
+    Profile values are kW over equal parts of the run; when energy is also
+    given, the profile only sets the shape and is scaled to that energy.
+    """
+    hours = duration.total_seconds() / 3600
+    # Každý slot převezme hodnotu té části profilu, do které padne jeho střed
+    parts = len(profile)
+    energy = [
+        profile[min(parts - 1, int((i + 0.5) * parts / slots))] * hours / slots
+        for i in range(slots)
+    ]
+    if energy_kwh is not None and (total := sum(energy)) > 0:
+        energy = [value * energy_kwh / total for value in energy]
+    return energy
+
+
+def find_window(
+    prices: SlotPrices,
+    duration: timedelta,
+    earliest: datetime,
+    deadline: datetime | None,
+    energy_kwh: float | None = None,
+    profile: list[float] | None = None,
+) -> LoadWindow | None:
+    """Return the cheapest window that starts after earliest and ends by deadline.
+
+    A flat profile is priced in O(1) per candidate start from the prefix
+    sums; a shaped profile is a sliding dot product over the slot prices.
+    """
+    slots = max(1, math.ceil(duration / prices.slot))
+    first = prices.index_from(earliest)
+    last = prices.index_until(deadline or prices.end) - slots
+    if last < first:
+        return None
+
+    if not profile or len(set(profile)) == 1:
+        if energy_kwh is None:
+            energy_kwh = profile[0] * duration.total_seconds() / 3600 if profile else 0.0
+        per_slot = energy_kwh / slots
+
+        def cost_at(index: int) -> float | None:
+            total = prices.window_sum(index, slots)
+            return total * per_slot if total is not None else None
+
+    else:
+        shaped = _slot_energy(energy_kwh, profile, slots, duration)
+
+        def cost_at(index: int) -> float | None:
+            if prices.window_sum(index, slots) is None:
+                return None
+            return sum(
+                energy * price
+                for energy, price in zip(shaped, prices.prices[index : index + slots])
+            )
+
+    best_index: int | None = None
+    best_cost = math.inf
+    for index in range(first, last + 1):
+        cost = cost_at(index)
+        if cost is not None and cost < best_cost:
+            best_index, best_cost = index, cost
+    if best_index is None:
+        return None
+
+    start = prices.start + prices.slot * best_index
+    return LoadWindow(
+        start=start,
+        end=start + duration,
+        cost=best_cost,
+        cost_earliest=cost_at(first),
+    )
@@ -0,0 +1,168 @@
+"""OpenMetrics exposition of Proteus telemetry and client statistics."""
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from datetime import datetime
+from typing import Any
+
+from .accounting import CostAccountant
+from .decode import LastState
+from .plan import ControlPlan
+from .stats import ApiStats, Histogram
+
+# Metriky v pořadí výpisu: název -> (typ, popis)
+FAMILIES: dict[str, tuple[str, str]] = {
+    "proteus_battery_soc_percent": ("gauge", "Battery state of charge."),
+    "proteus_power_watts": ("gauge", "Instantaneous power by flow."),
+    "proteus_daily_energy_watthours": (
+        "gauge",
+        "Energy since local midnight by flow (resets daily).",
+    ),
+    "proteus_plan_steps": ("gauge", "Number of steps in the active plan."),
+    "proteus_plan_target_soc_percent": ("gauge", "Target SoC of the running step."),
+    "proteus_plan_mode": ("info", "Battery mode of the running step."),
+    "proteus_price_czk_per_kwh": ("gauge", "Price of the running step."),
+    "proteus_forecast_soc_percent": ("gauge", "Forecast SoC at the plan horizon."),
+    "proteus_forecast_cost_czk": ("gauge", "Forecast net grid cost to the plan horizon."),
+    "proteus_net_cost_czk": ("gauge", "Grid import cost minus export revenue."),
+    "proteus_savings_czk": ("gauge", "Savings against buying all consumption."),
+    "proteus_api_request_duration_seconds": (
+        "histogram",
+        "Duration of dashboard batch requests.",
+    ),
+    "proteus_api_procedure_duration_seconds": (
+        "histogram",
+        "Time until each procedure's last line arrived.",
+    ),
+    "proteus_api_received_bytes": ("counter", "Response bytes received."),
+    "proteus_api_retries": ("counter", "Procedures retried after a failed batch line."),
+    "proteus_api_errors": ("counter", "Failed API requests."),
+    "proteus_api_rate_limit_hits": ("counter", "HTTP 429 responses."),
+    "proteus_api_procedure_errors": ("counter", "Failed procedures by name."),
+}
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+_POWER_FIELDS = {
+    "battery": "battery_power",
+    "photovoltaic": "photovoltaic_power",
+    "consumption": "consumption_power",
+    "grid": "grid_power",
+}
+_ENERGY_FIELDS = {
+    "photovoltaic": "photovoltaic_energy",
+    "consumption": "consumption_energy",
+    "grid_import": "grid_in_energy",
+    "grid_export": "grid_out_energy",
+}
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict[str, str]) -> str:
+    """Format a label set."""
+    return ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+
+
+def _number(value: float) -> str:
+    """Format a sample value."""
+    if isinstance(value, int):
+        return str(value)
+    return repr(round(float(value), 6))
+
+
+class MetricsBuffer:
+    """Sample lines of one config entry, grouped by metric family."""
+
+    def __init__(self, inverter_id: str) -> None:
+        """Initialize."""
+        self._base = {"inverter_id": inverter_id}
+        self.families: dict[str, list[str]] = {}
+
+    def add(
+        self, family: str, value: float | None, suffix: str = "", **labels: str
+    ) -> None:
+        """Append one sample, skipping missing values."""
+        if value is None:
+            return
+        label_set = _labels({**self._base, **labels})
+        self.families.setdefault(family, []).append(
+            f"{family}{suffix}{{{label_set}}} {_number(value)}"
+        )
+
+    def add_histogram(self, family: str, histogram: Histogram, **labels: str) -> None:
+        """Append the buckets, count and sum of a millisecond histogram."""
+        for bound, count in zip(histogram.bounds, histogram.cumulative()):
+            self.add(family, count, "_bucket", **labels, le=_number(bound / 1000))
+        self.add(family, histogram.count, "_bucket", **labels, le="+Inf")
+        self.add(family, histogram.count, "_count", **labels)
+        self.add(family, histogram.total / 1000, "_sum", **labels)
+
+
+def build_metrics(
+    inverter_id: str,
+    data: Mapping[str, Any],
+    stats: ApiStats,
+    now: datetime,
+    accounting: CostAccountant | None = None,
+) -> MetricsBuffer:
+    """Render all samples of one snapshot and the current cost totals."""
+    buffer = MetricsBuffer(inverter_id)
+
+    state: LastState = data["state"]
+    buffer.add("proteus_battery_soc_percent", state.soc)
+    for flow, field in _POWER_FIELDS.items():
+        buffer.add("proteus_power_watts", getattr(state, field), flow=flow)
+    for flow, field in _ENERGY_FIELDS.items():
+        buffer.add("proteus_daily_energy_watthours", getattr(state, field), flow=flow)
+
+    plan: ControlPlan | None = data.get("plan")
+    if plan is not None:
+        buffer.add("proteus_plan_steps", len(plan.steps))
+        if (step := plan.step_at(now)) is not None:
+            buffer.add("proteus_plan_target_soc_percent", step.target_soc)
+            buffer.add("proteus_plan_mode", 1, "_info", mode=step.mode)
+            buffer.add("proteus_price_czk_per_kwh", step.price_kwh, kind="market")
+    if (timeline := data.get("price_timeline")) is not None:
+        if (index := timeline.index_at(now)) is not None:
+            buffer.add("proteus_price_czk_per_kwh", timeline.total_kwh(index), kind="total")
+
+    if (forecast := data.get("forecast")) is not None and len(forecast.soc):
+        buffer.add("proteus_forecast_soc_percent", forecast.soc[-1])
+        buffer.add("proteus_forecast_cost_czk", forecast.total_cost)
+
+    if accounting is not None:
+        for period, totals in (("today", accounting.today), ("month", accounting.this_month)):
+            buffer.add("proteus_net_cost_czk", totals.net_cost, period=period)
+            buffer.add("proteus_savings_czk", totals.savings, period=period)
+
+    buffer.add_histogram("proteus_api_request_duration_seconds", stats.request_histogram)
+    for procedure, histogram in stats.procedure_histograms.items():
+        buffer.add_histogram(
+            "proteus_api_procedure_duration_seconds", histogram, procedure=procedure
+        )
+    buffer.add("proteus_api_received_bytes", stats.bytes_received.total, "_total")
+    buffer.add("proteus_api_retries", stats.retries, "_total")
+    buffer.add("proteus_api_errors", stats.errors, "_total")
+    buffer.add("proteus_api_rate_limit_hits", stats.rate_limit_hits, "_total")
+    for procedure, count in stats.procedure_errors.items():
+        buffer.add("proteus_api_procedure_errors", count, "_total", procedure=procedure)
+    return buffer
+
+
+def render_metrics(buffers: Iterable[MetricsBuffer]) -> bytes:
+    """Join the buffers of all entries into one exposition."""
+    buffers = list(buffers)
+    lines: list[str] = []
+    for family, (kind, description) in FAMILIES.items():
+        samples = [line for buffer in buffers for line in buffer.families.get(family, ())]
+        if not samples:
+            continue
+        lines.append(f"# TYPE {family} {kind}")
+        lines.append(f"# HELP {family} {description}")
+        lines.extend(samples)
+    lines.append("# EOF")
+    return ("\n".join(lines) + "\n").encode()
@@ -0,0 +1,152 @@
+"""Share decoded snapshots between Home Assistant nodes over MQTT.
+
+One node polls the Proteus API and publishes every dashboard procedure as
+a retained topic ``<prefix>/<inverter_id>/<key>``, only when its payload
+changed. Other nodes subscribe to those topics instead of polling, so the
+cloud traffic does not grow with the number of nodes.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from datetime import datetime
+import json
+import logging
+from typing import Any
+
+from homeassistant.components import mqtt
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .decode import DECODE_ERRORS, json_loads
+
+_LOGGER = logging.getLogger(__name__)
+
+# Procedury dashboardu sdílené přes MQTT (users.wsToken je tajný, neposílá se)
+MQTT_KEYS = (
+    "current_commands",
+    "current_step",
+    "extended_detail",
+    "last_state",
+    "rewards_summary",
+    "control_plans",
+)
+MQTT_TARIFF = "tariff"
+# Zprávy jednoho cyklu (a retained zprávy po přihlášení) se sloučí
+MQTT_DEBOUNCE = 1.0  # s
+
+
+def _topic(prefix: str, inverter_id: str, key: str) -> str:
+    """Return the topic of one snapshot key."""
+    return f"{prefix}/{inverter_id}/{key}"
+
+
+class MqttPublisher:
+    """Publish changed snapshot keys as retained messages."""
+
+    def __init__(self, hass: HomeAssistant, prefix: str, inverter_id: str) -> None:
+        """Initialize."""
+        self.hass = hass
+        self.prefix = prefix
+        self.inverter_id = inverter_id
+        # Naposledy publikovaný payload každého klíče
+        self._published: dict[str, str] = {}
+
+    async def async_publish(
+        self, data: dict[str, Any], tariff: dict[str, Any] | None
+    ) -> int:
+        """Publish keys whose payload differs from the last one; return count."""
+        values = {key: data.get(key) or [] for key in MQTT_KEYS}
+        if tariff is not None:
+            values[MQTT_TARIFF] = tariff
+        published = 0
+        for key, value in values.items():
+            payload = json.dumps(value, separators=(",", ":"))
+            if self._published.get(key) == payload:
+                continue
+            try:
+                await mqtt.async_publish(
+                    self.hass,
+                    _topic(self.prefix, self.inverter_id, key),
+                    payload,
+                    qos=1,
+                    retain=True,
+                )
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.warning("Failed to publish %s to MQTT: %s", key, err)
+                continue
+            self._published[key] = payload
+            published += 1
+        return published
+
+
+class MqttSubscriber:
+    """Assemble snapshots from the topics of a publishing node."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        prefix: str,
+        inverter_id: str,
+        on_snapshot: Callable[[dict[str, Any], dict[str, Any] | None], None],
+    ) -> None:
+        """Initialize."""
+        self.hass = hass
+        self.prefix = prefix
+        self.inverter_id = inverter_id
+        self._on_snapshot = on_snapshot
+        self._values: dict[str, Any] = {}
+        self._tariff: dict[str, Any] | None = None
+        self._cancel_debounce: CALLBACK_TYPE | None = None
+
+    async def async_subscribe(self) -> CALLBACK_TYPE:
+        """Subscribe to the topics; return the unsubscribe callback."""
+        unsubscribe = await mqtt.async_subscribe(
+            self.hass,
+            _topic(self.prefix, self.inverter_id, "+"),
+            self._async_message,
+            qos=1,
+        )
+
+        @callback
+        def _unsubscribe() -> None:
+            if self._cancel_debounce is not None:
+                self._cancel_debounce()
+                self._cancel_debounce = None
+            unsubscribe()
+
+        return _unsubscribe
+
+    @callback
+    def _async_message(self, msg: mqtt.ReceiveMessage) -> None:
+        """Store one received key and schedule the snapshot."""
+        key = msg.topic.rsplit("/", 1)[-1]
+        if key not in MQTT_KEYS and key != MQTT_TARIFF:
+            return
+        try:
+            value = json_loads(msg.payload)
+        except DECODE_ERRORS:
+            _LOGGER.warning("Invalid MQTT payload on %s", msg.topic)
+            return
+        if key == MQTT_TARIFF:
+            self._tariff = value
+        else:
+            self._values[key] = value
+        if self._cancel_debounce is None:
+            self._cancel_debounce = async_call_later(
+                self.hass, MQTT_DEBOUNCE, self._async_emit
+            )
+
+    @callback
+    def _async_emit(self, _now: datetime) -> None:
+        """Hand a complete snapshot to the coordinator."""
+        self._cancel_debounce = None
+        if any(key not in self._values for key in MQTT_KEYS):
+            return
+        data = {
+            "linkbox_state": [],
+            "inverter_detail": [],
+            "distribution_prices": [],
+            "ws_token": [],
+            **self._values,
+        }
+        self._on_snapshot(data, self._tariff)
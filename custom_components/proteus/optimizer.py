@@ -0,0 +1,102 @@
+"""Dynamic-programming optimum for the battery over the plan horizon.
+
+The optimizer sees the same prices and predictions as the SoC forecast and
+is used to benchmark the Proteus plan: the difference between the forecast
+cost and the optimal cost is the cost gap.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+import math
+import time
+
+import numpy as np
+
+from .const import OPTIMIZER_MAX_CELLS, OPTIMIZER_MAX_STATES
+from .forecast import SocForecast
+
+
+@dataclass(frozen=True, slots=True)
+class OptimizationResult:
+    """Optimal cost and SoC trajectory for one forecast."""
+
+    key: tuple
+    cost: float  # Kč
+    plan_cost: float  # Kč, cena podle plánu Proteus (forecast)
+    soc: np.ndarray  # % na konci kroku
+    states: int
+    elapsed_ms: float
+
+    @property
+    def gap(self) -> float:
+        """Return how much more the plan costs than the optimum in Kč."""
+        return self.plan_cost - self.cost
+
+
+def state_count(steps: int) -> int:
+    """Return the number of SoC levels that fits into the CPU budget."""
+    if steps <= 0:
+        return OPTIMIZER_MAX_STATES
+    fit = int(math.sqrt(OPTIMIZER_MAX_CELLS / steps))
+    return max(11, min(OPTIMIZER_MAX_STATES, fit))
+
+
+def optimize(forecast: SocForecast) -> OptimizationResult:
+    """Return the cheapest battery schedule for the forecast inputs.
+
+    SoC is discretized into evenly spaced levels. The cost-to-go is computed
+    backwards with one (levels × levels) transition matrix per step, so each
+    step is a handful of vectorized operations. The final SoC is required to
+    be at least the one the forecast ends with, otherwise the optimum would
+    simply drain the battery at the horizon.
+    """
+    started = time.perf_counter()
+    battery = forecast.battery
+    count = len(forecast.step_hours)
+    levels = state_count(count)
+    capacity = battery.capacity_wh
+    unit = capacity / (levels - 1)
+
+    index = np.arange(levels)
+    delta = (index[None, :] - index[:, None]) * unit  # Wh, z i do j
+    lowest = math.ceil(battery.min_soc / 100 * (levels - 1) - 1e-9)
+    # Pod minimální SoC se smí jen nabíjet
+    allowed = (index[None, :] >= lowest) | (index[None, :] >= index[:, None])
+
+    net = forecast.consumption_wh - forecast.production_wh
+    charge_limit = battery.max_charge_w * forecast.step_hours
+    discharge_limit = battery.max_discharge_w * forecast.step_hours
+
+    final = forecast.soc[-1] / 100 * capacity if count else 0.0
+    value = np.where(index * unit >= final - unit / 2, 0.0, np.inf)
+    policy = np.empty((count, levels), dtype=np.int32)
+
+    for t in range(count - 1, -1, -1):
+        grid = net[t] + delta
+        cost = (
+            np.where(grid > 0, grid * forecast.import_price[t], grid * forecast.export_price[t])
+            / 1e6
+        )
+        feasible = allowed & (delta <= charge_limit[t]) & (delta >= -discharge_limit[t])
+        total = np.where(feasible, cost + value[None, :], np.inf)
+        policy[t] = total.argmin(axis=1)
+        value = total[index, policy[t]]
+
+    state = int(round(forecast.start_soc / 100 * (levels - 1)))
+    state = min(max(state, 0), levels - 1)
+    best = float(value[state])
+
+    soc = np.empty(count)
+    for t in range(count):
+        state = int(policy[t, state])
+        soc[t] = state * 100 / (levels - 1)
+
+    return OptimizationResult(
+        key=forecast.key,
+        cost=best,
+        plan_cost=forecast.total_cost,
+        soc=soc,
+        states=levels,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
+
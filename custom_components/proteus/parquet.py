@@ -0,0 +1,203 @@
+"""Partitioned Parquet export of telemetry samples and plan steps.
+
+Rows are buffered column by column and written as one file per inverter
+and UTC day (``<root>/<dataset>/inverter_id=<id>/date=<YYYY-MM-DD>/``), so
+pandas, Polars or DuckDB read the whole tree as a hive partitioned
+dataset. pyarrow is optional and imported only when writing.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime
+import os
+import time
+from typing import Any
+from urllib.parse import quote
+
+from .const import LAST_STATE_FIELDS, PARQUET_FLUSH_SAMPLES
+from .decode import LastState
+from .plan import ControlPlan
+
+TELEMETRY_DATASET = "telemetry"
+PLAN_DATASET = "plan_steps"
+
+# Sloupce datasetů -> typ (timestamp je v UTC s mikrosekundami)
+DATASET_COLUMNS: dict[str, dict[str, str]] = {
+    TELEMETRY_DATASET: {
+        "time": "timestamp",
+        **dict.fromkeys(LAST_STATE_FIELDS, "float"),
+        "plan_revision": "string",
+        "step_mode": "string",
+        "step_target_soc": "float",
+    },
+    PLAN_DATASET: {
+        "fetched_at": "timestamp",
+        "plan_id": "string",
+        "revision": "string",
+        "start": "timestamp",
+        "end": "timestamp",
+        "mode": "string",
+        "target_soc": "float",
+        "price_mwh": "float",
+        "price_mwh_consumption": "float",
+        "price_mwh_production": "float",
+        "predicted_consumption": "float",
+        "predicted_production": "float",
+    },
+}
+
+# Buffer: (dataset, inverter, den) -> sloupce
+Batches = dict[tuple[str, str, date], dict[str, list]]
+
+
+def _number(value: Any) -> float | None:
+    """Return a numeric value as float."""
+    return float(value) if isinstance(value, (int, float)) else None
+
+
+class ParquetExporter:
+    """Buffer samples and plan revisions until they are written.
+
+    The buffer is due after ``flush_samples`` telemetry samples or once
+    samples of a new UTC day arrive. Plan rows do not count, a single
+    revision of a multi-day plan would otherwise force a write.
+    """
+
+    def __init__(self, root: str, flush_samples: int = PARQUET_FLUSH_SAMPLES) -> None:
+        """Initialize."""
+        self.root = root
+        self.flush_samples = flush_samples
+        self.samples = 0
+        self.plan_rows = 0
+        self._batches: Batches = {}
+        # UTC dny vzorků v bufferu
+        self._days: set[date] = set()
+        # Poslední zapsaná revize plánu každého měniče
+        self._revisions: dict[str, str] = {}
+
+    @property
+    def pending(self) -> int:
+        """Return the number of buffered rows of both datasets."""
+        return self.samples + self.plan_rows
+
+    @property
+    def due(self) -> bool:
+        """Return True when the buffer should be written."""
+        return self.samples >= self.flush_samples or len(self._days) > 1
+
+    def _append(
+        self, dataset: str, inverter_id: str, day: date, row: dict[str, Any]
+    ) -> None:
+        """Append one row to the columns of its partition."""
+        columns = self._batches.get((dataset, inverter_id, day))
+        if columns is None:
+            columns = self._batches[(dataset, inverter_id, day)] = {
+                name: [] for name in DATASET_COLUMNS[dataset]
+            }
+        for name, values in columns.items():
+            values.append(row[name])
+
+    def add_sample(
+        self,
+        inverter_id: str,
+        when: datetime,
+        state: LastState,
+        plan: ControlPlan | None,
+    ) -> None:
+        """Buffer one lastState sample, when in UTC."""
+        values = {column: _number(getattr(state, column)) for column in LAST_STATE_FIELDS}
+        if all(value is None for value in values.values()):
+            return
+        step = plan.step_at(when) if plan is not None else None
+        self.samples += 1
+        self._days.add(when.date())
+        self._append(
+            TELEMETRY_DATASET,
+            inverter_id,
+            when.date(),
+            {
+                "time": when,
+                **values,
+                "plan_revision": plan.revision if plan is not None else None,
+                "step_mode": step.mode if step is not None else None,
+                "step_target_soc": step.target_soc if step is not None else None,
+            },
+        )
+
+    def add_plan(self, inverter_id: str, when: datetime, plan: ControlPlan) -> None:
+        """Buffer the steps of a plan revision not written yet."""
+        if self._revisions.get(inverter_id) == plan.revision:
+            return
+        self._revisions[inverter_id] = plan.revision
+        self.plan_rows += len(plan.steps)
+        for step in plan.steps:
+            metadata = step.metadata
+            self._append(
+                PLAN_DATASET,
+                inverter_id,
+                step.start.date(),
+                {
+                    "fetched_at": when,
+                    "plan_id": plan.id,
+                    "revision": plan.revision,
+                    "start": step.start,
+                    "end": step.end,
+                    "mode": step.mode,
+                    "target_soc": step.target_soc,
+                    "price_mwh": _number(metadata.get("priceMwh")),
+                    "price_mwh_consumption": step.price_mwh_consumption,
+                    "price_mwh_production": _number(metadata.get("priceMwhProduction")),
+                    "predicted_consumption": step.predicted_consumption,
+                    "predicted_production": step.predicted_production,
+                },
+            )
+
+    def take(self) -> Batches:
+        """Return the buffered rows and start a new buffer."""
+        batches, self._batches = self._batches, {}
+        self.samples = self.plan_rows = 0
+        self._days.clear()
+        return batches
+
+
+def _schema(dataset: str):
+    """Return the pyarrow schema of a dataset."""
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+
+    types = {
+        "timestamp": pa.timestamp("us", tz="UTC"),
+        "float": pa.float64(),
+        "string": pa.string(),
+    }
+    return pa.schema(
+        [(name, types[kind]) for name, kind in DATASET_COLUMNS[dataset].items()]
+    )
+
+
+def write_batches(root: str, batches: Batches) -> list[str]:
+    """Write buffered rows, one new file per partition; return the paths.
+
+    Blocking, run it in an executor. Files are written under a temporary
+    name and renamed, so readers never see a partial file.
+    """
+    # pylint: disable=import-outside-toplevel
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schemas = {dataset: _schema(dataset) for dataset in DATASET_COLUMNS}
+    stamp = time.time_ns()
+    paths = []
+    for (dataset, inverter_id, day), columns in batches.items():
+        directory = os.path.join(
+            root,
+            dataset,
+            f"inverter_id={quote(inverter_id, safe='')}",
+            f"date={day.isoformat()}",
+        )
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{stamp}.parquet")
+        table = pa.Table.from_pydict(columns, schema=schemas[dataset])
+        pq.write_table(table, f"{path}.tmp", compression="zstd")
+        os.replace(f"{path}.tmp", path)
+        paths.append(path)
+    return paths
+
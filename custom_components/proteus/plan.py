@@ -0,0 +1,186 @@
+"""Parsed Proteus control plan."""
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from hashlib import blake2b
+import json
+from typing import Any
+
+MODE_LABELS = {
+    "charge_from_grid": "⚡ Nabíjení ze sítě",
+    "discharge_to_household": "🔋 Vybíjení",
+    "do_not_discharge": "⏸️  Bez vybíjení",
+    "charge_from_pv": "☀️ Nabíjení z PV",
+    "default": "🔄 Normální",
+}
+
+
+def jsonl_objects(data: list) -> Iterator[dict[str, Any]]:
+    """Yield the data object of every JSONL line.
+
+    Chunk lines look like ``{"json": [index, status, [[object]]]}``, older
+    responses carry the object directly as ``{"json": object}``.
+    """
+    for item in data:
+        try:
+            json_data = item["json"]
+            if isinstance(json_data, dict):
+                yield json_data
+                continue
+            actual_data = json_data[2][0][0]
+        except (KeyError, IndexError, TypeError):
+            continue
+        if isinstance(actual_data, dict):
+            yield actual_data
+
+
+def extract_from_jsonl(data: list, key: str) -> Any:
+    """Extract data from JSONL response."""
+    for actual_data in jsonl_objects(data):
+        if key in actual_data:
+            return actual_data[key]
+    return None
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an API ISO timestamp (UTC with trailing Z)."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def step_overlaps(
+    starts: tuple[datetime, ...],
+    ends: tuple[datetime, ...],
+    start: datetime,
+    end: datetime,
+) -> list[tuple[int, float]]:
+    """Return (index, hours) of every step overlapping [start, end)."""
+    result = []
+    index = max(0, bisect_right(starts, start) - 1)
+    while index < len(starts) and starts[index] < end:
+        overlap = min(end, ends[index]) - max(start, starts[index])
+        if overlap.total_seconds() > 0:
+            result.append((index, overlap.total_seconds() / 3600))
+        index += 1
+    return result
+
+
+@dataclass(frozen=True, slots=True)
+class PlanStep:
+    """One step of the control plan."""
+
+    id: str
+    start: datetime
+    end: datetime
+    mode: str
+    target_soc: float
+    price_mwh_consumption: float
+    predicted_consumption: float
+    predicted_production: float
+    raw: dict[str, Any]
+
+    @classmethod
+    def from_dict(cls, step: dict[str, Any]) -> PlanStep | None:
+        """Create a step from the API payload, None if it has no start."""
+        start_at = step.get("startAt")
+        if not start_at:
+            return None
+        try:
+            start = parse_timestamp(start_at)
+        except ValueError:
+            return None
+        metadata = step.get("metadata") or {}
+        return cls(
+            id=step.get("id", ""),
+            start=start,
+            end=start + timedelta(minutes=step.get("durationMinutes", 60)),
+            mode=metadata.get("flexalgoBattery", ""),
+            target_soc=metadata.get("targetSoC", 0),
+            price_mwh_consumption=metadata.get("priceMwhConsumption", 0) or 0,
+            predicted_consumption=metadata.get("predictedConsumption", 0) or 0,
+            predicted_production=metadata.get("predictedProduction", 0) or 0,
+            raw=step,
+        )
+
+    @property
+    def metadata(self) -> dict[str, Any]:
+        """Return the raw step metadata."""
+        return self.raw.get("metadata") or {}
+
+    @property
+    def mode_label(self) -> str:
+        """Return human readable battery mode."""
+        return MODE_LABELS.get(self.mode, self.mode)
+
+    @property
+    def price_kwh(self) -> float:
+        """Return consumption price in Kč/kWh."""
+        return round(self.price_mwh_consumption / 1000, 2)
+
+
+@dataclass(frozen=True, slots=True)
+class ControlPlan:
+    """Active control plan with steps sorted by start time."""
+
+    id: str | None
+    revision: str
+    steps: tuple[PlanStep, ...]
+    starts: tuple[datetime, ...]
+    ends: tuple[datetime, ...]
+
+    def step_at(self, when: datetime) -> PlanStep | None:
+        """Return the step running at the given time."""
+        index = bisect_right(self.starts, when) - 1
+        if index >= 0 and when < self.steps[index].end:
+            return self.steps[index]
+        return None
+
+    def bounds(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> tuple[int, int]:
+        """Return index range of steps starting in [start, end)."""
+        lo = bisect_left(self.starts, start) if start is not None else 0
+        hi = bisect_left(self.starts, end) if end is not None else len(self.steps)
+        return lo, max(lo, hi)
+
+    def slice(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> tuple[PlanStep, ...]:
+        """Return steps starting in [start, end)."""
+        lo, hi = self.bounds(start, end)
+        return self.steps[lo:hi]
+
+    def overlaps(self, start: datetime, end: datetime) -> list[tuple[int, float]]:
+        """Return (index, hours) of every step overlapping [start, end)."""
+        return step_overlaps(self.starts, self.ends, start, end)
+
+
+def plan_revision(active_plan: dict[str, Any]) -> str:
+    """Return an identifier that changes whenever the plan changes.
+
+    ``id:updatedAt`` keeps it readable; the hash of the raw steps (including
+    their execution ``state``) catches edits that keep the timestamp.
+    """
+    steps = (active_plan.get("payload") or {}).get("steps") or []
+    updated = active_plan.get("updatedAt") or active_plan.get("createdAt")
+    digest = blake2b(
+        json.dumps(steps, sort_keys=True, separators=(",", ":")).encode(),
+        digest_size=8,
+    ).hexdigest()
+    return f"{active_plan.get('id')}:{updated}:{digest}"
+
+
+def parse_control_plan(active_plan: dict[str, Any]) -> ControlPlan:
+    """Parse the activePlan object into a ControlPlan."""
+    raw_steps = (active_plan.get("payload") or {}).get("steps") or []
+    steps = [step for step in map(PlanStep.from_dict, raw_steps) if step is not None]
+    steps.sort(key=lambda step: step.start)
+    return ControlPlan(
+        id=active_plan.get("id"),
+        revision=plan_revision(active_plan),
+        steps=tuple(steps),
+        starts=tuple(step.start for step in steps),
+        ends=tuple(step.end for step in steps),
+    )
@@ -0,0 +1,187 @@
+"""Distribution tariffs and the total price timeline of the control plan."""
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import logging
+import math
+from typing import Any
+
+from .plan import ControlPlan, step_overlaps
+
+_LOGGER = logging.getLogger(__name__)
+
+# Typ tarifu a cena distribuce, stejné klíče jako priceComponents kroku plánu
+_TARIFF_TYPE_KEY = "distributionTariffType"
+_TARIFF_PRICE_KEY = "distributionPrice"
+_TARIFF_NAMES = ("HT", "LT")
+
+
+def _is_price(value: Any) -> bool:
+    """Return True for a numeric price."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_distribution_prices(results: list) -> dict[str, float]:
+    """Parse ``prices.currentDistributionPrices`` into Kč/MWh per tariff type.
+
+    Only the data object of each line (``json[2][0][0]``) is read, in one of
+    two shapes: a mapping with ``HT``/``LT`` prices, or rows streamed one per
+    line like ``inverters.list``, each with ``distributionTariffType`` and
+    ``distributionPrice``. Any other shape is logged and gives no prices.
+    """
+    prices: dict[str, float] = {}
+    seen: set[str] = set()
+    for item in results:
+        try:
+            data = item["json"][2][0][0]
+        except (KeyError, IndexError, TypeError):
+            continue
+        for row in data if isinstance(data, list) else (data,):
+            if not isinstance(row, dict):
+                continue
+            seen.update(row)
+            tariff, price = row.get(_TARIFF_TYPE_KEY), row.get(_TARIFF_PRICE_KEY)
+            if isinstance(tariff, str) and _is_price(price):
+                prices.setdefault(tariff, float(price))
+                continue
+            for name in _TARIFF_NAMES:
+                if _is_price(row.get(name)):
+                    prices.setdefault(name, float(row[name]))
+
+    if not prices:
+        _LOGGER.warning(
+            "No distribution prices in the response, expected %s/%s or %s keys, got %s",
+            _TARIFF_TYPE_KEY,
+            _TARIFF_PRICE_KEY,
+            "/".join(_TARIFF_NAMES),
+            sorted(seen) or "no data object",
+        )
+    return prices
+
+
+@dataclass(frozen=True, slots=True)
+class PriceTimeline:
+    """Market, total (market + distribution) and export price per plan step.
+
+    Arrays are aligned with ``ControlPlan.steps``; prices are in Kč/MWh.
+    ``revision`` combines the plan and tariff revisions, ``plan_revision``
+    is the revision of the plan the arrays were built for.
+    """
+
+    revision: str
+    starts: tuple[datetime, ...]
+    ends: tuple[datetime, ...]
+    market_mwh: tuple[float, ...]
+    total_mwh: tuple[float, ...]
+    export_mwh: tuple[float, ...]
+    plan_revision: str = ""
+
+    def matches(self, plan: ControlPlan) -> bool:
+        """Return True when the timeline was built for this plan revision."""
+        return self.plan_revision == plan.revision
+
+    def index_at(self, when: datetime) -> int | None:
+        """Return the index of the step running at the given time."""
+        index = bisect_right(self.starts, when) - 1
+        if index >= 0 and when < self.ends[index]:
+            return index
+        return None
+
+    def index_from(self, when: datetime) -> int:
+        """Return the index of the first step starting at or after when."""
+        return bisect_left(self.starts, when)
+
+    def overlaps(self, start: datetime, end: datetime) -> list[tuple[int, float]]:
+        """Return (index, hours) of every step overlapping [start, end)."""
+        return step_overlaps(self.starts, self.ends, start, end)
+
+    def total_kwh(self, index: int) -> float:
+        """Return the total price of a step in Kč/kWh."""
+        return round(self.total_mwh[index] / 1000, 2)
+
+
+def timeline_revision(plan: ControlPlan, tariff_revision: str | None) -> str:
+    """Return the revision of the timeline of a plan and tariff."""
+    return f"{plan.revision}|{tariff_revision}"
+
+
+def build_price_timeline(
+    plan: ControlPlan, tariff: dict[str, float] | None, tariff_revision: str | None
+) -> PriceTimeline:
+    """Join the distribution tariff table against the plan steps.
+
+    Each step's ``distributionTariffType`` selects the tariff price; steps
+    with an unknown type fall back to the step's own distribution component.
+    """
+    tariff = tariff or {}
+    market: list[float] = []
+    total: list[float] = []
+    export: list[float] = []
+    for step in plan.steps:
+        components = step.metadata.get("priceComponents") or {}
+        distribution = tariff.get(components.get("distributionTariffType"))
+        if distribution is None:
+            distribution = components.get("distributionPrice") or 0
+        market.append(step.price_mwh_consumption)
+        total.append(step.price_mwh_consumption + distribution)
+        export.append(step.metadata.get("priceMwhProduction", 0) or 0)
+
+    return PriceTimeline(
+        revision=timeline_revision(plan, tariff_revision),
+        starts=plan.starts,
+        ends=plan.ends,
+        market_mwh=tuple(market),
+        total_mwh=tuple(total),
+        export_mwh=tuple(export),
+        plan_revision=plan.revision,
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class PriceRank:
+    """Sorted total prices of a window of steps, for O(log n) rank queries."""
+
+    key: tuple[str, int]
+    start: datetime
+    end: datetime
+    sorted_mwh: tuple[float, ...]
+
+    def rank(self, price_mwh: float) -> int:
+        """Return the 1-based rank of a price, 1 being the cheapest."""
+        return bisect_left(self.sorted_mwh, price_mwh) + 1
+
+    def percentile(self, price_mwh: float) -> float:
+        """Return the share of the window that is cheaper than the price, in %."""
+        return 100 * bisect_left(self.sorted_mwh, price_mwh) / len(self.sorted_mwh)
+
+    def threshold(self, quantile: float) -> float:
+        """Return the highest price that still belongs to the cheapest quantile %."""
+        count = max(1, math.ceil(quantile / 100 * len(self.sorted_mwh)))
+        return self.sorted_mwh[count - 1]
+
+
+def build_price_rank(
+    timeline: PriceTimeline, first: int, window: timedelta
+) -> PriceRank | None:
+    """Sort the total prices of steps starting within window from step first."""
+    if first >= len(timeline.starts):
+        return None
+    start = timeline.starts[first]
+    last = bisect_left(timeline.starts, start + window)
+    return PriceRank(
+        key=(timeline.revision, first),
+        start=start,
+        end=timeline.ends[last - 1],
+        sorted_mwh=tuple(sorted(timeline.total_mwh[first:last])),
+    )
+
+
+def parse_quantiles(value: str) -> list[int]:
+    """Parse a comma separated list of quantiles in % (1-99)."""
+    parts = value.replace(";", ",").split(",")
+    quantiles = sorted({int(part) for part in parts if part.strip()})
+    if not quantiles or not all(0 < quantile < 100 for quantile in quantiles):
+        raise ValueError(f"Invalid price quantiles: {value}")
+    return quantiles
@@ -0,0 +1,95 @@
+"""Profiling of coordinator update cycles."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import threading
+from typing import Any
+
+PROFILER_CPROFILE = "cprofile"
+PROFILER_PYINSTRUMENT = "pyinstrument"
+
+# Profiler smí v procesu běžet jen jeden (cProfile na 3.12+ jinak selže)
+_ACTIVE = threading.Lock()
+
+
+class CycleProfiler:
+    """Profile the next N update cycles of a coordinator.
+
+    Every profiled call gets its own profiler instance, so work done in an
+    executor thread (API fetch) and on the event loop (state writes) is
+    captured separately and merged into one file at the end. Only one call
+    in the process is profiled at a time; a call overlapping another one
+    runs unprofiled and is counted in ``skipped``.
+    """
+
+    def __init__(self, path: str, cycles: int, kind: str = PROFILER_CPROFILE) -> None:
+        """Initialize."""
+        self.path = path
+        self.remaining = cycles
+        self.kind = kind
+        self.skipped = 0
+        self._profiles: list[Any] = []
+
+    def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func under a fresh profiler in the calling thread."""
+        if not _ACTIVE.acquire(blocking=False):
+            self.skipped += 1
+            return func(*args)
+        try:
+            return self._run(func, *args)
+        finally:
+            _ACTIVE.release()
+
+    def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func under a fresh profiler, the caller holds _ACTIVE."""
+        # pylint: disable=import-outside-toplevel
+        if self.kind == PROFILER_PYINSTRUMENT:
+            from pyinstrument import Profiler
+
+            profiler = Profiler(async_mode="disabled")
+            profiler.start()
+            try:
+                return func(*args)
+            finally:
+                profiler.stop()
+                self._profiles.append(profiler.last_session)
+
+        import cProfile
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+            self._profiles.append(profile)
+
+    def cycle_done(self) -> bool:
+        """Mark one cycle finished, return True when the profile is complete."""
+        self.remaining -= 1
+        return self.remaining <= 0
+
+    def write(self) -> str | None:
+        """Merge the collected profiles and write them to disk."""
+        if not self._profiles:
+            return None
+
+        # pylint: disable=import-outside-toplevel
+        if self.kind == PROFILER_PYINSTRUMENT:
+            from pyinstrument.renderers import HTMLRenderer
+            from pyinstrument.session import Session
+
+            session = self._profiles[0]
+            for other in self._profiles[1:]:
+                session = Session.combine(session, other)
+            with open(self.path, "w", encoding="utf-8") as file:
+                file.write(HTMLRenderer().render(session))
+            return self.path
+
+        import pstats
+
+        stats = pstats.Stats(self._profiles[0])
+        for other in self._profiles[1:]:
+            stats.add(other)
+        stats.dump_stats(self.path)
+        return self.path
@@ -1,8 +1,9 @@
 """Sensor platform for Proteus."""
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Any
+import logging
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any
 
 from homeassistant.components.sensor import (
     SensorDeviceClass,
@@ -12,15 +13,30 @@ from homeassistant.components.sensor import (
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
     PERCENTAGE,
+    EntityCategory,
     UnitOfEnergy,
+    UnitOfInformation,
     UnitOfPower,
+    UnitOfTime,
 )
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
 
-from . import ProteusDataUpdateCoordinator
+from .coordinator import ProteusDataUpdateCoordinator
+from .accounting import CostAccountant, CostTotals
+from .accuracy import AccuracyTracker, ErrorStat
 from .const import DOMAIN
+from .decode import CurrentStep, LastState
+from .plan import ControlPlan, PlanStep, extract_from_jsonl
+from .pricing import PriceRank, PriceTimeline
+
+if TYPE_CHECKING:
+    from .forecast import SocForecast
+    from .optimizer import OptimizationResult
+
+_LOGGER = logging.getLogger(__name__)
 
 
 async def async_setup_entry(
@@ -61,6 +77,27 @@ async def async_setup_entry(
         ProteusCurrentPriceSensor(coordinator),
         ProteusNextHourPriceSensor(coordinator),
         ProteusCheapestHourTodaySensor(coordinator),
+        ProteusCurrentTotalPriceSensor(coordinator),
+        ProteusNextHourTotalPriceSensor(coordinator),
+        ProteusPricePercentileSensor(coordinator),
+        ProteusPriceRankSensor(coordinator),
+    ])
+
+    # Náklady a úspory
+    entities.extend([
+        ProteusNetCostSensor(coordinator, monthly=False),
+        ProteusNetCostSensor(coordinator, monthly=True),
+        ProteusSavingsSensor(coordinator, monthly=False),
+        ProteusSavingsSensor(coordinator, monthly=True),
+    ])
+
+    # Předpověď baterie a sítě do konce plánu
+    entities.extend([
+        ProteusForecastSocSensor(coordinator),
+        ProteusForecastGridImportSensor(coordinator),
+        ProteusForecastGridExportSensor(coordinator),
+        ProteusForecastCostSensor(coordinator),
+        ProteusPlanCostGapSensor(coordinator),
     ])
 
     # Status
@@ -71,6 +108,19 @@ async def async_setup_entry(
         ProteusUpcomingScheduleSensor(coordinator),
     ])
 
+    # Diagnostika klienta
+    entities.extend([
+        ProteusApiLatencySensor(coordinator),
+        ProteusApiPayloadSizeSensor(coordinator),
+        ProteusApiParseTimeSensor(coordinator),
+        ProteusRenderTimeSensor(coordinator),
+        ProteusRateLimitHitsSensor(coordinator),
+        ProteusForecastErrorSensor(coordinator, "consumption", bias=False),
+        ProteusForecastErrorSensor(coordinator, "consumption", bias=True),
+        ProteusForecastErrorSensor(coordinator, "production", bias=False),
+        ProteusForecastErrorSensor(coordinator, "production", bias=True),
+    ])
+
     async_add_entities(entities)
 
 
@@ -95,24 +145,15 @@ class ProteusBaseSensor(CoordinatorEntity, SensorEntity):
             "model": "Inverter",
         }
 
-    def _extract_from_jsonl(self, data: list, key: str) -> Any:
-        """Extract data from JSONL response."""
-        # Data structure: [{"json": [index, 0, [[actual_data]]]}]
-        for item in data:
-            if isinstance(item, dict) and "json" in item:
-                json_data = item["json"]
-                # Check for nested array structure
-                if isinstance(json_data, list) and len(json_data) >= 3:
-                    nested_data = json_data[2]
-                    if isinstance(nested_data, list) and len(nested_data) > 0:
-                        if isinstance(nested_data[0], list) and len(nested_data[0]) > 0:
-                            actual_data = nested_data[0][0]
-                            if isinstance(actual_data, dict) and key in actual_data:
-                                return actual_data[key]
-                # Also check for direct dict structure
-                elif isinstance(json_data, dict) and key in json_data:
-                    return json_data[key]
-        return None
+    @property
+    def _state(self) -> LastState:
+        """Return the typed lastState of the snapshot."""
+        return self.coordinator.data["state"]
+
+    @property
+    def _step(self) -> CurrentStep | None:
+        """Return the typed currentStep of the snapshot."""
+        return self.coordinator.data["step"]
 
 
 # ==================== BATERIE ====================
@@ -131,12 +172,7 @@ class ProteusBatterySocSensor(ProteusBaseSensor):
     @property
     def native_value(self) -> float | None:
         """Return battery SoC."""
-        last_state = self.coordinator.data.get("last_state")
-        if last_state:
-            # Use same extraction method as other sensors
-            value = self._extract_from_jsonl(last_state, "batteryStateOfCharge")
-            return value if value is not None else None
-        return None
+        return self._state.soc
 
 
 class ProteusBatteryPowerSensor(ProteusBaseSensor):
@@ -152,29 +188,23 @@ class ProteusBatteryPowerSensor(ProteusBaseSensor):
     @property
     def native_value(self) -> float | None:
         """Return battery power (negative = discharging, positive = charging)."""
-        last_state = self.coordinator.data.get("last_state")
-        if last_state:
-            value = self._extract_from_jsonl(last_state, "batteryPower")
-            return value if value is not None else None
-        return None
+        return self._state.battery_power
 
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
         """Return additional attributes."""
         attrs = {}
-        last_state = self.coordinator.data.get("last_state")
-        if last_state:
-            power = self._extract_from_jsonl(last_state, "batteryPower")
-            if power is not None:
-                if power < 0:
-                    attrs["status"] = "Vybíjení"
-                    attrs["status_icon"] = "🔋"
-                elif power > 0:
-                    attrs["status"] = "Nabíjení"
-                    attrs["status_icon"] = "⚡"
-                else:
-                    attrs["status"] = "Nečinná"
-                    attrs["status_icon"] = "⏸️"
+        power = self._state.battery_power
+        if power is not None:
+            if power < 0:
+                attrs["status"] = "Vybíjení"
+                attrs["status_icon"] = "🔋"
+            elif power > 0:
+                attrs["status"] = "Nabíjení"
+                attrs["status_icon"] = "⚡"
+            else:
+                attrs["status"] = "Nečinná"
+                attrs["status_icon"] = "⏸️"
         return attrs
 
 
@@ -190,23 +220,17 @@ class ProteusBatteryTargetSocSensor(ProteusBaseSensor):
     @property
     def native_value(self) -> float | None:
         """Return target SoC from current step."""
-        current_step = self.coordinator.data.get("current_step")
-
-        # TRPC uses reference pointers - search for item containing actual metadata
-        if current_step and isinstance(current_step, list):
-            for item in current_step:
-                if isinstance(item, dict) and "json" in item:
-                    json_data = item["json"]
-                    if isinstance(json_data, list) and len(json_data) >= 3:
-                        step_data = json_data[2]
-                        if isinstance(step_data, list) and len(step_data) > 0:
-                            if isinstance(step_data[0], list) and len(step_data[0]) > 0:
-                                step_obj = step_data[0][0]
-                                if isinstance(step_obj, dict) and "metadata" in step_obj:
-                                    metadata = step_obj.get("metadata", {})
-                                    if "targetSoC" in metadata:
-                                        return metadata["targetSoC"]
-        return None
+        step = self._step
+        return step.target_soc if step is not None else None
+
+
+BATTERY_MODE_NAMES = {
+    "charge_from_grid": "Nabíjení ze sítě",
+    "discharge_to_household": "Vybíjení",
+    "do_not_discharge": "Bez vybíjení",
+    "charge_from_pv": "Nabíjení z PV",
+    "default": "Automatický",
+}
 
 
 class ProteusBatteryModeSensor(ProteusBaseSensor):
@@ -219,33 +243,11 @@ class ProteusBatteryModeSensor(ProteusBaseSensor):
     @property
     def native_value(self) -> str | None:
         """Return battery mode."""
-        current_step = self.coordinator.data.get("current_step")
-
-        # TRPC uses reference pointers - search for item containing actual metadata
-        if current_step and isinstance(current_step, list):
-            for item in current_step:
-                if isinstance(item, dict) and "json" in item:
-                    json_data = item["json"]
-                    if isinstance(json_data, list) and len(json_data) >= 3:
-                        step_data = json_data[2]
-                        if isinstance(step_data, list) and len(step_data) > 0:
-                            if isinstance(step_data[0], list) and len(step_data[0]) > 0:
-                                step_obj = step_data[0][0]
-                                if isinstance(step_obj, dict) and "metadata" in step_obj:
-                                    metadata = step_obj.get("metadata", {})
-                                    if "flexalgoBattery" in metadata:
-                                        mode = metadata.get("flexalgoBattery", "unknown")
-
-                                        # Převeď na čitelný text
-                                        mode_map = {
-                                            "charge_from_grid": "Nabíjení ze sítě",
-                                            "discharge_to_household": "Vybíjení",
-                                            "do_not_discharge": "Bez vybíjení",
-                                            "charge_from_pv": "Nabíjení z PV",
-                                            "default": "Automatický",
-                                        }
-                                        return mode_map.get(mode, mode)
-        return None
+        step = self._step
+        if step is None:
+            return None
+        # Převeď na čitelný text
+        return BATTERY_MODE_NAMES.get(step.mode, step.mode)
 
 
 # ==================== VÝKON ====================
@@ -264,10 +266,7 @@ class ProteusProductionPowerSensor(ProteusBaseSensor):
     @property
     def native_value(self) -> float | None:
         """Return production power."""
-        last_state = self.coordinator.data.get("last_state")
-        if last_state:
-            return self._extract_from_jsonl(last_state, "photovoltaicPower")
-        return None
+        return self._state.photovoltaic_power
 
 
 class ProteusConsumptionPowerSensor(ProteusBaseSensor):
@@ -283,10 +282,7 @@ class ProteusConsumptionPowerSensor(ProteusBaseSensor):
     @property
     def native_value(self) -> float | None:
         """Return consumption power."""
-        last_state = self.coordinator.data.get("last_state")
-        if last_state:
-            return self._extract_from_jsonl(last_state, "consumptionPower")
-        return None
+        return self._state.consumption_power
 
 
 class ProteusGridPowerSensor(ProteusBaseSensor):
@@ -302,10 +298,7 @@ class ProteusGridPowerSensor(ProteusBaseSensor):
     @property
     def native_value(self) -> float | None:
         """Return grid power."""
-        last_state = self.coordinator.data.get("last_state")
-        if last_state:
-            return self._extract_from_jsonl(last_state, "gridPower")
-        return None
+        return self._state.grid_power
 
 
 # ==================== ENERGIE ====================
@@ -324,11 +317,9 @@ class ProteusDailyProductionSensor(ProteusBaseSensor):
     @property
     def native_value(self) -> float | None:
         """Return daily production."""
-        last_state = self.coordinator.data.get("last_state")
-        if last_state:
-            energy_wh = self._extract_from_jsonl(last_state, "photovoltaicEnergy")
-            if energy_wh is not None:
-                return energy_wh / 1000  # Convert Wh to kWh
+        energy_wh = self._state.photovoltaic_energy
+        if energy_wh is not None:
+            return energy_wh / 1000  # Convert Wh to kWh
         return None
 
 
@@ -345,11 +336,9 @@ class ProteusDailyConsumptionSensor(ProteusBaseSensor):
     @property
     def native_value(self) -> float | None:
         """Return daily consumption."""
-        last_state = self.coordinator.data.get("last_state")
-        if last_state:
-            energy_wh = self._extract_from_jsonl(last_state, "consumptionEnergy")
-            if energy_wh is not None:
-                return energy_wh / 1000  # Convert Wh to kWh
+        energy_wh = self._state.consumption_energy
+        if energy_wh is not None:
+            return energy_wh / 1000  # Convert Wh to kWh
         return None
 
 
@@ -366,11 +355,9 @@ class ProteusDailyGridImportSensor(ProteusBaseSensor):
     @property
     def native_value(self) -> float | None:
         """Return daily grid import."""
-        last_state = self.coordinator.data.get("last_state")
-        if last_state:
-            energy_wh = self._extract_from_jsonl(last_state, "gridInEnergy")
-            if energy_wh is not None:
-                return energy_wh / 1000  # Convert Wh to kWh
+        energy_wh = self._state.grid_in_energy
+        if energy_wh is not None:
+            return energy_wh / 1000  # Convert Wh to kWh
         return None
 
 
@@ -387,11 +374,9 @@ class ProteusDailyGridExportSensor(ProteusBaseSensor):
     @property
     def native_value(self) -> float | None:
         """Return daily grid export."""
-        last_state = self.coordinator.data.get("last_state")
-        if last_state:
-            energy_wh = self._extract_from_jsonl(last_state, "gridOutEnergy")
-            if energy_wh is not None:
-                return energy_wh / 1000  # Convert Wh to kWh
+        energy_wh = self._state.grid_out_energy
+        if energy_wh is not None:
+            return energy_wh / 1000  # Convert Wh to kWh
         return None
 
 
@@ -410,32 +395,11 @@ class ProteusCurrentPriceSensor(ProteusBaseSensor):
     @property
     def native_value(self) -> float | None:
         """Return current price (consumption price in Kč/kWh)."""
-        import logging
-        _LOGGER = logging.getLogger(__name__)
-
-        current_step = self.coordinator.data.get("current_step")
-
-        # TRPC uses reference pointers - search for item containing actual metadata
-        if current_step and isinstance(current_step, list):
-            _LOGGER.debug(f"Current step data contains {len(current_step)} items")
-            for item in current_step:
-                if isinstance(item, dict) and "json" in item:
-                    json_data = item["json"]
-                    if isinstance(json_data, list) and len(json_data) >= 3:
-                        step_data = json_data[2]
-                        if isinstance(step_data, list) and len(step_data) > 0:
-                            if isinstance(step_data[0], list) and len(step_data[0]) > 0:
-                                step_obj = step_data[0][0]
-                                if isinstance(step_obj, dict) and "metadata" in step_obj:
-                                    metadata = step_obj.get("metadata", {})
-                                    # Use consumption price and convert MWh to kWh
-                                    if "priceMwhConsumption" in metadata:
-                                        price_mwh = metadata["priceMwhConsumption"]
-                                        price_kwh = round(price_mwh / 1000, 2)
-                                        _LOGGER.debug(f"Found price in current_step metadata: {price_mwh} MWh = {price_kwh} Kč/kWh")
-                                        return price_kwh  # MWh -> kWh
-        _LOGGER.debug("No price found in current_step data")
-        return None
+        step = self._step
+        if step is None:
+            _LOGGER.debug("No price found in current_step data")
+            return None
+        return step.price_kwh
 
 
 class ProteusNextHourPriceSensor(ProteusBaseSensor):
@@ -449,32 +413,17 @@ class ProteusNextHourPriceSensor(ProteusBaseSensor):
     @property
     def native_value(self) -> float | None:
         """Return next hour price (consumption price in Kč/kWh)."""
-        from datetime import datetime, timedelta
-        from homeassistant.util import dt as dt_util
-
-        control_plans = self.coordinator.data.get("control_plans")
-        if control_plans:
-            active_plan = self._extract_from_jsonl(control_plans, "activePlan")
-            if active_plan and isinstance(active_plan, dict):
-                steps = active_plan.get("payload", {}).get("steps", [])
-
-                # Find next hour's step
-                now = dt_util.now()
-                next_hour = (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
-
-                for step in steps:
-                    start_at = step.get("startAt", "")
-                    if start_at:
-                        try:
-                            step_time = datetime.fromisoformat(start_at.replace("Z", "+00:00"))
-                            if step_time >= next_hour:
-                                price_mwh = step.get("metadata", {}).get("priceMwhConsumption")
-                                if price_mwh is not None:
-                                    return round(price_mwh / 1000, 2)  # MWh -> kWh
-                                break
-                        except:
-                            pass
-        return None
+        plan: ControlPlan | None = self.coordinator.data.get("plan")
+        if plan is None:
+            return None
+
+        # Find next hour's step
+        now = dt_util.now()
+        next_hour = (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
+        steps = plan.slice(next_hour)
+        if not steps or "priceMwhConsumption" not in steps[0].metadata:
+            return None
+        return steps[0].price_kwh
 
 
 class ProteusCheapestHourTodaySensor(ProteusBaseSensor):
@@ -487,42 +436,325 @@ class ProteusCheapestHourTodaySensor(ProteusBaseSensor):
     @property
     def native_value(self) -> str | None:
         """Return cheapest hour today."""
-        from datetime import datetime, timedelta
-        from homeassistant.util import dt as dt_util
-
-        control_plans = self.coordinator.data.get("control_plans")
-        if control_plans:
-            active_plan = self._extract_from_jsonl(control_plans, "activePlan")
-            if active_plan and isinstance(active_plan, dict):
-                steps = active_plan.get("payload", {}).get("steps", [])
-
-                # Find cheapest hour in next 24 hours
-                now = dt_util.now()
-                end_time = now + timedelta(hours=24)
-                cheapest_step = None
-                cheapest_price = float('inf')
-
-                for step in steps:
-                    start_at = step.get("startAt", "")
-                    if start_at:
-                        try:
-                            step_time = datetime.fromisoformat(start_at.replace("Z", "+00:00"))
-                            # Only check next 24 hours
-                            if now <= step_time < end_time:
-                                price_mwh = step.get("metadata", {}).get("priceMwhConsumption", float('inf'))
-                                if price_mwh < cheapest_price:
-                                    cheapest_price = price_mwh
-                                    cheapest_step = step
-                        except:
-                            pass
-
-                if cheapest_step:
-                    start_time = cheapest_step.get("startAt", "")
-                    if start_time:
-                        dt = datetime.fromisoformat(start_time.replace("Z", "+00:00"))
-                        price_kwh = round(cheapest_price / 1000, 2)  # MWh -> kWh
-                        return f"{dt.strftime('%H:%M')} ({price_kwh} Kč/kWh)"
-        return None
+        plan: ControlPlan | None = self.coordinator.data.get("plan")
+        if plan is None:
+            return None
+
+        # Find cheapest hour in next 24 hours
+        now = dt_util.now()
+        steps = plan.slice(now, now + timedelta(hours=24))
+        if not steps:
+            return None
+        cheapest_step = min(steps, key=lambda step: step.price_mwh_consumption)
+        return f"{cheapest_step.start.strftime('%H:%M')} ({cheapest_step.price_kwh} Kč/kWh)"
+
+
+class ProteusCurrentTotalPriceSensor(ProteusBaseSensor):
+    """Current total price (market + distribution) sensor."""
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "current_total_price", "Current Total Price")
+        self._attr_native_unit_of_measurement = "Kč/kWh"
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def native_value(self) -> float | None:
+        """Return total price of the running step in Kč/kWh."""
+        timeline: PriceTimeline | None = self.coordinator.data.get("price_timeline")
+        if timeline is None:
+            return None
+        index = timeline.index_at(dt_util.now())
+        return timeline.total_kwh(index) if index is not None else None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the distribution tariff table."""
+        tariff = self.coordinator.data.get("tariff") or {}
+        return {
+            f"distribution_{name.lower()}_kwh": round(price / 1000, 2)
+            for name, price in tariff.items()
+        }
+
+
+class ProteusNextHourTotalPriceSensor(ProteusBaseSensor):
+    """Next hour total price (market + distribution) sensor."""
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "next_hour_total_price", "Next Hour Total Price")
+        self._attr_native_unit_of_measurement = "Kč/kWh"
+
+    @property
+    def native_value(self) -> float | None:
+        """Return total price of the first step of the next hour in Kč/kWh."""
+        timeline: PriceTimeline | None = self.coordinator.data.get("price_timeline")
+        if timeline is None:
+            return None
+        next_hour = (dt_util.now() + timedelta(hours=1)).replace(
+            minute=0, second=0, microsecond=0
+        )
+        index = timeline.index_from(next_hour)
+        return timeline.total_kwh(index) if index < len(timeline.starts) else None
+
+
+class ProteusPricePercentileSensor(ProteusBaseSensor):
+    """Share of the next 24 h that is cheaper than the current price."""
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "price_percentile", "Price Percentile")
+        self._attr_native_unit_of_measurement = PERCENTAGE
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the percentile of the running step's total price."""
+        rank: PriceRank | None = self.coordinator.price_rank(dt_util.now())
+        if rank is None:
+            return None
+        timeline: PriceTimeline = self.coordinator.data["price_timeline"]
+        return round(rank.percentile(timeline.total_mwh[rank.key[1]]), 1)
+
+
+class ProteusPriceRankSensor(ProteusBaseSensor):
+    """Rank of the current price within the next 24 h, 1 being the cheapest."""
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "price_rank", "Price Rank")
+
+    @property
+    def native_value(self) -> int | None:
+        """Return the rank of the running step's total price."""
+        rank: PriceRank | None = self.coordinator.price_rank(dt_util.now())
+        if rank is None:
+            return None
+        timeline: PriceTimeline = self.coordinator.data["price_timeline"]
+        return rank.rank(timeline.total_mwh[rank.key[1]])
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the size and bounds of the ranked window."""
+        rank: PriceRank | None = self.coordinator.price_rank(dt_util.now())
+        if rank is None:
+            return {}
+        return {
+            "window_steps": len(rank.sorted_mwh),
+            "window_end": rank.end.isoformat(),
+            "min_price_kwh": round(rank.sorted_mwh[0] / 1000, 2),
+            "max_price_kwh": round(rank.sorted_mwh[-1] / 1000, 2),
+        }
+
+
+# ==================== NÁKLADY ====================
+
+
+class ProteusCostSensor(ProteusBaseSensor):
+    """Base class for the daily and monthly cost totals."""
+
+    def __init__(
+        self,
+        coordinator: ProteusDataUpdateCoordinator,
+        sensor_type: str,
+        name: str,
+        monthly: bool,
+    ) -> None:
+        """Initialize."""
+        period = "month" if monthly else "today"
+        label = "This Month" if monthly else "Today"
+        super().__init__(coordinator, f"{sensor_type}_{period}", f"{name} {label}")
+        self._monthly = monthly
+        self._attr_native_unit_of_measurement = "Kč"
+        self._attr_state_class = SensorStateClass.TOTAL
+
+    @property
+    def _totals(self) -> CostTotals:
+        """Return the totals of this sensor's period."""
+        accounting: CostAccountant = self.coordinator.accounting
+        return accounting.this_month if self._monthly else accounting.today
+
+    @property
+    def last_reset(self) -> datetime:
+        """Return the start of the accounted day or month."""
+        accounting: CostAccountant = self.coordinator.accounting
+        day = accounting.period_start(self._monthly)
+        if day is None:
+            start = dt_util.start_of_local_day()
+            return start.replace(day=1) if self._monthly else start
+        return dt_util.start_of_local_day(day)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the energy and money components of the total."""
+        totals = self._totals
+        return {
+            "import_kwh": round(totals.import_kwh, 3),
+            "export_kwh": round(totals.export_kwh, 3),
+            "consumption_kwh": round(totals.consumption_kwh, 3),
+            "unpriced_kwh": round(totals.unpriced_kwh, 3),
+            "import_cost": round(totals.import_cost, 2),
+            "export_revenue": round(totals.export_revenue, 2),
+            "baseline_cost": round(totals.baseline_cost, 2),
+        }
+
+
+class ProteusNetCostSensor(ProteusCostSensor):
+    """Grid import cost minus export revenue."""
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator, monthly: bool) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "net_cost", "Net Cost", monthly)
+
+    @property
+    def native_value(self) -> float:
+        """Return the net cost of the period in Kč."""
+        return round(self._totals.net_cost, 2)
+
+
+class ProteusSavingsSensor(ProteusCostSensor):
+    """Saving against buying all consumption from the grid."""
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator, monthly: bool) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "savings", "Savings", monthly)
+
+    @property
+    def native_value(self) -> float:
+        """Return the savings of the period in Kč."""
+        return round(self._totals.savings, 2)
+
+
+# ==================== PŘEDPOVĚĎ ====================
+
+
+class ProteusForecastSensor(ProteusBaseSensor):
+    """Base class for sensors reading the SoC forecast."""
+
+    @property
+    def _forecast(self) -> SocForecast | None:
+        """Return the current forecast, None if it could not be computed."""
+        return self.coordinator.data.get("forecast")
+
+    @property
+    def available(self) -> bool:
+        """Return True when a forecast exists."""
+        return super().available and self._forecast is not None
+
+
+class ProteusForecastSocSensor(ProteusForecastSensor):
+    """Battery SoC predicted at the end of the plan."""
+
+    _unrecorded_attributes = frozenset({"soc_trajectory"})
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "forecast_soc", "Forecast SoC")
+        self._attr_device_class = SensorDeviceClass.BATTERY
+        self._attr_native_unit_of_measurement = PERCENTAGE
+
+    @property
+    def native_value(self) -> float | None:
+        """Return SoC at the plan horizon."""
+        forecast = self._forecast
+        if forecast is None or not len(forecast.soc):
+            return None
+        return round(float(forecast.soc[-1]), 1)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the hourly SoC trajectory and its extremes."""
+        forecast = self._forecast
+        if forecast is None or not len(forecast.soc):
+            return {}
+        return {
+            "horizon_start": forecast.starts[0].isoformat(),
+            "min_soc": round(float(forecast.soc.min()), 1),
+            "max_soc": round(float(forecast.soc.max()), 1),
+            "soc_trajectory": forecast.hourly_soc(),
+        }
+
+
+class ProteusForecastGridImportSensor(ProteusForecastSensor):
+    """Grid import predicted until the end of the plan."""
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "forecast_grid_import", "Forecast Grid Import")
+        self._attr_device_class = SensorDeviceClass.ENERGY
+        self._attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+
+    @property
+    def native_value(self) -> float | None:
+        """Return predicted grid import in kWh."""
+        forecast = self._forecast
+        return round(forecast.total_import_kwh, 2) if forecast is not None else None
+
+
+class ProteusForecastGridExportSensor(ProteusForecastSensor):
+    """Grid export predicted until the end of the plan."""
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "forecast_grid_export", "Forecast Grid Export")
+        self._attr_device_class = SensorDeviceClass.ENERGY
+        self._attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+
+    @property
+    def native_value(self) -> float | None:
+        """Return predicted grid export in kWh."""
+        forecast = self._forecast
+        return round(forecast.total_export_kwh, 2) if forecast is not None else None
+
+
+class ProteusForecastCostSensor(ProteusForecastSensor):
+    """Net grid cost predicted until the end of the plan."""
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "forecast_cost", "Forecast Cost")
+        self._attr_native_unit_of_measurement = "Kč"
+
+    @property
+    def native_value(self) -> float | None:
+        """Return predicted net cost (import minus export revenue) in Kč."""
+        forecast = self._forecast
+        return round(forecast.total_cost, 2) if forecast is not None else None
+
+
+class ProteusPlanCostGapSensor(ProteusBaseSensor):
+    """Cost of the Proteus plan above the locally computed optimum."""
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "plan_cost_gap", "Plan Cost Gap")
+        self._attr_native_unit_of_measurement = "Kč"
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def available(self) -> bool:
+        """Return True once the optimizer has produced a result."""
+        return super().available and self.coordinator.optimum is not None
+
+    @property
+    def native_value(self) -> float | None:
+        """Return plan cost minus optimal cost over the horizon."""
+        optimum: OptimizationResult | None = self.coordinator.optimum
+        return round(optimum.gap, 2) if optimum is not None else None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return both costs and the optimizer effort."""
+        optimum: OptimizationResult | None = self.coordinator.optimum
+        if optimum is None:
+            return {}
+        return {
+            "plan_cost": round(optimum.plan_cost, 2),
+            "optimal_cost": round(optimum.cost, 2),
+            "steps": len(optimum.soc),
+            "soc_states": optimum.states,
+            "compute_ms": round(optimum.elapsed_ms),
+        }
 
 
 # ==================== STATUS ====================
@@ -542,7 +774,7 @@ class ProteusConnectionStateSensor(ProteusBaseSensor):
         """Return connection state."""
         linkbox_state = self.coordinator.data.get("linkbox_state")
         if linkbox_state:
-            result = self._extract_from_jsonl(linkbox_state, "result")
+            result = extract_from_jsonl(linkbox_state, "result")
             if result == 0:
                 return "connected"
             else:
@@ -560,42 +792,12 @@ class ProteusCurrentStepSensor(ProteusBaseSensor):
     @property
     def native_value(self) -> str | None:
         """Return current step description."""
-        current_step = self.coordinator.data.get("current_step")
-
-        # TRPC uses reference pointers - search for item containing actual metadata
-        if current_step and isinstance(current_step, list):
-            for item in current_step:
-                if isinstance(item, dict) and "json" in item:
-                    json_data = item["json"]
-
-                    # Look for actual step data (has metadata with flexalgoBattery)
-                    if isinstance(json_data, list) and len(json_data) >= 3:
-                        step_data = json_data[2]
-                        if isinstance(step_data, list) and len(step_data) > 0:
-                            if isinstance(step_data[0], list) and len(step_data[0]) > 0:
-                                step_obj = step_data[0][0]
-                                if isinstance(step_obj, dict) and "metadata" in step_obj:
-                                    metadata = step_obj.get("metadata", {})
-
-                                    # Check if this has the actual step data
-                                    if "flexalgoBattery" in metadata:
-                                        mode = metadata.get("flexalgoBattery", "")
-                                        target_soc = metadata.get("targetSoC", 0)
-                                        price_mwh = metadata.get("priceMwhConsumption", 0)
-                                        price_kwh = round(price_mwh / 1000, 2) if price_mwh else 0
-
-                                        mode_map = {
-                                            "charge_from_grid": "⚡ Nabíjení ze sítě",
-                                            "discharge_to_household": "🔋 Vybíjení",
-                                            "do_not_discharge": "⏸️  Bez vybíjení",
-                                            "charge_from_pv": "☀️ Nabíjení z PV",
-                                            "default": "🔄 Normální",
-                                        }
-
-                                        mode_text = mode_map.get(mode, mode)
-                                        return f"{mode_text} → {target_soc}% @ {price_kwh} Kč/kWh"
-
-        return "Žádná data"
+        step = self._step
+        if step is None:
+            return "Žádná data"
+        target_soc = step.target_soc if step.target_soc is not None else 0
+        price_kwh = step.price_kwh or 0
+        return f"{step.mode_label} → {target_soc}% @ {price_kwh} Kč/kWh"
 
 
 class ProteusFlexibilityRewardsSensor(ProteusBaseSensor):
@@ -613,128 +815,220 @@ class ProteusFlexibilityRewardsSensor(ProteusBaseSensor):
         rewards = self.coordinator.data.get("rewards_summary")
         if rewards:
             # Extract total rewards from rewards_summary
-            summary = self._extract_from_jsonl(rewards, "totalRewardsCzk")
+            summary = extract_from_jsonl(rewards, "totalRewardsCzk")
             if summary is not None:
                 return summary
         return None
 
 
 class ProteusUpcomingScheduleSensor(ProteusBaseSensor):
-    """Upcoming Schedule sensor showing next steps."""
+    """Upcoming Schedule sensor showing next steps.
+
+    Only a compact summary is kept in the attributes; the full schedule is
+    served by the ``proteus/schedule`` WebSocket command so the recorder does
+    not store the whole plan on every update.
+    """
 
     def __init__(self, coordinator: ProteusDataUpdateCoordinator) -> None:
         """Initialize."""
         super().__init__(coordinator, "upcoming_schedule", "Upcoming Schedule")
 
+    def _future_steps(self) -> tuple[PlanStep, ...]:
+        """Return steps from the current hour onwards."""
+        plan: ControlPlan | None = self.coordinator.data.get("plan")
+        if plan is None:
+            return ()
+        return plan.slice(dt_util.now().replace(minute=0, second=0, microsecond=0))
+
     @property
     def native_value(self) -> str | None:
         """Return summary of upcoming schedule."""
-        import logging
-        from datetime import datetime
-        from homeassistant.util import dt as dt_util
-
-        _LOGGER = logging.getLogger(__name__)
-
-        control_plans = self.coordinator.data.get("control_plans")
-        _LOGGER.debug(f"Upcoming schedule: control_plans type={type(control_plans)}, len={len(control_plans) if control_plans else 0}")
-
-        if control_plans:
-            active_plan = self._extract_from_jsonl(control_plans, "activePlan")
-            _LOGGER.debug(f"Upcoming schedule: active_plan found={active_plan is not None}")
-            if active_plan and isinstance(active_plan, dict):
-                steps = active_plan.get("payload", {}).get("steps", [])
-                _LOGGER.debug(f"Upcoming schedule: steps count={len(steps)}")
-
-                # Filter steps - only future steps
-                now = dt_util.now()
-                future_steps = []
-                for step in steps:
-                    start_at = step.get("startAt", "")
-                    if start_at:
-                        try:
-                            # Parse UTC time and convert to local
-                            step_time_utc = datetime.fromisoformat(start_at.replace("Z", "+00:00"))
-                            step_time = dt_util.as_local(step_time_utc)
-                            # Include current hour and future
-                            if step_time >= now.replace(minute=0, second=0, microsecond=0):
-                                future_steps.append(step)
-                        except:
-                            pass
-
-                if len(future_steps) > 0:
-                    # Show first future step as summary
-                    next_step = future_steps[0]
-                    metadata = next_step.get("metadata", {})
-                    mode = metadata.get("flexalgoBattery", "")
-                    target = metadata.get("targetSoC", 0)
-                    price_mwh = metadata.get("priceMwhConsumption", 0)
-                    price_kwh = round(price_mwh / 1000, 2) if price_mwh else 0
-
-                    mode_map = {
-                        "charge_from_grid": "⚡ Nabíjení ze sítě",
-                        "discharge_to_household": "🔋 Vybíjení",
-                        "do_not_discharge": "⏸️  Bez vybíjení",
-                        "charge_from_pv": "☀️ Nabíjení z PV",
-                        "default": "🔄 Normální",
-                    }
-
-                    return f"{mode_map.get(mode, mode)} → {target}% @ {price_kwh} Kč/kWh"
+        future_steps = self._future_steps()
+        _LOGGER.debug("Upcoming schedule: future steps count=%d", len(future_steps))
+
+        if future_steps:
+            # Show first future step as summary
+            next_step = future_steps[0]
+            return f"{next_step.mode_label} → {next_step.target_soc}% @ {next_step.price_kwh} Kč/kWh"
         return "Žádný plán"
 
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
-        """Return ALL future hours schedule (from current hour onwards)."""
-        from datetime import datetime
-        from homeassistant.util import dt as dt_util
-
-        attrs = {"steps": [], "total_future_steps": 0}
-        control_plans = self.coordinator.data.get("control_plans")
-
-        if control_plans:
-            active_plan = self._extract_from_jsonl(control_plans, "activePlan")
-            if active_plan and isinstance(active_plan, dict):
-                steps = active_plan.get("payload", {}).get("steps", [])
-
-                # Filter steps - only current and future steps
-                now = dt_util.now()
-                current_hour = now.replace(minute=0, second=0, microsecond=0)
-
-                mode_map = {
-                    "charge_from_grid": "⚡ Nabíjení ze sítě",
-                    "discharge_to_household": "🔋 Vybíjení",
-                    "do_not_discharge": "⏸️  Bez vybíjení",
-                    "charge_from_pv": "☀️ Nabíjení z PV",
-                    "default": "🔄 Normální",
-                }
-
-                for step in steps:
-                    start_at = step.get("startAt", "")
-                    if start_at:
-                        try:
-                            # Parse UTC time and convert to local
-                            dt_utc = datetime.fromisoformat(start_at.replace("Z", "+00:00"))
-                            dt = dt_util.as_local(dt_utc)
-
-                            # Only include current hour and future
-                            if dt >= current_hour:
-                                metadata = step.get("metadata", {})
-                                mode = metadata.get("flexalgoBattery", "")
-                                price_mwh = metadata.get("priceMwhConsumption", 0)
-                                price_kwh = round(price_mwh / 1000, 2) if price_mwh else 0
-
-                                step_info = {
-                                    "time": dt.strftime("%d.%m %H:%M"),
-                                    "day": dt.strftime("%A"),
-                                    "mode": mode_map.get(mode, mode),
-                                    "target_soc": metadata.get("targetSoC", 0),
-                                    "price_kwh": price_kwh,
-                                    "predicted_consumption": round(metadata.get("predictedConsumption", 0), 0),
-                                    "predicted_production": round(metadata.get("predictedProduction", 0), 0),
-                                }
-                                attrs["steps"].append(step_info)
-                        except Exception:
-                            pass
-
-                attrs["total_future_steps"] = len(attrs["steps"])
+        """Return a compact summary of the future schedule."""
+        plan: ControlPlan | None = self.coordinator.data.get("plan")
+        future_steps = self._future_steps()
+        attrs: dict[str, Any] = {
+            "plan_revision": plan.revision if plan else None,
+            "total_future_steps": len(future_steps),
+        }
+        if future_steps:
+            prices = [step.price_kwh for step in future_steps]
+            attrs["horizon_end"] = dt_util.as_local(future_steps[-1].end).isoformat()
+            attrs["min_price_kwh"] = min(prices)
+            attrs["max_price_kwh"] = max(prices)
+
+            # Nejbližší změna režimu baterie
+            first_mode = future_steps[0].mode
+            for step in future_steps:
+                if step.mode != first_mode:
+                    attrs["next_mode_change"] = dt_util.as_local(step.start).isoformat()
+                    attrs["next_mode"] = step.mode_label
+                    break
+        return attrs
+
+
+# ==================== DIAGNOSTIKA ====================
+
+
+class ProteusDiagnosticSensor(ProteusBaseSensor):
+    """Base class for client statistics sensors."""
+
+    def __init__(
+        self,
+        coordinator: ProteusDataUpdateCoordinator,
+        sensor_type: str,
+        name: str,
+    ) -> None:
+        """Initialize."""
+        super().__init__(coordinator, sensor_type, name)
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+        self._attr_state_class = SensorStateClass.MEASUREMENT
 
+
+class ProteusApiLatencySensor(ProteusDiagnosticSensor):
+    """Rolling p95 latency of the dashboard batch call."""
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "api_latency", "API Latency")
+        self._attr_device_class = SensorDeviceClass.DURATION
+        self._attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+
+    @property
+    def native_value(self) -> float | None:
+        """Return p95 request latency."""
+        value = self.coordinator.api.stats.request_ms.p95
+        return round(value, 1) if value is not None else None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return p50/p95 latency per procedure."""
+        stats = self.coordinator.api.stats
+        attrs = {"p50": stats.request_ms.as_dict()["p50"]}
+        for name, stat in stats.procedure_ms.items():
+            summary = stat.as_dict()
+            attrs[name] = f"p50 {summary['p50']} / p95 {summary['p95']} ms"
         return attrs
+
+
+class ProteusApiPayloadSizeSensor(ProteusDiagnosticSensor):
+    """Size of the last batch response."""
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "api_payload_size", "API Payload Size")
+        self._attr_device_class = SensorDeviceClass.DATA_SIZE
+        self._attr_native_unit_of_measurement = UnitOfInformation.BYTES
+
+    @property
+    def native_value(self) -> float | None:
+        """Return bytes received by the last call."""
+        return self.coordinator.api.stats.bytes_received.last
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return JSONL line count."""
+        return {"lines": self.coordinator.api.stats.lines.last}
+
+
+class ProteusApiParseTimeSensor(ProteusDiagnosticSensor):
+    """Rolling p95 of JSONL decoding time."""
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "api_parse_time", "API Parse Time")
+        self._attr_device_class = SensorDeviceClass.DURATION
+        self._attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+
+    @property
+    def native_value(self) -> float | None:
+        """Return p95 parse time."""
+        value = self.coordinator.api.stats.parse_ms.p95
+        return round(value, 2) if value is not None else None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return extraction time."""
+        return {"extract_ms": self.coordinator.api.stats.extract_ms.as_dict()}
+
+
+class ProteusRenderTimeSensor(ProteusDiagnosticSensor):
+    """Rolling p95 of entity state write time."""
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "render_time", "Entity Render Time")
+        self._attr_device_class = SensorDeviceClass.DURATION
+        self._attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+
+    @property
+    def native_value(self) -> float | None:
+        """Return p95 render time of the previous update."""
+        value = self.coordinator.api.stats.render_ms.p95
+        return round(value, 2) if value is not None else None
+
+
+class ProteusRateLimitHitsSensor(ProteusDiagnosticSensor):
+    """Number of HTTP 429 responses."""
+
+    def __init__(self, coordinator: ProteusDataUpdateCoordinator) -> None:
+        """Initialize."""
+        super().__init__(coordinator, "rate_limit_hits", "Rate Limit Hits")
+        self._attr_state_class = SensorStateClass.TOTAL_INCREASING
+
+    @property
+    def native_value(self) -> int:
+        """Return rate limit hit count."""
+        return self.coordinator.api.stats.rate_limit_hits
+
+
+class ProteusForecastErrorSensor(ProteusDiagnosticSensor):
+    """Rolling MAE or bias of the plan's consumption/production predictions."""
+
+    _unrecorded_attributes = frozenset({"hourly"})
+
+    def __init__(
+        self, coordinator: ProteusDataUpdateCoordinator, quantity: str, bias: bool
+    ) -> None:
+        """Initialize."""
+        metric = "bias" if bias else "mae"
+        super().__init__(
+            coordinator,
+            f"{quantity}_forecast_{metric}",
+            f"{quantity.capitalize()} Forecast {'Bias' if bias else 'MAE'}",
+        )
+        self._quantity = quantity
+        self._bias = bias
+        self._attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+
+    def _value(self, stat: ErrorStat) -> float | None:
+        """Return the tracked metric, None before the first evaluated step."""
+        if not stat.count:
+            return None
+        return round(stat.bias if self._bias else stat.mae, 3)
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the error per plan step in kWh."""
+        accuracy: AccuracyTracker = self.coordinator.accuracy
+        return self._value(accuracy.stats[self._quantity].overall)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the step count and the metric per local hour of day."""
+        accuracy: AccuracyTracker = self.coordinator.accuracy
+        stats = accuracy.stats[self._quantity]
+        return {
+            "steps": stats.overall.count,
+            "hourly": [self._value(stat) for stat in stats.hourly],
+        }
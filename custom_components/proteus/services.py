@@ -0,0 +1,230 @@
+"""Services for the Proteus integration."""
+from __future__ import annotations
+
+import importlib.util
+from typing import TYPE_CHECKING, Any
+
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    ATTR_CONFIG_ENTRY_ID,
+    DOMAIN,
+    PARQUET_DIR,
+    SERVICE_EXPORT_PARQUET,
+    SERVICE_PLAN_LOAD,
+    SERVICE_PROFILE,
+)
+from .loadplan import find_window
+from .profiler import PROFILER_CPROFILE, PROFILER_PYINSTRUMENT, CycleProfiler
+
+if TYPE_CHECKING:
+    from .coordinator import ProteusDataUpdateCoordinator
+
+ATTR_CYCLES = "cycles"
+ATTR_PROFILER = "profiler"
+ATTR_LOADS = "loads"
+ATTR_NAME = "name"
+ATTR_ENERGY = "energy_kwh"
+ATTR_DURATION = "duration"
+ATTR_EARLIEST = "earliest"
+ATTR_DEADLINE = "deadline"
+ATTR_POWER_PROFILE = "power_profile"
+ATTR_PATH = "path"
+
+MAX_LOADS = 50
+MAX_PROFILE_LENGTH = 96
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_CYCLES, default=3): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=50)
+        ),
+        vol.Optional(ATTR_PROFILER, default=PROFILER_CPROFILE): vol.In(
+            [PROFILER_CPROFILE, PROFILER_PYINSTRUMENT]
+        ),
+    }
+)
+
+LOAD_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Optional(ATTR_NAME): cv.string,
+            vol.Optional(ATTR_ENERGY): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Required(ATTR_DURATION): vol.All(
+                cv.time_period, cv.positive_timedelta
+            ),
+            vol.Optional(ATTR_EARLIEST): cv.datetime,
+            vol.Optional(ATTR_DEADLINE): cv.datetime,
+            vol.Optional(ATTR_POWER_PROFILE): vol.All(
+                cv.ensure_list,
+                vol.Length(min=1, max=MAX_PROFILE_LENGTH),
+                [vol.All(vol.Coerce(float), vol.Range(min=0))],
+            ),
+        }
+    ),
+    cv.has_at_least_one_key(ATTR_ENERGY, ATTR_POWER_PROFILE),
+)
+
+PLAN_LOAD_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_LOADS): vol.All(
+            cv.ensure_list, vol.Length(min=1, max=MAX_LOADS), [LOAD_SCHEMA]
+        ),
+    }
+)
+
+EXPORT_PARQUET_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_PATH): cv.string,
+    }
+)
+
+
+def _get_coordinators(
+    hass: HomeAssistant, call: ServiceCall
+) -> list[tuple[str, ProteusDataUpdateCoordinator]]:
+    """Return (entry_id, coordinator) pairs targeted by a service call."""
+    coordinators = hass.data.get(DOMAIN, {})
+    entry_id = call.data.get(ATTR_CONFIG_ENTRY_ID)
+    if entry_id is None:
+        return list(coordinators.items())
+    if entry_id not in coordinators:
+        raise HomeAssistantError(f"Unknown Proteus config entry: {entry_id}")
+    return [(entry_id, coordinators[entry_id])]
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register Proteus services."""
+
+    async def async_profile(call: ServiceCall) -> None:
+        """Profile the next update cycles of the selected entries."""
+        kind = call.data[ATTR_PROFILER]
+        if kind == PROFILER_PYINSTRUMENT and not importlib.util.find_spec(
+            "pyinstrument"
+        ):
+            raise HomeAssistantError("pyinstrument is not installed")
+
+        if any(
+            coordinator.profiling
+            for coordinator in hass.data.get(DOMAIN, {}).values()
+        ):
+            raise HomeAssistantError("A Proteus profile is already being recorded")
+
+        stamp = dt_util.now().strftime("%Y%m%d_%H%M%S")
+        suffix = "html" if kind == PROFILER_PYINSTRUMENT else "prof"
+        for entry_id, coordinator in _get_coordinators(hass, call):
+            path = hass.config.path(f"proteus_profile_{entry_id}_{stamp}.{suffix}")
+            coordinator.async_start_profiling(
+                CycleProfiler(path, call.data[ATTR_CYCLES], kind)
+            )
+
+    async def async_plan_load(call: ServiceCall) -> ServiceResponse:
+        """Find the cheapest run window for each requested load."""
+        coordinators = _get_coordinators(hass, call)
+        if len(coordinators) != 1:
+            raise HomeAssistantError("Select the Proteus config entry to plan against")
+        _, coordinator = coordinators[0]
+        prices = coordinator.slot_prices()
+        if prices is None:
+            raise HomeAssistantError("No price timeline available")
+
+        now = dt_util.utcnow()
+        results = []
+        for index, load in enumerate(call.data[ATTR_LOADS]):
+            earliest = max(now, dt_util.as_utc(load.get(ATTR_EARLIEST, now)))
+            deadline = load.get(ATTR_DEADLINE)
+            window = find_window(
+                prices,
+                load[ATTR_DURATION],
+                earliest,
+                dt_util.as_utc(deadline) if deadline is not None else None,
+                load.get(ATTR_ENERGY),
+                load.get(ATTR_POWER_PROFILE),
+            )
+            result: dict[str, Any] = {ATTR_NAME: load.get(ATTR_NAME, str(index))}
+            if window is None:
+                result.update(start=None, end=None, cost=None)
+            else:
+                result.update(
+                    start=dt_util.as_local(window.start).isoformat(),
+                    end=dt_util.as_local(window.end).isoformat(),
+                    cost=round(window.cost, 2),
+                    cost_earliest=_round(window.cost_earliest),
+                    savings_vs_earliest=_round(window.savings_vs_earliest),
+                )
+            results.append(result)
+
+        return {"revision": prices.revision, ATTR_LOADS: results}
+
+    async def async_export_parquet(call: ServiceCall) -> ServiceResponse:
+        """Write buffered samples and plans (or the current snapshot) to Parquet."""
+        if not importlib.util.find_spec("pyarrow"):
+            raise HomeAssistantError("pyarrow is not installed")
+        # Výchozí složku zapisuje i průběžný export, kontroluje se jen zadaná
+        if root := call.data.get(ATTR_PATH):
+            if not hass.config.is_allowed_path(root):
+                raise HomeAssistantError(f"Path is not allowed: {root}")
+        else:
+            root = hass.config.path(PARQUET_DIR)
+
+        from .parquet import ParquetExporter, write_batches
+
+        files: list[str] = []
+        for _, coordinator in _get_coordinators(hass, call):
+            if coordinator.parquet is not None:
+                files += await coordinator.async_write_parquet(root)
+                continue
+            # Bez průběžného exportu se zapíše jen aktuální snapshot
+            if not coordinator.data:
+                continue
+            exporter = ParquetExporter(root)
+            inverter_id, plan = coordinator.api.inverter_id, coordinator.plan
+            now = dt_util.utcnow()
+            exporter.add_sample(inverter_id, now, coordinator.data["state"], plan)
+            if plan is not None:
+                exporter.add_plan(inverter_id, now, plan)
+            files += await hass.async_add_executor_job(
+                write_batches, root, exporter.take()
+            )
+
+        if call.return_response:
+            return {"files": files}
+        return None
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_PROFILE, async_profile, schema=PROFILE_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PLAN_LOAD,
+        async_plan_load,
+        schema=PLAN_LOAD_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXPORT_PARQUET,
+        async_export_parquet,
+        schema=EXPORT_PARQUET_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+def _round(value: float | None) -> float | None:
+    """Round a cost for the service response."""
+    return round(value, 2) if value is not None else None
@@ -0,0 +1,156 @@
+"""Runtime statistics for the Proteus API client."""
+from __future__ import annotations
+
+from collections import deque
+from itertools import accumulate
+from typing import Any
+
+# Počet posledních vzorků pro klouzavé percentily
+STATS_WINDOW = 50
+
+# Hranice košů histogramů latence (ms) pro export metrik
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """Return the nearest-rank percentile of values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+class RollingStat:
+    """Rolling window of samples with lifetime totals.
+
+    Recording is a deque append; percentiles are computed only when read.
+    """
+
+    __slots__ = ("samples", "count", "total")
+
+    def __init__(self, window: int = STATS_WINDOW) -> None:
+        """Initialize."""
+        self.samples: deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: float) -> None:
+        """Record a sample."""
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    @property
+    def last(self) -> float | None:
+        """Return the most recent sample."""
+        return self.samples[-1] if self.samples else None
+
+    @property
+    def p50(self) -> float | None:
+        """Return the rolling median."""
+        return percentile(list(self.samples), 50)
+
+    @property
+    def p95(self) -> float | None:
+        """Return the rolling 95th percentile."""
+        return percentile(list(self.samples), 95)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary for diagnostics."""
+        return {
+            "last": _round(self.last),
+            "p50": _round(self.p50),
+            "p95": _round(self.p95),
+            "count": self.count,
+            "total": _round(self.total),
+        }
+
+
+class Histogram:
+    """Cumulative histogram with fixed bucket bounds."""
+
+    __slots__ = ("bounds", "counts", "count", "total")
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS_MS) -> None:
+        """Initialize."""
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a sample."""
+        self.count += 1
+        self.total += value
+        for index, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def cumulative(self) -> list[int]:
+        """Return cumulative bucket counts, without the +Inf bucket."""
+        return list(accumulate(self.counts))
+
+
+class ApiStats:
+    """Request, parse and render statistics of one API client."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.procedure_ms: dict[str, RollingStat] = {}
+        self.request_ms = RollingStat()
+        self.request_histogram = Histogram()
+        self.procedure_histograms: dict[str, Histogram] = {}
+        self.parse_ms = RollingStat()
+        self.extract_ms = RollingStat()
+        self.render_ms = RollingStat()
+        self.bytes_received = RollingStat()
+        self.lines = RollingStat()
+        self.procedure_errors: dict[str, int] = {}
+        self.rate_limit_hits = 0
+        self.errors = 0
+        self.retries = 0
+
+    def record_procedure_error(self, procedure: str) -> None:
+        """Count a procedure that failed inside an otherwise good batch."""
+        self.procedure_errors[procedure] = self.procedure_errors.get(procedure, 0) + 1
+
+    def record_procedure(self, procedure: str, elapsed_ms: float) -> None:
+        """Record latency of one procedure inside a batch."""
+        stat = self.procedure_ms.get(procedure)
+        if stat is None:
+            stat = self.procedure_ms[procedure] = RollingStat()
+        stat.add(elapsed_ms)
+        histogram = self.procedure_histograms.get(procedure)
+        if histogram is None:
+            histogram = self.procedure_histograms[procedure] = Histogram()
+        histogram.observe(elapsed_ms)
+
+    def record_request(self, elapsed_ms: float) -> None:
+        """Record latency of a whole batch request."""
+        self.request_ms.add(elapsed_ms)
+        self.request_histogram.observe(elapsed_ms)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all statistics for diagnostics."""
+        return {
+            "request_ms": self.request_ms.as_dict(),
+            "parse_ms": self.parse_ms.as_dict(),
+            "extract_ms": self.extract_ms.as_dict(),
+            "render_ms": self.render_ms.as_dict(),
+            "bytes_received": self.bytes_received.as_dict(),
+            "lines": self.lines.as_dict(),
+            "procedures_ms": {
+                name: stat.as_dict() for name, stat in self.procedure_ms.items()
+            },
+            "procedure_errors": dict(self.procedure_errors),
+            "rate_limit_hits": self.rate_limit_hits,
+            "errors": self.errors,
+            "retries": self.retries,
+        }
+
+
+def _round(value: float | None) -> float | None:
+    """Round a statistic for display."""
+    return round(value, 2) if value is not None else None
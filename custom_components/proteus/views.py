@@ -0,0 +1,208 @@
+"""HTTP views: plan export (iCalendar, JSON) and OpenMetrics."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from hashlib import blake2b
+from http import HTTPStatus
+import json
+import re
+from typing import TYPE_CHECKING
+
+from aiohttp import web
+
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .const import ATTR_CONFIG_ENTRY_ID, DOMAIN
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsBuffer, render_metrics
+from .plan import ControlPlan
+from .pricing import PriceTimeline
+from .websocket_api import step_to_dict
+
+if TYPE_CHECKING:
+    from .coordinator import ProteusDataUpdateCoordinator
+
+# Entity-tag v If-None-Match (RFC 9110, 8.8.3), slabý s prefixem W/, nebo *
+_ENTITY_TAG = re.compile(r'(?:W/)?"[^"]*"|\*')
+
+FORMAT_ICS = "ics"
+FORMAT_JSON = "json"
+CONTENT_TYPES = {
+    FORMAT_ICS: "text/calendar; charset=utf-8",
+    FORMAT_JSON: "application/json",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class RenderedPlan:
+    """Serialized plan body for one revision and format."""
+
+    revision: str
+    etag: str
+    body: bytes
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Return True when If-None-Match lists etag (weak comparison) or is *."""
+    tags = _ENTITY_TAG.findall(if_none_match)
+    return "*" in tags or etag in (tag.removeprefix("W/") for tag in tags)
+
+
+def _ics_text(value: str) -> str:
+    """Escape a TEXT value (RFC 5545, 3.3.11)."""
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def _ics_fold(line: str) -> str:
+    """Fold a content line to at most 75 octets."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while encoded:
+        size = 75 if not parts else 74
+        # Nerozdělovat vícebajtové znaky UTF-8
+        while size < len(encoded) and (encoded[size] & 0xC0) == 0x80:
+            size -= 1
+        parts.append(encoded[:size].decode())
+        encoded = encoded[size:]
+    return "\r\n ".join(parts)
+
+
+def _ics_time(value: datetime) -> str:
+    """Format a datetime as UTC date-time."""
+    return dt_util.as_utc(value).strftime("%Y%m%dT%H%M%SZ")
+
+
+def render_ics(plan: ControlPlan, timeline: PriceTimeline | None) -> bytes:
+    """Serialize the plan as an iCalendar feed, one event per step."""
+    from .calendar import step_description, step_summary
+
+    stamp = _ics_time(dt_util.utcnow())
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Proteus//Control Plan//CS",
+        "CALSCALE:GREGORIAN",
+        "X-WR-CALNAME:Proteus Control Plan",
+    ]
+    for index, step in enumerate(plan.steps):
+        description = step_description(step.raw)
+        if timeline is not None and timeline.matches(plan):
+            description += f"\nCelková cena: {timeline.total_kwh(index):.2f} Kč/kWh"
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{step.id or _ics_time(step.start)}@{DOMAIN}",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{_ics_time(step.start)}",
+            f"DTEND:{_ics_time(step.end)}",
+            f"SUMMARY:{_ics_text(step_summary(step.metadata))}",
+            f"DESCRIPTION:{_ics_text(description)}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(map(_ics_fold, lines)) + "\r\n").encode()
+
+
+def render_json(plan: ControlPlan, timeline: PriceTimeline | None) -> bytes:
+    """Serialize the plan as JSON with the same step fields as the card."""
+    if timeline is not None and not timeline.matches(plan):
+        timeline = None
+    steps = [
+        step_to_dict(step, timeline.total_kwh(index) if timeline is not None else None)
+        for index, step in enumerate(plan.steps)
+    ]
+    body = {"plan_id": plan.id, "revision": plan.revision, "steps": steps}
+    return json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class ProteusPlanView(HomeAssistantView):
+    """Serve the active plan, rendered once per revision.
+
+    Clients get an ETag and receive 304 Not Modified while the plan (and the
+    tariff joined into the total prices) stays the same.
+    """
+
+    url = "/api/proteus/plan.{fmt}"
+    name = "api:proteus:plan"
+    requires_auth = True
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self._cache: dict[tuple[str, str], RenderedPlan] = {}
+
+    async def get(self, request: web.Request, fmt: str) -> web.Response:
+        """Return the plan of the selected (or only) config entry."""
+        if fmt not in CONTENT_TYPES:
+            return web.Response(status=HTTPStatus.NOT_FOUND)
+        hass: HomeAssistant = request.app["hass"]
+        coordinators: dict[str, ProteusDataUpdateCoordinator] = hass.data.get(DOMAIN, {})
+        entry_id = request.query.get(ATTR_CONFIG_ENTRY_ID)
+        if entry_id is None and len(coordinators) == 1:
+            entry_id = next(iter(coordinators))
+        if (coordinator := coordinators.get(entry_id)) is None:
+            return self.json_message(
+                "Unknown or ambiguous config entry", HTTPStatus.NOT_FOUND
+            )
+        if (plan := coordinator.plan) is None:
+            return self.json_message("No active plan", HTTPStatus.NOT_FOUND)
+
+        timeline = coordinator.price_timeline
+        revision = timeline.revision if timeline is not None else plan.revision
+        rendered = self._cache.get((entry_id, fmt))
+        if rendered is None or rendered.revision != revision:
+            render = render_ics if fmt == FORMAT_ICS else render_json
+            digest = blake2b(f"{revision}|{fmt}".encode(), digest_size=12).hexdigest()
+            rendered = self._cache[(entry_id, fmt)] = RenderedPlan(
+                revision=revision, etag=f'"{digest}"', body=render(plan, timeline)
+            )
+
+        headers = {"ETag": rendered.etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("If-None-Match", ""), rendered.etag):
+            return web.Response(status=HTTPStatus.NOT_MODIFIED, headers=headers)
+        return web.Response(
+            body=rendered.body,
+            headers={**headers, "Content-Type": CONTENT_TYPES[fmt]},
+        )
+
+
+class ProteusMetricsView(HomeAssistantView):
+    """Serve telemetry and client statistics in the OpenMetrics format.
+
+    Samples are rendered into per-entry buffers when a snapshot is built;
+    a scrape only joins them, and the joined body is reused until one of
+    the buffers is replaced.
+    """
+
+    url = "/api/proteus/metrics"
+    name = "api:proteus:metrics"
+    requires_auth = True
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self._buffers: list[MetricsBuffer] = []
+        self._body = render_metrics([])
+
+    async def get(self, request: web.Request) -> web.Response:
+        """Return the metrics of all config entries."""
+        hass: HomeAssistant = request.app["hass"]
+        coordinators: dict[str, ProteusDataUpdateCoordinator] = hass.data.get(DOMAIN, {})
+        buffers = [
+            coordinator.metrics
+            for coordinator in coordinators.values()
+            if coordinator.metrics is not None
+        ]
+        if len(buffers) != len(self._buffers) or any(
+            new is not old for new, old in zip(buffers, self._buffers)
+        ):
+            self._buffers, self._body = buffers, render_metrics(buffers)
+        return web.Response(
+            body=self._body, headers={"Content-Type": METRICS_CONTENT_TYPE}
+        )
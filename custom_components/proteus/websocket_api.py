@@ -0,0 +1,134 @@
+"""WebSocket API for the Proteus integration."""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers import entity_registry as er
+from homeassistant.util import dt as dt_util
+
+from .const import ATTR_CONFIG_ENTRY_ID, DOMAIN
+from .plan import PlanStep
+from .pricing import PriceTimeline
+
+if TYPE_CHECKING:
+    from .coordinator import ProteusDataUpdateCoordinator
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 500
+
+
+@callback
+def async_register_websocket_commands(hass: HomeAssistant) -> None:
+    """Register Proteus WebSocket commands."""
+    websocket_api.async_register_command(hass, ws_schedule)
+
+
+def _resolve_coordinator(
+    hass: HomeAssistant, msg: dict[str, Any]
+) -> ProteusDataUpdateCoordinator | None:
+    """Find the coordinator by config entry or by one of its entities."""
+    coordinators = hass.data.get(DOMAIN, {})
+    entry_id = msg.get(ATTR_CONFIG_ENTRY_ID)
+    if entry_id is None and (entity_id := msg.get("entity_id")):
+        if entity := er.async_get(hass).async_get(entity_id):
+            entry_id = entity.config_entry_id
+    if entry_id is None and len(coordinators) == 1:
+        entry_id = next(iter(coordinators))
+    return coordinators.get(entry_id)
+
+
+def _as_aware(value: datetime | None) -> datetime | None:
+    """Interpret naive datetimes in the local time zone."""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    return value
+
+
+def step_to_dict(step: PlanStep, total_price_kwh: float | None = None) -> dict[str, Any]:
+    """Serialize a plan step for the schedule card."""
+    local = dt_util.as_local(step.start)
+    return {
+        "start": step.start.isoformat(),
+        "time": local.strftime("%d.%m %H:%M"),
+        "day": local.strftime("%A"),
+        "mode": step.mode_label,
+        "target_soc": step.target_soc,
+        "price_kwh": step.price_kwh,
+        "total_price_kwh": total_price_kwh,
+        "predicted_consumption": round(step.predicted_consumption, 0),
+        "predicted_production": round(step.predicted_production, 0),
+    }
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "proteus/schedule",
+        vol.Optional("entity_id"): cv.entity_id,
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): str,
+        vol.Optional("start"): cv.datetime,
+        vol.Optional("end"): cv.datetime,
+        vol.Optional("page", default=0): vol.All(int, vol.Range(min=0)),
+        vol.Optional("page_size", default=DEFAULT_PAGE_SIZE): vol.All(
+            int, vol.Range(min=1, max=MAX_PAGE_SIZE)
+        ),
+    }
+)
+@callback
+def ws_schedule(
+    hass: HomeAssistant,
+    connection: websocket_api.ActiveConnection,
+    msg: dict[str, Any],
+) -> None:
+    """Return one page of the cached control plan."""
+    coordinator = _resolve_coordinator(hass, msg)
+    if coordinator is None:
+        connection.send_error(
+            msg["id"], websocket_api.ERR_NOT_FOUND, "Proteus entry not found"
+        )
+        return
+
+    page = msg["page"]
+    page_size = msg["page_size"]
+    plan = coordinator.plan
+    if plan is None:
+        connection.send_result(
+            msg["id"],
+            {"revision": None, "total": 0, "page": page, "page_size": page_size, "steps": []},
+        )
+        return
+
+    # Výchozí začátek je aktuální hodina, stejně jako dřív v atributu steps
+    start = _as_aware(msg.get("start")) or dt_util.now().replace(
+        minute=0, second=0, microsecond=0
+    )
+    lo, hi = plan.bounds(start, _as_aware(msg.get("end")))
+    first = min(lo + page * page_size, hi)
+    last = min(first + page_size, hi)
+
+    # Celková cena z časové řady, pokud patří ke stejné revizi plánu
+    timeline: PriceTimeline | None = coordinator.price_timeline
+    if timeline is not None and not timeline.matches(plan):
+        timeline = None
+
+    connection.send_result(
+        msg["id"],
+        {
+            "revision": plan.revision,
+            "total": hi - lo,
+            "page": page,
+            "page_size": page_size,
+            "steps": [
+                step_to_dict(
+                    plan.steps[index],
+                    timeline.total_kwh(index) if timeline is not None else None,
+                )
+                for index in range(first, last)
+            ],
+        },
+    )
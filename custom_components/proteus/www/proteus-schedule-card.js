@@ -17,10 +17,64 @@ class ProteusScheduleCard extends HTMLElement {
       return;
     }
 
-    const steps = stateObj.attributes.steps || [];
+    // Plán se stahuje přes WebSocket jen při změně revize nebo stavu
+    this._hass = hass;
+    const key = `${stateObj.attributes.plan_revision}|${stateObj.last_updated}`;
+    if (key === this._lastKey) {
+      return;
+    }
+    this._lastKey = key;
+    this._cancelRetry();
+    this._fetchSchedule(hass);
+  }
+
+  async _fetchSchedule(hass) {
     const maxRows = this.config.max_rows || 12;
-    const displaySteps = steps.slice(0, maxRows);
+    const key = this._lastKey;
+    try {
+      const result = await hass.callWS({
+        type: 'proteus/schedule',
+        entity_id: this.config.entity,
+        page: 0,
+        page_size: maxRows,
+      });
+      this._retryDelay = 0;
+      this._render(result.steps, result.total, maxRows);
+    } catch (err) {
+      // Text chyby pochází ze serveru, do HTML se nevkládá
+      const message = document.createElement('p');
+      message.textContent = `Plán se nepodařilo načíst: ${err.message || err}`;
+      this.content.replaceChildren(message);
+      // Klíč zůstává, další pokus až po prodlevě (nebo s novou revizí)
+      if (key === this._lastKey) {
+        this._scheduleRetry();
+      }
+    }
+  }
+
+  _scheduleRetry() {
+    this._cancelRetry();
+    this._retryDelay = Math.min((this._retryDelay || 2500) * 2, 300000);
+    this._retryTimer = setTimeout(() => {
+      this._retryTimer = null;
+      this._fetchSchedule(this._hass);
+    }, this._retryDelay);
+  }
+
+  _cancelRetry() {
+    if (this._retryTimer) {
+      clearTimeout(this._retryTimer);
+      this._retryTimer = null;
+    }
+  }
+
+  disconnectedCallback() {
+    // Po znovupřipojení se plán načte znovu
+    this._cancelRetry();
+    this._lastKey = null;
+  }
 
+  _render(displaySteps, total, maxRows) {
     // Vytvoř HTML tabulku
     let html = `
       <style>
@@ -112,9 +166,9 @@ class ProteusScheduleCard extends HTMLElement {
       </table>
     `;
 
-    if (steps.length > maxRows) {
+    if (total > maxRows) {
       html += `<p style="text-align: center; color: var(--secondary-text-color); margin-top: 8px; font-size: 12px;">
-        Zobrazeno ${maxRows} z ${steps.length} kroků
+        Zobrazeno ${maxRows} z ${total} kroků
       </p>`;
     }
 
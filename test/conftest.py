@@ -0,0 +1,158 @@
+"""Shared fixtures: repository on sys.path and a local mock Proteus server."""
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import sys
+import threading
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# Data objekt procedury podle vstupu ({"inverterId": ...})
+Handler = Callable[[dict[str, Any]], Any]
+
+
+def _default_procedures() -> dict[str, Handler]:
+    """Return handlers answering the dashboard procedures."""
+    return {
+        "inverters.list": lambda _: [{"id": "inv-0"}, {"id": "inv-1"}],
+        "inverters.lastState": lambda _: {
+            "batteryStateOfCharge": 55,
+            "gridPower": 120.5,
+            "gridInEnergy": 1500,
+        },
+        "inverters.currentStep": lambda _: {
+            "metadata": {
+                "flexalgoBattery": "default",
+                "targetSoC": 80,
+                "priceMwhConsumption": 2500,
+            }
+        },
+        "controlPlans.active": lambda _: {
+            "activePlan": {
+                "id": "p1",
+                "updatedAt": "2024-01-01T00:00:00Z",
+                "payload": {
+                    "steps": [
+                        {
+                            "id": "s1",
+                            "startAt": "2020-01-01T00:00:00Z",
+                            "durationMinutes": 60 * 24 * 365 * 30,
+                            "metadata": {
+                                "flexalgoBattery": "default",
+                                "targetSoC": 80,
+                                "priceMwhConsumption": 2500,
+                            },
+                        }
+                    ]
+                },
+            }
+        },
+    }
+
+
+class MockProteusServer:
+    """tRPC JSONL server answering login and batched procedures.
+
+    ``procedures`` maps a procedure to a handler returning its data object
+    (a list of inverters for ``inverters.list``). Procedures in ``failing``
+    answer with a rejected chunk, those in ``fail_times`` as many times as
+    given. While ``retry_after`` is set, batches are
+    refused with HTTP 429 and that Retry-After header. Every batch is recorded in ``batches`` as
+    the list of its procedures.
+    """
+
+    def __init__(self) -> None:
+        """Start the server on a free local port."""
+        self.procedures = _default_procedures()
+        self.failing: set[str] = set()
+        self.fail_times: dict[str, int] = {}
+        self.batches: list[list[str]] = []
+        self.retry_after: str | None = None
+        self.logins = 0
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                query = parse_qs(urlparse(self.path).query)
+                self._answer(json.loads(query["input"][0]))
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if "loginWithEmailAndPassword" in self.path:
+                    server.logins += 1
+                    self.send_response(200)
+                    self.send_header("Set-Cookie", "proteus_session=s; Path=/")
+                    self.send_header("Set-Cookie", "proteus_csrf=c; Path=/")
+                    self.send_header("Content-Length", "2")
+                    self.end_headers()
+                    self.wfile.write(b"{}")
+                    return
+                self._answer(json.loads(body))
+
+            def _answer(self, batch_input: dict[str, Any]) -> None:
+                names = urlparse(self.path).path.rsplit("/", 1)[1].split(",")
+                server.batches.append(names)
+                if server.retry_after is not None:
+                    self.send_response(429)
+                    self.send_header("Retry-After", server.retry_after)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                lines = [
+                    line
+                    for index, name in enumerate(names)
+                    for line in server.lines(
+                        index, name, batch_input[str(index)].get("json")
+                    )
+                ]
+                body = "\n".join(map(json.dumps, lines)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/jsonl")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def lines(self, index: int, name: str, value: Any) -> list[dict[str, Any]]:
+        """Return the JSONL lines of one procedure."""
+        if self.fail_times.get(name):
+            self.fail_times[name] -= 1
+            return [{"json": [index, 1, [[{"error": {"message": "failed"}}]]]}]
+        if name in self.failing:
+            return [{"json": [index, 1, [[{"error": {"message": "failed"}}]]]}]
+        data = self.procedures.get(name, lambda _: {})(value or {})
+        if name == "inverters.list":
+            # Seznam přichází po řádcích, jeden měnič na řádek
+            return [{"json": [index, 0, [[[item]]]]} for item in data]
+        return [{"json": [index, 0, [[data]]]}]
+
+    def close(self) -> None:
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def proteus_server() -> Iterator[MockProteusServer]:
+    """Run a mock Proteus server for one test."""
+    server = MockProteusServer()
+    try:
+        yield server
+    finally:
+        server.close()
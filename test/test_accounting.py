@@ -0,0 +1,115 @@
+"""Counter increments and cost totals across midnight."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from custom_components.proteus.accounting import (
+    COUNTER_CONSUMPTION,
+    COUNTER_EXPORT,
+    COUNTER_IMPORT,
+    CostAccountant,
+    CounterDelta,
+)
+from custom_components.proteus.pricing import PriceTimeline
+
+TZ = timezone(timedelta(hours=1))
+MIDNIGHT = datetime(2024, 3, 2, tzinfo=TZ)
+
+
+def _values(imported: float) -> dict[str, float]:
+    return {COUNTER_IMPORT: imported, COUNTER_EXPORT: 0.0, COUNTER_CONSUMPTION: imported}
+
+
+def _timeline(price_before: float, price_after: float) -> PriceTimeline:
+    """Return two day-long steps split at MIDNIGHT (Kč/MWh)."""
+    return PriceTimeline(
+        revision="r",
+        starts=(MIDNIGHT - timedelta(days=1), MIDNIGHT),
+        ends=(MIDNIGHT, MIDNIGHT + timedelta(days=1)),
+        market_mwh=(price_before, price_after),
+        total_mwh=(price_before, price_after),
+        export_mwh=(0.0, 0.0),
+    )
+
+
+def test_counter_delta():
+    """Increments are differences, a drop is a reset to the new value."""
+    counter = CounterDelta()
+    assert counter.update(100) == 0
+    assert counter.update(150) == 50
+    assert counter.update(None) == 0
+    assert counter.update(30) == 30
+    assert counter.reset
+    assert counter.update(40) == 10
+    assert not counter.reset
+
+
+def test_same_day_increment():
+    """Increments within a day are added and priced."""
+    accountant = CostAccountant()
+    timeline = _timeline(2000, 4000)
+    accountant.add_sample(MIDNIGHT + timedelta(hours=1), _values(1000), timeline)
+    assert accountant.add_sample(MIDNIGHT + timedelta(hours=2), _values(3000), timeline)
+
+    assert accountant.today.import_kwh == pytest.approx(2.0)
+    assert accountant.today.import_cost == pytest.approx(8.0)
+    assert accountant.this_month.import_kwh == pytest.approx(2.0)
+
+
+def test_counter_not_reset_after_midnight():
+    """A counter still reporting yesterday's total is not booked twice."""
+    accountant = CostAccountant()
+    timeline = _timeline(2000, 4000)
+    accountant.add_sample(MIDNIGHT - timedelta(minutes=30), _values(10_000), timeline)
+    accountant.add_sample(MIDNIGHT + timedelta(minutes=30), _values(10_400), timeline)
+
+    # Polovina přírůstku patří včerejšku
+    assert accountant.today.import_kwh == pytest.approx(0.2)
+    assert accountant.today.import_cost == pytest.approx(0.8)
+    assert accountant.this_month.import_kwh == pytest.approx(0.4)
+    assert accountant.this_month.import_cost == pytest.approx(1.2)
+
+    # Pozdní vynulování čítače počítá jen energii od vynulování
+    accountant.add_sample(MIDNIGHT + timedelta(hours=1), _values(100), timeline)
+    assert accountant.today.import_kwh == pytest.approx(0.3)
+
+
+def test_counter_reset_at_midnight():
+    """After a reset the whole value is energy since midnight."""
+    accountant = CostAccountant()
+    timeline = _timeline(2000, 4000)
+    accountant.add_sample(MIDNIGHT - timedelta(minutes=30), _values(10_000), timeline)
+    accountant.add_sample(MIDNIGHT + timedelta(minutes=30), _values(500), timeline)
+
+    assert accountant.today.import_kwh == pytest.approx(0.5)
+    assert accountant.today.import_cost == pytest.approx(2.0)
+    assert accountant.this_month.import_kwh == pytest.approx(0.5)
+
+
+def test_new_month_books_remainder_to_previous_month():
+    """The part before the first of the month does not reach the new month."""
+    accountant = CostAccountant()
+    first = datetime(2024, 4, 1, tzinfo=TZ)
+    accountant.add_sample(first - timedelta(hours=1), _values(0), None)
+    accountant.add_sample(first + timedelta(hours=1), _values(2000), None)
+
+    assert accountant.this_month.import_kwh == pytest.approx(1.0)
+    assert accountant.today.unpriced_kwh == pytest.approx(1.0)
+    assert accountant.period_start() == first.date()
+    assert accountant.period_start(monthly=True) == first.date()
+
+
+def test_restore_keeps_tracked_day():
+    """The tracked day survives a restart, so no sample is re-booked."""
+    accountant = CostAccountant()
+    accountant.add_sample(MIDNIGHT + timedelta(hours=1), _values(1000), None)
+    accountant.add_sample(MIDNIGHT + timedelta(hours=2), _values(1500), None)
+
+    restored = CostAccountant()
+    restored.restore(accountant.as_dict())
+    restored.add_sample(MIDNIGHT + timedelta(hours=3), _values(2000), None)
+
+    assert restored.today.import_kwh == pytest.approx(1.0)
+    assert restored.period_start() == MIDNIGHT.date()
@@ -0,0 +1,151 @@
+"""Proteus client against the local mock server."""
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("requests")
+
+from pathlib import Path  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+
+import requests  # noqa: E402
+
+from custom_components.proteus import api as api_module  # noqa: E402
+from custom_components.proteus.api import (  # noqa: E402
+    ProteusAccount,
+    ProteusAPI,
+    RateLimited,
+)
+from custom_components.proteus.const import API_RATE_LIMIT_MAX_BACKOFF  # noqa: E402
+
+
+@pytest.fixture
+def api(proteus_server):
+    """Return a logged-in client without request spacing."""
+    account = ProteusAccount("user@example.com", "secret", proteus_server.url)
+    account.rate_limiter.min_interval = 0
+    assert account.login()
+    client = ProteusAPI("user@example.com", "secret", "inv-0", account=account)
+    yield client
+    client.close()
+
+
+def test_long_single_line_response(proteus_server, api):
+    """A multi-megabyte plan line is read and decoded in one piece."""
+    steps = [
+        {"id": f"s{index}", "startAt": "2024-01-01T00:00:00Z", "metadata": {"note": "x" * 200}}
+        for index in range(5000)
+    ]
+    proteus_server.procedures["controlPlans.active"] = lambda _: {
+        "activePlan": {"id": "big", "payload": {"steps": steps}}
+    }
+
+    results = api._call_trpc("controlPlans.active", [{"json": {}}])
+
+    assert len(results) == 1
+    assert results[0]["json"][2][0][0]["activePlan"]["payload"]["steps"] == steps
+    assert api.stats.bytes_received.total > 1_000_000
+    assert api.stats.procedure_ms["controlPlans.active"].count == 1
+
+
+def test_rate_limit_fails_fast(proteus_server, api):
+    """After HTTP 429 the client fails instead of sleeping the back-off."""
+    proteus_server.retry_after = "3600"
+
+    with pytest.raises(requests.HTTPError):
+        api._call_trpc("inverters.lastState", [{"json": {}}])
+
+    assert api.stats.rate_limit_hits == 1
+    assert api.account.rate_limiter.pending() <= API_RATE_LIMIT_MAX_BACKOFF
+
+    started = time.monotonic()
+    with pytest.raises(RateLimited):
+        api._call_trpc("inverters.lastState", [{"json": {}}])
+    assert time.monotonic() - started < 1
+    assert len(proteus_server.batches) == 1
+
+
+def test_client_without_account_opens_no_session():
+    """A parse-only client (MQTT subscribe mode) never creates a session."""
+    code = (
+        "import sys\n"
+        "from custom_components.proteus.api import ProteusAPI\n"
+        "api = ProteusAPI('user@example.com', 'secret', 'inv-0')\n"
+        "assert api.parse_active_plan({'id': 'p1', 'payload': {'steps': []}}) is not None\n"
+        "api.close()\n"
+        "assert 'requests' not in sys.modules, 'requests imported'\n"
+    )
+    root = Path(__file__).resolve().parents[1]
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
+
+
+DASHBOARD = [
+    "commands.current",
+    "inverters.currentStep",
+    "users.wsToken",
+    "inverters.extendedDetail",
+    "inverters.lastState",
+    "inverters.flexibilityRewardsSummary",
+    "controlPlans.active",
+]
+
+
+def test_failed_procedure_retried_alone(proteus_server, api):
+    """Only the failed procedure is repeated, in a batch of its own."""
+    proteus_server.fail_times["inverters.lastState"] = 1
+    proteus_server.procedures["inverters.lastState"] = lambda _: {
+        "batteryStateOfCharge": 60
+    }
+
+    data = api.get_dashboard_data()
+
+    assert proteus_server.batches == [DASHBOARD, ["inverters.lastState"]]
+    assert api.stats.retries == 1
+    assert not api.stats.procedure_errors
+    assert data["last_state"][0]["json"][2][0][0] == {"batteryStateOfCharge": 60}
+    assert data["current_step"][0]["json"][2][0][0]["metadata"]["targetSoC"] == 80
+
+
+def test_failed_procedure_keeps_last_good_value(proteus_server, api, monkeypatch):
+    """When the retry fails too, the previous value of the procedure is kept."""
+    monkeypatch.setattr(api_module, "API_RESPONSE_CACHE_TTL", 0)
+    first = api.get_dashboard_data()
+
+    proteus_server.failing.add("inverters.lastState")
+    proteus_server.procedures["inverters.currentStep"] = lambda _: {
+        "metadata": {"flexalgoBattery": "charge_from_grid", "targetSoC": 90}
+    }
+    data = api.get_dashboard_data()
+
+    assert proteus_server.batches[1:] == [DASHBOARD, ["inverters.lastState"]]
+    assert data["last_state"] == first["last_state"]
+    assert data["current_step"][0]["json"][2][0][0]["metadata"]["targetSoC"] == 90
+    assert api.stats.procedure_errors == {"inverters.lastState": 1}
+
+
+def test_all_procedures_failed(proteus_server, api):
+    """A batch where every procedure fails raises."""
+    proteus_server.failing.update(DASHBOARD)
+
+    with pytest.raises(Exception, match="All dashboard procedures failed"):
+        api.get_dashboard_data()
+    assert len(proteus_server.batches) == 2
+
+
+def test_error_field_in_payload_is_data(proteus_server, api):
+    """A successful procedure whose data has an error field is not retried."""
+    proteus_server.procedures["inverters.lastState"] = lambda _: {
+        "batteryStateOfCharge": 40,
+        "error": {"code": "E42", "message": "Battery communication lost"},
+    }
+
+    data = api.get_dashboard_data()
+
+    assert proteus_server.batches == [DASHBOARD]
+    assert api.stats.retries == 0
+    assert data["last_state"][0]["json"][2][0][0]["error"]["code"] == "E42"
+    # Odpověď bez selhaných procedur se cachuje
+    assert api.get_dashboard_data() == data
+    assert len(proteus_server.batches) == 1
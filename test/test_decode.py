@@ -0,0 +1,91 @@
+"""JSON decoder selection and the typed lastState / currentStep views."""
+from __future__ import annotations
+
+import importlib
+import sys
+
+import pytest
+
+from custom_components.proteus import decode
+from custom_components.proteus.decode import CurrentStep, LastState
+
+LINE = b'{"json":[4,0,[[{"batteryStateOfCharge":55,"gridPower":-120.5}]]]}'
+
+
+@pytest.fixture
+def reload_decode(monkeypatch):
+    """Reload decode with the given modules made unimportable."""
+
+    def _reload(*blocked: str):
+        for name in blocked:
+            monkeypatch.setitem(sys.modules, name, None)
+        return importlib.reload(decode)
+
+    yield _reload
+    monkeypatch.undo()
+    importlib.reload(decode)
+
+
+@pytest.mark.parametrize(
+    ("blocked", "decoder"),
+    [
+        pytest.param(("orjson", "msgspec"), "json", id="json"),
+        pytest.param(("orjson",), "msgspec", id="msgspec"),
+        pytest.param((), "orjson", id="orjson"),
+    ],
+)
+def test_decoder_fallback(reload_decode, blocked, decoder):
+    """The fastest installed decoder is used, each decodes the same lines."""
+    if decoder != "json":
+        pytest.importorskip(decoder)
+    module = reload_decode(*blocked)
+
+    assert module.JSON_DECODER == decoder
+    assert module.json_loads(LINE) == {
+        "json": [4, 0, [[{"batteryStateOfCharge": 55, "gridPower": -120.5}]]]
+    }
+    assert module.json_loads(LINE.decode()) == module.json_loads(LINE)
+    with pytest.raises(module.DECODE_ERRORS):
+        module.json_loads(b'{"json":[4,0,')
+
+
+def test_last_state_fields():
+    """Values are taken from the first line carrying them, non-numbers dropped."""
+    state = LastState.from_lines(
+        [
+            {"json": [4, 0, [[{"batteryStateOfCharge": 55, "gridPower": True}]]]},
+            {"json": [4, 0, [[{"gridPower": 120.5, "batteryStateOfCharge": 10}]]]},
+            {"json": {"gridInEnergy": 1500, "gridOutEnergy": "n/a"}},
+            "not a line",
+        ]
+    )
+
+    assert state.soc == 55
+    assert state.grid_power is None
+    assert state.grid_in_energy == 1500
+    assert state.grid_out_energy is None
+    assert state.counters() == {"batteryStateOfCharge": 55, "gridInEnergy": 1500}
+    assert LastState.from_lines([]) == LastState()
+
+
+def test_current_step_skips_reference_lines():
+    """The step is the line whose metadata carries the battery mode."""
+    step = CurrentStep.from_lines(
+        [
+            {"json": [1, 0, [[{"metadata": 2}]]]},
+            {"json": [2, 0, [[{"metadata": {"targetSoC": 10}}]]]},
+            {
+                "json": [
+                    1,
+                    0,
+                    [[{"metadata": {"flexalgoBattery": "charge_from_grid", "targetSoC": 80}}]],
+                ]
+            },
+        ]
+    )
+
+    assert step.mode == "charge_from_grid"
+    assert step.target_soc == 80
+    assert step.price_mwh_consumption is None
+    assert step.price_kwh is None
+    assert CurrentStep.from_lines([{"json": [1, 0, [[{}]]]}]) is None
@@ -0,0 +1,72 @@
+"""Fleet poller against the local mock server."""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("requests")
+
+from custom_components.proteus import fleet  # noqa: E402
+from custom_components.proteus.plan import plan_revision  # noqa: E402
+
+
+def test_one_cycle_writes_snapshots(proteus_server, tmp_path):
+    """One cycle stores a snapshot per inverter and each plan revision once."""
+    accounts = tmp_path / "accounts.json"
+    accounts.write_text(
+        json.dumps(
+            [
+                {"email": "a@example.com", "password": "p"},
+                {"email": "b@example.com", "password": "p", "inverters": ["inv-b"]},
+            ]
+        )
+    )
+    database = tmp_path / "fleet.db"
+
+    fleet.main(
+        [
+            str(accounts),
+            "--db", str(database),
+            "--cycles", "1",
+            "--interval", "0",
+            "--base-url", proteus_server.url,
+        ]
+    )
+
+    connection = sqlite3.connect(database)
+    try:
+        assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        rows = connection.execute(
+            "SELECT inverter_id, soc, grid_power, grid_in_energy, plan_revision,"
+            " step_mode, step_target_soc FROM snapshots ORDER BY inverter_id"
+        ).fetchall()
+        plans = connection.execute(
+            "SELECT inverter_id, plan_id FROM plans ORDER BY inverter_id"
+        ).fetchall()
+    finally:
+        connection.close()
+
+    active_plan = proteus_server.procedures["controlPlans.active"]({})["activePlan"]
+    revision = plan_revision(active_plan)
+    assert revision.startswith("p1:2024-01-01T00:00:00Z:")
+    assert rows == [
+        (inverter_id, 55.0, 120.5, 1500.0, revision, "default", 80.0)
+        for inverter_id in ("inv-0", "inv-1", "inv-b")
+    ]
+    assert plans == [("inv-0", "p1"), ("inv-1", "p1"), ("inv-b", "p1")]
+    assert proteus_server.logins == 2
+
+
+def test_package_import_does_not_load_home_assistant():
+    """The fleet entry point must run without Home Assistant installed."""
+    code = (
+        "import sys, custom_components.proteus.fleet; "
+        "sys.exit(any(m.split('.')[0] == 'homeassistant' for m in sys.modules))"
+    )
+    root = Path(__file__).resolve().parents[1]
+    assert subprocess.run([sys.executable, "-c", code], cwd=root).returncode == 0
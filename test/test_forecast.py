@@ -0,0 +1,43 @@
+"""Battery parameters read from inverters.extendedDetail."""
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from custom_components.proteus.forecast import battery_parameters  # noqa: E402
+
+
+def _detail(data: dict) -> list:
+    return [{"json": [3, 0, [[data]]]}]
+
+
+def test_fields_in_their_units():
+    """Known fields are read without guessing their unit."""
+    battery = battery_parameters(
+        _detail(
+            {
+                "batteryCapacityKwh": 10,
+                "batteryMaxChargePower": 50,
+                "batteryMaxDischargePower": 6000,
+                "batteryMinSoC": 10,
+            }
+        ),
+        None,
+        5000,
+    )
+    assert battery.capacity_wh == 10_000
+    assert battery.max_charge_w == 50
+    assert battery.max_discharge_w == 6000
+    assert battery.min_soc == 10
+
+
+def test_missing_fields_fall_back_to_options():
+    """Generic or nested keys are ignored, the options fill the gaps."""
+    detail = _detail({"capacity": 12, "battery": {"batteryCapacityWh": 9000}})
+    assert battery_parameters(detail, None, 5000) is None
+
+    battery = battery_parameters(detail, 7000, 3000)
+    assert battery.capacity_wh == 7000
+    assert battery.max_charge_w == battery.max_discharge_w == 3000
+    assert battery.min_soc == 0
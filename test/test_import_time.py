@@ -0,0 +1,93 @@
+"""Import-time budget of the integration (python -X importtime).
+
+Home Assistant imports every configured integration during bootstrap, so
+the package itself must stay cheap and heavy dependencies load on first
+use. The standard library modules Home Assistant has already loaded by
+then are imported up front and not counted.
+"""
+from __future__ import annotations
+
+import ast
+from pathlib import Path
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+PACKAGE = ROOT / "custom_components" / "proteus"
+
+# Standardní knihovna, kterou má Home Assistant při bootstrapu už načtenou
+PRELOADED = (
+    "asyncio, bisect, collections.abc, dataclasses, datetime, importlib.util, "
+    "json, logging, math, threading, typing, urllib.parse"
+)
+# Kumulativní čas importu v mikrosekundách (velká rezerva pro pomalé stroje)
+PACKAGE_BUDGET_US = 25_000
+CLIENT_BUDGET_US = 100_000
+
+HEAVY_MODULES = {"numpy", "pyarrow", "requests", "homeassistant"}
+# Vlastní moduly, které se smí načítat jen líně (kromě TYPE_CHECKING)
+LAZY_SUBMODULES = {"forecast", "optimizer", "parquet", "mqtt_bridge"}
+# Moduly, jejichž smyslem je těžká závislost
+HEAVY_OWNERS = {"forecast", "optimizer"}
+
+
+def _import_times(module: str) -> dict[str, int]:
+    """Return cumulative import time (us) of every module imported."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {PRELOADED}; import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_package_import_within_budget():
+    """Importing the integration loads only its constants."""
+    times = _import_times("custom_components.proteus")
+
+    assert times["custom_components.proteus"] < PACKAGE_BUDGET_US
+    submodules = {name for name in times if name.startswith("custom_components.proteus.")}
+    assert submodules == {"custom_components.proteus.const"}
+    assert not {name.split(".")[0] for name in times} & HEAVY_MODULES
+
+
+def test_client_import_defers_requests():
+    """The client and parsers import without requests, NumPy or pyarrow."""
+    times = _import_times("custom_components.proteus.api")
+
+    assert times["custom_components.proteus.api"] < CLIENT_BUDGET_US
+    assert not {name.split(".")[0] for name in times} & HEAVY_MODULES
+
+
+def _module_level_imports(tree: ast.Module) -> set[str]:
+    """Return modules imported at module level, outside TYPE_CHECKING."""
+    names: set[str] = set()
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                names.add(f".{(node.module or '').split('.')[0]}")
+            else:
+                names.add((node.module or "").split(".")[0])
+    return names
+
+
+def test_heavy_modules_are_imported_lazily():
+    """Only the modules built on NumPy import it at module level."""
+    for path in sorted(PACKAGE.glob("*.py")):
+        if path.stem in HEAVY_OWNERS:
+            continue
+        imports = _module_level_imports(ast.parse(path.read_text(encoding="utf-8")))
+        eager = imports & ({"numpy", "pyarrow", "requests"} | {
+            f".{name}" for name in LAZY_SUBMODULES
+        })
+        assert not eager, f"{path.name} imports {sorted(eager)} at module level"
@@ -0,0 +1,82 @@
+"""Cheapest run window over the slot prices."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from custom_components.proteus.loadplan import build_slot_prices, find_window
+from custom_components.proteus.pricing import PriceTimeline
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+HOUR = timedelta(hours=1)
+
+
+def _prices(hourly: dict[int, float]):
+    """Return slot prices of hourly steps, Kč/MWh keyed by hour offset."""
+    hours = sorted(hourly)
+    return build_slot_prices(
+        PriceTimeline(
+            revision="r",
+            starts=tuple(T0 + HOUR * hour for hour in hours),
+            ends=tuple(T0 + HOUR * (hour + 1) for hour in hours),
+            market_mwh=tuple(hourly[hour] for hour in hours),
+            total_mwh=tuple(hourly[hour] for hour in hours),
+            export_mwh=(0.0,) * len(hours),
+        )
+    )
+
+
+PRICES = _prices(dict(enumerate([5000, 4000, 1000, 2000, 6000, 3000])))
+
+
+def test_flat_load_cheapest_window():
+    """A flat load starts in the cheapest window, compared to starting at earliest."""
+    window = find_window(PRICES, 2 * HOUR, T0, None, energy_kwh=4)
+
+    assert window.start == T0 + 2 * HOUR
+    assert window.end == T0 + 4 * HOUR
+    assert window.cost == pytest.approx(6.0)
+    assert window.cost_earliest == pytest.approx(18.0)
+    assert window.savings_vs_earliest == pytest.approx(12.0)
+
+
+def test_earliest_and_deadline():
+    """The window starts on a slot boundary after earliest and ends by deadline."""
+    window = find_window(PRICES, 2 * HOUR, T0, T0 + 3 * HOUR, energy_kwh=4)
+    assert window.start == T0 + HOUR
+    assert window.cost == pytest.approx(10.0)
+
+    window = find_window(PRICES, HOUR, T0 + 2.5 * HOUR, None, energy_kwh=1)
+    assert window.start == T0 + 3 * HOUR
+    # Srovnává se s prvním celým slotem od earliest
+    assert window.cost_earliest == pytest.approx(2.0)
+
+    assert find_window(PRICES, 7 * HOUR, T0, None, energy_kwh=1) is None
+    assert find_window(PRICES, 2 * HOUR, T0, T0 + HOUR, energy_kwh=1) is None
+
+
+def test_power_profile_shapes_the_cost():
+    """A shaped load prefers the window where its peak is cheapest."""
+    window = find_window(PRICES, 2 * HOUR, T0, None, profile=[1.0, 3.0])
+    assert window.start == T0 + HOUR
+    assert window.cost == pytest.approx(7.0)
+
+    # Energie jen škáluje tvar profilu
+    window = find_window(PRICES, 2 * HOUR, T0, None, energy_kwh=8, profile=[1.0, 3.0])
+    assert window.cost == pytest.approx(14.0)
+
+    # Konstantní profil je plochá zátěž o daném výkonu
+    window = find_window(PRICES, 2 * HOUR, T0, None, profile=[2.0, 2.0])
+    assert window.start == T0 + 2 * HOUR
+    assert window.cost == pytest.approx(6.0)
+
+
+def test_window_does_not_span_gap():
+    """Slots without a plan step split the horizon."""
+    prices = _prices({0: 1000, 1: 1000, 3: 500, 4: 500, 5: 9000})
+    window = find_window(prices, 3 * HOUR, T0, None, energy_kwh=3)
+    assert window.start == T0 + 3 * HOUR
+    assert window.cost == pytest.approx(10.0)
+
+    assert find_window(prices, 4 * HOUR, T0, None, energy_kwh=1) is None
@@ -0,0 +1,62 @@
+"""Flushing of the Parquet export buffer."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from custom_components.proteus.decode import LastState
+from custom_components.proteus.parquet import ParquetExporter
+from custom_components.proteus.plan import parse_control_plan
+
+START = datetime(2024, 1, 1, 22, tzinfo=timezone.utc)
+
+
+def _plan(steps: int):
+    return parse_control_plan(
+        {
+            "id": "p1",
+            "updatedAt": "2024-01-01T00:00:00Z",
+            "payload": {
+                "steps": [
+                    {
+                        "id": f"s{index}",
+                        "startAt": (START + timedelta(minutes=15 * index)).isoformat(),
+                        "durationMinutes": 15,
+                        "metadata": {"flexalgoBattery": "default"},
+                    }
+                    for index in range(steps)
+                ]
+            },
+        }
+    )
+
+
+def test_plan_rows_do_not_trigger_flush(tmp_path):
+    """A long plan revision alone does not make the buffer due."""
+    exporter = ParquetExporter(str(tmp_path), flush_samples=3)
+    exporter.add_plan("inv-0", START, _plan(192))
+    exporter.add_sample("inv-0", START, LastState(soc=50), None)
+
+    assert exporter.plan_rows == 192
+    assert exporter.samples == 1
+    assert exporter.pending == 193
+    assert not exporter.due
+
+    for minutes in (5, 10):
+        when = START + timedelta(minutes=minutes)
+        exporter.add_sample("inv-0", when, LastState(soc=50), None)
+    assert exporter.due
+
+    exporter.take()
+    assert exporter.pending == 0
+    assert not exporter.due
+
+
+def test_new_utc_day_triggers_flush(tmp_path):
+    """Samples of a new UTC day make the buffer due."""
+    exporter = ParquetExporter(str(tmp_path))
+    exporter.add_sample("inv-0", START, LastState(soc=50), None)
+    exporter.add_sample("inv-0", START + timedelta(hours=1), LastState(soc=50), None)
+    assert not exporter.due
+
+    exporter.add_sample("inv-0", START + timedelta(hours=2), LastState(soc=50), None)
+    assert exporter.due
@@ -0,0 +1,38 @@
+"""Plan revisions."""
+from __future__ import annotations
+
+import copy
+
+from custom_components.proteus.plan import parse_control_plan, plan_revision
+
+PLAN = {
+    "id": "p1",
+    "updatedAt": "2024-01-01T00:00:00Z",
+    "payload": {
+        "steps": [
+            {
+                "id": "s1",
+                "startAt": "2024-01-01T00:00:00Z",
+                "durationMinutes": 60,
+                "metadata": {"flexalgoBattery": "default", "targetSoC": 80},
+                "state": {"startedAt": None},
+            }
+        ]
+    },
+}
+
+
+def test_revision_follows_step_content():
+    """Edits that keep id, updatedAt and the step count change the revision."""
+    revision = plan_revision(PLAN)
+    assert revision.startswith("p1:2024-01-01T00:00:00Z:")
+    assert plan_revision(copy.deepcopy(PLAN)) == revision
+
+    edited = copy.deepcopy(PLAN)
+    edited["payload"]["steps"][0]["metadata"]["targetSoC"] = 90
+    assert plan_revision(edited) != revision
+
+    started = copy.deepcopy(PLAN)
+    started["payload"]["steps"][0]["state"]["startedAt"] = "2024-01-01T00:00:05Z"
+    assert plan_revision(started) != revision
+    assert parse_control_plan(started).revision == plan_revision(started)
@@ -0,0 +1,148 @@
+"""Distribution tariff parsing, the total price timeline and price ranks."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+import logging
+
+import pytest
+
+from custom_components.proteus.plan import parse_control_plan
+from custom_components.proteus.pricing import (
+    build_price_rank,
+    build_price_timeline,
+    parse_distribution_prices,
+    parse_quantiles,
+)
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+HOUR = timedelta(hours=1)
+
+
+def _line(index: int, data: object) -> dict:
+    return {"json": [index, 0, [[data]]]}
+
+
+def test_tariff_mapping():
+    """A data object keyed by tariff type."""
+    assert parse_distribution_prices([_line(0, {"HT": 1800, "LT": 450.5})]) == {
+        "HT": 1800.0,
+        "LT": 450.5,
+    }
+
+
+def test_tariff_rows():
+    """Rows streamed one per line, keyed like the plan's priceComponents."""
+    results = [
+        _line(0, [{"distributionTariffType": "HT", "distributionPrice": 1800}]),
+        _line(0, [{"distributionTariffType": "LT", "distributionPrice": 450}]),
+    ]
+    assert parse_distribution_prices(results) == {"HT": 1800.0, "LT": 450.0}
+
+
+def test_unknown_shape_is_logged(caplog):
+    """Generic keys elsewhere in the response are not matched."""
+    results = [
+        _line(0, {"items": [{"type": "HT", "price": 1800}], "HT": True}),
+        {"json": {"distributionTariffType": "HT", "distributionPrice": 1800}},
+    ]
+    with caplog.at_level(logging.WARNING):
+        assert parse_distribution_prices(results) == {}
+    assert "['HT', 'items']" in caplog.text
+
+
+def _plan(steps: list[dict]):
+    """Return a plan of hourly steps from T0 with the given metadata."""
+    return parse_control_plan(
+        {
+            "id": "p1",
+            "updatedAt": "2024-01-01T00:00:00Z",
+            "payload": {
+                "steps": [
+                    {
+                        "id": f"s{index}",
+                        "startAt": (T0 + HOUR * index).isoformat(),
+                        "durationMinutes": 60,
+                        "metadata": metadata,
+                    }
+                    for index, metadata in enumerate(steps)
+                ]
+            },
+        }
+    )
+
+
+PLAN = _plan(
+    [
+        {
+            "priceMwhConsumption": 1000,
+            "priceMwhProduction": 500,
+            "priceComponents": {"distributionTariffType": "HT", "distributionPrice": 111},
+        },
+        {"priceMwhConsumption": 2000, "priceComponents": {"distributionTariffType": "LT"}},
+        {
+            "priceMwhConsumption": 3000,
+            "priceComponents": {"distributionTariffType": "HT/LT", "distributionPrice": 700},
+        },
+        {"priceMwhConsumption": 500},
+    ]
+)
+
+
+def test_price_timeline_joins_tariff():
+    """Known tariff types take the table price, others the step's own."""
+    timeline = build_price_timeline(PLAN, {"HT": 1500, "LT": 400}, "t1")
+
+    assert timeline.revision == f"{PLAN.revision}|t1"
+    assert timeline.matches(PLAN)
+    assert not timeline.matches(_plan([{"priceMwhConsumption": 1000}]))
+    assert timeline.market_mwh == (1000, 2000, 3000, 500)
+    assert timeline.total_mwh == (2500, 2400, 3700, 500)
+    assert timeline.export_mwh == (500, 0, 0, 0)
+    assert timeline.total_kwh(2) == 3.7
+
+
+def test_price_timeline_without_tariff():
+    """Without a tariff table the step's distribution price is used."""
+    timeline = build_price_timeline(PLAN, None, None)
+    assert timeline.total_mwh == (1111, 2000, 3700, 500)
+
+
+def test_price_timeline_lookup():
+    """Steps are found by time and overlaps are measured in hours."""
+    timeline = build_price_timeline(PLAN, None, None)
+
+    assert timeline.index_at(T0) == 0
+    assert timeline.index_at(T0 + 1.5 * HOUR) == 1
+    assert timeline.index_at(T0 + 4 * HOUR) is None
+    assert timeline.index_at(T0 - HOUR) is None
+    assert timeline.index_from(T0 + 0.5 * HOUR) == 1
+    assert timeline.overlaps(T0 + 0.5 * HOUR, T0 + 2 * HOUR) == [(0, 0.5), (1, 1.0)]
+
+
+def test_price_rank():
+    """Ranks, percentiles and quantile thresholds within the window."""
+    timeline = build_price_timeline(PLAN, {"HT": 1500, "LT": 400}, "t1")
+    rank = build_price_rank(timeline, 1, 2 * HOUR)
+
+    assert rank.key == (timeline.revision, 1)
+    assert (rank.start, rank.end) == (T0 + HOUR, T0 + 3 * HOUR)
+    assert rank.sorted_mwh == (2400, 3700)
+    assert rank.rank(2400) == 1
+    assert rank.rank(3700) == 2
+    assert rank.percentile(3700) == 50
+    assert rank.threshold(25) == 2400
+    assert rank.threshold(75) == 3700
+
+    full = build_price_rank(timeline, 0, 24 * HOUR)
+    assert full.sorted_mwh == (500, 2400, 2500, 3700)
+    assert full.percentile(2500) == 50
+    assert full.threshold(50) == 2400
+    assert build_price_rank(timeline, 4, HOUR) is None
+
+
+def test_parse_quantiles():
+    """Quantiles are deduplicated, sorted and limited to 1-99."""
+    assert parse_quantiles("50, 10;25, 10") == [10, 25, 50]
+    for value in ("", "0", "100", "x"):
+        with pytest.raises(ValueError):
+            parse_quantiles(value)